@@ -0,0 +1,110 @@
+"""
+Bulk load company reference data from an NDJSON or CSV file.
+
+Usage:
+    python -m app.bulk_load companies.ndjson
+    python -m app.bulk_load companies.csv --format csv --report report.ndjson
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+BULK_CHUNK_ROWS = int(os.environ.get("BULK_CHUNK_ROWS", "1000"))
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "8"))
+
+# (row, None) for a parsed row, (None, error) for a line that could not be parsed
+ParsedRow = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks (e.g. ``Request.stream()``) into text lines."""
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buf:
+        yield buf.decode("utf-8")
+
+
+async def _aiter(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+
+async def parse_rows(lines: AsyncIterable[str] | Iterable[str], fmt: str = "ndjson") -> AsyncIterator[ParsedRow]:
+    """Parse NDJSON or CSV lines into company rows, one at a time.
+
+    Blank lines are skipped. CSV needs a header row; empty cells are
+    dropped so optional fields fall back to their defaults. Quoted
+    newlines inside CSV cells are not supported.
+    """
+    if not hasattr(lines, "__aiter__"):
+        lines = _aiter(lines)
+    header = None
+    async for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            cells = next(csv.reader([line]))
+            if header is None:
+                header = [c.strip() for c in cells]
+                continue
+            if len(cells) != len(header):
+                yield None, f"expected {len(header)} columns, got {len(cells)}"
+                continue
+            yield {k: v for k, v in zip(header, cells) if v != ""}, None
+        else:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield None, f"invalid JSON: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield None, "expected a JSON object"
+                continue
+            yield row, None
+
+
+async def run(path: str, fmt: str, chunk_rows: int, concurrency: int, report_path: Optional[str]) -> Dict[str, Any]:
+    from app.repository.backends import create_repository
+    from app.services.company_service import CompanyService
+
+    # REPOSITORY_BACKEND decides where rows go; on Postgres each chunk is one COPY
+    svc = CompanyService(repo=create_repository())
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            result = await svc.bulk_import(parse_rows(f, fmt), chunk_rows=chunk_rows, concurrency=concurrency)
+    finally:
+        await svc.repo.close()
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as out:
+            for row in result["results"]:
+                out.write(json.dumps(row) + "\n")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load companies into the configured backend")
+    parser.add_argument("path", help="NDJSON or CSV file")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="File format (default: from extension)")
+    parser.add_argument("--chunk-rows", type=int, default=BULK_CHUNK_ROWS, help="Rows validated and written per chunk")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY, help="Transactional batches in flight (Cosmos)")
+    parser.add_argument("--report", help="Write the per-row report as NDJSON to this file")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    result = asyncio.run(run(args.path, fmt, args.chunk_rows, args.concurrency, args.report))
+    print(json.dumps(result["summary"], indent=2))
+    return 0 if result["summary"]["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
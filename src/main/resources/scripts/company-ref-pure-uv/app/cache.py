@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+COMPANY_CACHE_MAX_ITEMS = int(os.environ.get("COMPANY_CACHE_MAX_ITEMS", "10000"))
+# Stale-read window: how long a point read may be served without going back to Cosmos
+COMPANY_CACHE_TTL_SECONDS = float(os.environ.get("COMPANY_CACHE_TTL_SECONDS", "30"))
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ``ttl_seconds``.
+
+    Values are documents; their ``_etag`` is kept alongside so callers can
+    tell which version they hold. ``max_items`` or ``ttl_seconds`` of 0
+    disables the cache.
+    """
+
+    def __init__(self, max_items: int = COMPANY_CACHE_MAX_ITEMS, ttl_seconds: float = COMPANY_CACHE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _etag, doc = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Shallow copy so callers can't mutate the cached document
+        return dict(doc)
+
+    def etag(self, key: Hashable) -> Optional[str]:
+        """The ``_etag`` of a live entry, without counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, doc: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, doc.get("_etag"), dict(doc))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Change-feed consumer: entries are keyed (pk, id); a changed document is
+    # dropped rather than replaced, so a late-arriving older version never wins
+    def on_upsert(self, doc: Dict[str, Any]) -> None:
+        self.invalidate((doc.get("pk"), doc.get("id")))
+
+    def on_delete(self, id: str, pk: str) -> None:
+        self.invalidate((pk, id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,236 @@
+"""
+Background change-feed processor that keeps a worker's local caches and
+indexes in step with the container.
+
+Each worker reads the container's change feed itself, one partition key
+range at a time, and publishes every changed document to its registered
+consumers (the point-read cache, the prefix index, the name filter). A
+write made by any worker therefore reaches every other worker within
+roughly one poll interval, without re-running scan queries.
+
+The feed in azure-cosmos 4.7 is the latest-version feed: it carries
+creates and updates but not deletes. Deletes made by this worker are
+applied locally by the service. Deletes made by other workers are found
+by :meth:`ChangeFeedProcessor.reconcile`, every
+``CHANGE_FEED_RECONCILE_SECONDS``. It lists the ids in the container and
+publishes a delete for every id a consumer holds that is no longer there.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Protocol
+from azure.cosmos import exceptions
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_ENABLED = os.environ.get("CHANGE_FEED_ENABLED", "false").lower() == "true"
+CHANGE_FEED_POLL_SECONDS = float(os.environ.get("CHANGE_FEED_POLL_SECONDS", "1.0"))
+CHANGE_FEED_MAX_ITEMS = int(os.environ.get("CHANGE_FEED_MAX_ITEMS", "100"))
+# How often deletes made by other workers are looked for (an id scan); 0 turns it off
+CHANGE_FEED_RECONCILE_SECONDS = float(os.environ.get("CHANGE_FEED_RECONCILE_SECONDS", "300"))
+# Where continuation tokens are persisted, one file per process ("<path>.<pid>");
+# unset keeps them in memory for the process lifetime
+CHANGE_FEED_STATE_PATH = os.environ.get("CHANGE_FEED_STATE_PATH")
+
+
+class ChangeConsumer(Protocol):
+    """Anything that holds documents locally and wants to hear about changes.
+
+    Consumers that also have ``held_keys()``, returning the ``(id, pk)`` of
+    every document they hold, are checked by
+    :meth:`ChangeFeedProcessor.reconcile`.
+    """
+
+    def on_upsert(self, doc: Dict[str, Any]) -> None: ...
+
+    def on_delete(self, id: str, pk: str) -> None: ...
+
+
+class ContinuationStore:
+    """Continuation tokens per partition key range, held in memory."""
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+
+    def load(self) -> Dict[str, str]:
+        return dict(self._tokens)
+
+    def save(self, tokens: Dict[str, str]) -> None:
+        self._tokens = dict(tokens)
+
+
+class FileContinuationStore(ContinuationStore):
+    """Continuation tokens persisted as JSON, replaced atomically on each save."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable change feed state in %s", self.path)
+            return {}
+
+    def save(self, tokens: Dict[str, str]) -> None:
+        # A temp file of its own, so a concurrent save cannot replace or remove it under us
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(self.path) or ".",
+                                         prefix=os.path.basename(self.path), suffix=".tmp", delete=False) as f:
+            json.dump(tokens, f)
+        try:
+            os.replace(f.name, self.path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+
+class ChangeFeedProcessor:
+    """Polls the change feed of every partition key range and fans changes out.
+
+    Call :meth:`prime` before loading the local indexes so no change made
+    while they load is missed (replaying one is harmless: consumers apply
+    upserts idempotently), then :meth:`start` the polling task and
+    :meth:`stop` it on shutdown. The task also runs :meth:`reconcile`
+    every ``reconcile_seconds``.
+    """
+
+    def __init__(self, repo, consumers: Optional[List[ChangeConsumer]] = None,
+                 store: Optional[ContinuationStore] = None,
+                 poll_seconds: float = CHANGE_FEED_POLL_SECONDS, max_item_count: int = CHANGE_FEED_MAX_ITEMS,
+                 reconcile_seconds: float = CHANGE_FEED_RECONCILE_SECONDS):
+        self.repo = repo
+        self.consumers: List[ChangeConsumer] = list(consumers or [])
+        # Every worker reads every range itself, so each process needs its own tokens
+        self.store = store or (FileContinuationStore(f"{CHANGE_FEED_STATE_PATH}.{os.getpid()}")
+                               if CHANGE_FEED_STATE_PATH else ContinuationStore())
+        self.poll_seconds = poll_seconds
+        self.max_item_count = max_item_count
+        self.reconcile_seconds = reconcile_seconds
+        self.tokens: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_poll: Optional[float] = None
+        self.reconciles = 0
+        self.reconciled_deletes = 0
+        self._next_reconcile = 0.0
+
+    def register(self, consumer: ChangeConsumer) -> None:
+        self.consumers.append(consumer)
+
+    def publish_upsert(self, doc: Dict[str, Any]) -> None:
+        for consumer in self.consumers:
+            consumer.on_upsert(doc)
+
+    def publish_delete(self, id: str, pk: str) -> None:
+        for consumer in self.consumers:
+            consumer.on_delete(id, pk)
+
+    async def prime(self) -> None:
+        """Resume from persisted tokens, or take a "now" token for each range that has none."""
+        self.tokens = self.store.load()
+        for range_id in await self.repo.feed_ranges():
+            if range_id not in self.tokens:
+                # Reading from now returns no documents, only the range's current position
+                _, self.tokens[range_id] = await self.repo.read_change_feed(range_id, None, self.max_item_count)
+        self.store.save(self.tokens)
+
+    async def poll_once(self) -> int:
+        """Read every range from its token, publish what changed, and return the count."""
+        published = 0
+        for range_id in list(self.tokens):
+            try:
+                docs, token = await self.repo.read_change_feed(range_id, self.tokens[range_id], self.max_item_count)
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code != 410:
+                    raise
+                await self._split(range_id)
+                continue
+            for doc in docs:
+                self.publish_upsert(doc)
+            published += len(docs)
+            if token:
+                self.tokens[range_id] = token
+        self.store.save(self.tokens)
+        self.polls += 1
+        self.changes += published
+        self.last_poll = time.time()
+        return published
+
+    async def reconcile(self) -> int:
+        """Publish a delete for every held document whose id is gone from the container; returns the count."""
+        # Snapshot what is held before listing: anything held then existed before the scan started,
+        # so an id missing from the scan was deleted (a partition move keeps the id)
+        held: Dict[str, str] = {}
+        for consumer in self.consumers:
+            held_keys = getattr(consumer, "held_keys", None)
+            if held_keys is not None:
+                held.update(held_keys())
+        live = set(await self.repo.scan_ids())
+        deleted = [(id, pk) for id, pk in held.items() if id not in live]
+        for id, pk in deleted:
+            self.publish_delete(id, pk)
+        self.reconciles += 1
+        self.reconciled_deletes += len(deleted)
+        return len(deleted)
+
+    async def _split(self, range_id: str) -> None:
+        # 410 Gone: the range split; its children pick up from the parent's position
+        token = self.tokens.pop(range_id)
+        for child in await self.repo.feed_ranges():
+            self.tokens.setdefault(child, token)
+        logger.info("Partition key range %s split; now following %d ranges", range_id, len(self.tokens))
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.poll_once()
+                if self.reconcile_seconds > 0 and time.monotonic() >= self._next_reconcile:
+                    await self.reconcile()
+                    self._next_reconcile = time.monotonic() + self.reconcile_seconds
+            except Exception:
+                self.errors += 1
+                logger.exception("Change feed poll failed")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def caught_up(self, max_lag: float) -> bool:
+        """Whether the task is running and its last successful poll is at most ``max_lag`` seconds old."""
+        return self._task is not None and self.last_poll is not None and time.time() - self.last_poll <= max_lag
+
+    def start(self) -> None:
+        self._stopping.clear()
+        # The indexes were just loaded, so the first reconcile can wait a full interval
+        self._next_reconcile = time.monotonic() + self.reconcile_seconds
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "ranges": len(self.tokens),
+            "consumers": len(self.consumers),
+            "polls": self.polls,
+            "changes": self.changes,
+            "errors": self.errors,
+            "reconciles": self.reconciles,
+            "reconciled_deletes": self.reconciled_deletes,
+            "seconds_since_poll": round(time.time() - self.last_poll, 3) if self.last_poll else None,
+        }
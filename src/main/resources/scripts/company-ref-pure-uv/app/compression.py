@@ -0,0 +1,236 @@
+"""
+Negotiated response compression.
+
+With ``COMPRESSION_ENABLED=true`` JSON, NDJSON and text responses are
+compressed with the best encoding the client's ``Accept-Encoding`` allows.
+The encodings are zstd (``zstandard``), brotli (``brotli``) and gzip
+(standard library), in that order of preference when the client weights
+them equally. zstd and brotli need the ``compression`` extra; without it
+only gzip is offered.
+
+A complete response body shorter than ``COMPRESSION_MIN_SIZE`` is sent as
+is, because below about a packet the bytes saved do not pay for the CPU
+(see the compression benchmark). Streamed bodies (``GET /companies``
+NDJSON) are always compressed. Each chunk is flushed as it is written, so
+the client can decode every page as soon as it arrives instead of waiting
+for the end of the export.
+"""
+import os
+import threading
+import zlib
+from typing import Any, Callable, Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "false").lower() == "true"
+# Smallest complete body worth compressing, in bytes
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class GzipEncoder:
+    """Streaming gzip: ``compress`` chunks, ``flush`` to make what was written decodable, ``finish`` once."""
+
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class BrotliEncoder:
+    """Streaming brotli, with the same interface as :class:`GzipEncoder`."""
+
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class ZstdEncoder:
+    """Streaming zstd (one frame), with the same interface as :class:`GzipEncoder`."""
+
+    def __init__(self, level: int = COMPRESSION_ZSTD_LEVEL):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+def available_encoders() -> Dict[str, Callable[[], Any]]:
+    """Encoder factories by ``Content-Encoding`` token, most preferred first."""
+    encoders: Dict[str, Callable[[], Any]] = {}
+    if zstandard is not None:
+        encoders["zstd"] = ZstdEncoder
+    if brotli is not None:
+        encoders["br"] = BrotliEncoder
+    encoders["gzip"] = GzipEncoder
+    return encoders
+
+
+def negotiate(accept_encoding: Optional[str], offered) -> Optional[str]:
+    """The offered encoding with the highest ``q`` in ``Accept-Encoding``; ties go to the earlier offer."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in offered:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionStats:
+    """Bytes before and after compression per encoding, to judge the threshold in production."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.skipped_small = 0
+
+    def record(self, encoding: str, raw: int, sent: int) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(encoding, {"responses": 0, "raw_bytes": 0, "sent_bytes": 0})
+            counts["responses"] += 1
+            counts["raw_bytes"] += raw
+            counts["sent_bytes"] += sent
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "min_size": COMPRESSION_MIN_SIZE,
+                "skipped_small": self.skipped_small,
+                "encodings": {e: {**c, "ratio": round(c["sent_bytes"] / c["raw_bytes"], 4) if c["raw_bytes"] else None}
+                              for e, c in self._counts.items()},
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: compresses compressible responses with the negotiated encoding.
+
+    The response start is held back until the first body chunk shows
+    whether the body is complete (compressed whole, with a new
+    ``Content-Length``, if at least ``min_size``) or streamed (compressed
+    and flushed chunk by chunk). Responses that already have a
+    ``Content-Encoding``, carry ``Cache-Control: no-transform``, have no
+    body (``HEAD``, 204, 304) or are not JSON/NDJSON/text pass through.
+    ``ETag`` is left alone: it names the document version, whatever the
+    encoding, and ``Vary: Accept-Encoding`` keeps shared caches apart.
+    """
+
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE,
+                 encoders: Optional[Dict[str, Callable[[], Any]]] = None,
+                 stats: CompressionStats = compression_stats):
+        self.app = app
+        self.min_size = min_size
+        self.encoders = encoders if encoders is not None else available_encoders()
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        encoder = None
+        passthrough = False
+        raw = sent = 0
+
+        async def compressing_send(message):
+            nonlocal start, encoder, passthrough, raw, sent
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start)
+                if not self._compressible(start["status"], headers) or (not more and len(body) < self.min_size):
+                    if not more and len(body) < self.min_size:
+                        self.stats.skipped_small += 1
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = self.encoders[encoding]()
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not more:
+                    data = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    self.stats.record(encoding, len(body), len(data))
+                    return
+                await send(start)
+            data = encoder.compress(body) + (encoder.flush() if more else encoder.finish())
+            raw += len(body)
+            sent += len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+            if not more:
+                self.stats.record(encoding, raw, sent)
+
+        await self.app(scope, receive, compressing_send)
+
+    @staticmethod
+    def _compressible(status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        return headers.get("content-type", "").lower().startswith(COMPRESSIBLE_TYPES)
@@ -1,6 +1,9 @@
 import os
+from typing import Optional
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
 from dotenv import load_dotenv
+from app.indexing import INDEXING_POLICY
 
 load_dotenv()
 
@@ -9,6 +12,28 @@ COSMOS_KEY = os.environ.get("COSMOS_KEY")
 COSMOS_DB = os.environ.get("COSMOS_DB", "company_ref_db")
 COSMOS_CONTAINER = os.environ.get("COSMOS_CONTAINER", "companies")
 COSMOS_AUTOSCALE_MAX_RU = int(os.environ.get("COSMOS_AUTOSCALE_MAX_RU", "4000"))
+# Set to false in production to skip the create-if-not-exists control-plane calls
+COSMOS_CREATE_IF_NOT_EXISTS = os.environ.get("COSMOS_CREATE_IF_NOT_EXISTS", "true").lower() == "true"
+# Container left behind by a partition key migration; point reads using its pk scheme fall back to it
+COSMOS_FALLBACK_CONTAINER = os.environ.get("COSMOS_FALLBACK_CONTAINER")
+
+UNIQUE_KEY_POLICY = {
+    "uniqueKeys": [
+        {"paths": ["/name_lower"]},
+        {"paths": ["/lei"]},
+        {"paths": ["/ticker"]},
+    ]
+}
+
+
+
+class CosmosNotConfiguredError(RuntimeError):
+    """Raised when COSMOS_URL / COSMOS_KEY are missing or still placeholders."""
+
+
+def _check_credentials():
+    if not COSMOS_URL or not COSMOS_KEY or COSMOS_URL == "https://<your-account>.documents.azure.com:443/" or COSMOS_KEY == "<primary-or-secondary-key>":
+        raise CosmosNotConfiguredError("Azure Cosmos DB credentials not configured. Please update .env file with valid COSMOS_URL and COSMOS_KEY")
 
 # Lazy initialization of client
 _client = None
@@ -17,45 +42,88 @@ def get_client():
     global _client
     if _client is None:
         # Check if we have valid credentials before initializing client
-        if not COSMOS_URL or not COSMOS_KEY or COSMOS_URL == "https://<your-account>.documents.azure.com:443/" or COSMOS_KEY == "<primary-or-secondary-key>":
-            raise RuntimeError("Azure Cosmos DB credentials not configured. Please update .env file with valid COSMOS_URL and COSMOS_KEY")
+        _check_credentials()
         _client = CosmosClient(COSMOS_URL, credential=COSMOS_KEY)
     return _client
 
 def get_container():
     client = get_client()
-    
+    if not COSMOS_CREATE_IF_NOT_EXISTS:
+        return client.get_database_client(COSMOS_DB).get_container_client(COSMOS_CONTAINER)
+
     try:
         database = client.create_database_if_not_exists(id=COSMOS_DB)
     except exceptions.CosmosResourceExistsError:
         database = client.get_database_client(COSMOS_DB)
 
-    unique_key_policy = {
-        "uniqueKeys": [
-            {"paths": ["/name_lower"]},
-            {"paths": ["/lei"]},
-            {"paths": ["/ticker"]},
-        ]
-    }
-
     try:
         container = database.create_container_if_not_exists(
             id=COSMOS_CONTAINER,
             partition_key=PartitionKey(path="/pk"),
             offer_throughput=None,
             autoscale_throughput=COSMOS_AUTOSCALE_MAX_RU,
-            unique_key_policy=unique_key_policy,
-            indexing_policy={
-                "indexingMode": "consistent",
-                "automatic": True,
-                "includedPaths": [{"path": "/*"}],
-                "excludedPaths": [
-                    {"path": "/\"_etag\"/?"},
-                    {"path": "/notes/?"}
-                ]
-            },
+            unique_key_policy=UNIQUE_KEY_POLICY,
+            indexing_policy=INDEXING_POLICY,
         )
     except exceptions.CosmosResourceExistsError:
         container = database.get_container_client(COSMOS_CONTAINER)
 
     return container
+
+# Async client (azure.cosmos.aio) used by the API; opened/closed in the app lifespan
+_async_client = None
+_async_container = None
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _check_credentials()
+        _async_client = AsyncCosmosClient(COSMOS_URL, credential=COSMOS_KEY)
+    return _async_client
+
+async def get_async_container(container_id: Optional[str] = None):
+    """The API's container, opened once per process. Other ids (a migration
+    source or target, a fallback container) are returned as uncached proxies
+    and never created; see :func:`create_async_container`.
+    """
+    global _async_container
+    if container_id is not None and container_id != COSMOS_CONTAINER:
+        return await _open_async_container(get_async_client(), container_id, False)
+    if _async_container is None:
+        _async_container = await _open_async_container(get_async_client(), COSMOS_CONTAINER, COSMOS_CREATE_IF_NOT_EXISTS)
+    return _async_container
+
+async def create_async_container(container_id: str):
+    """Create ``container_id`` (if missing) with the same key, unique-key and indexing policies."""
+    return await _open_async_container(get_async_client(), container_id, True)
+
+async def _open_async_container(client, container_id: str, create: bool):
+    if not create:
+        # Proxies only; nothing is sent until the first call (see AsyncCompanyRepository.warm_up)
+        return client.get_database_client(COSMOS_DB).get_container_client(container_id)
+
+    try:
+        database = await client.create_database_if_not_exists(id=COSMOS_DB)
+    except exceptions.CosmosResourceExistsError:
+        database = client.get_database_client(COSMOS_DB)
+
+    try:
+        container = await database.create_container_if_not_exists(
+            id=container_id,
+            partition_key=PartitionKey(path="/pk"),
+            offer_throughput=None,
+            autoscale_throughput=COSMOS_AUTOSCALE_MAX_RU,
+            unique_key_policy=UNIQUE_KEY_POLICY,
+            indexing_policy=INDEXING_POLICY,
+        )
+    except exceptions.CosmosResourceExistsError:
+        container = database.get_container_client(container_id)
+
+    return container
+
+async def close_async_client():
+    global _async_client, _async_container
+    if _async_client is not None:
+        await _async_client.close()
+    _async_client = None
+    _async_container = None
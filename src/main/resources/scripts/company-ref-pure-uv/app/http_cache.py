@@ -0,0 +1,44 @@
+"""
+HTTP caching for the read routes.
+
+``GET /companies/{pk}/{id}`` sends the document's ``_etag`` as its
+``ETag`` with ``Cache-Control: no-cache``: clients and shared caches may
+keep the body but revalidate it with ``If-None-Match`` on each use, and
+get an empty ``304 Not Modified`` while the document is unchanged.
+Search and lookup results have no single version to validate, so they
+get a short ``max-age`` instead, no longer than the service's own stale-
+read window by default.
+"""
+import os
+from typing import Optional
+from fastapi import Response
+from app.cache import COMPANY_CACHE_TTL_SECONDS
+
+# Seconds clients may reuse search and lookup responses; 0 sends no-cache
+SEARCH_CACHE_MAX_AGE = int(os.environ.get("SEARCH_CACHE_MAX_AGE", str(int(COMPANY_CACHE_TTL_SECONDS))))
+LOOKUP_CACHE_MAX_AGE = int(os.environ.get("LOOKUP_CACHE_MAX_AGE", str(int(COMPANY_CACHE_TTL_SECONDS))))
+
+DOCUMENT_CACHE_CONTROL = "no-cache"
+
+
+def cache_control(max_age: int) -> str:
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def _opaque(tag: str) -> str:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an ``If-None-Match`` header value matches ``etag`` (``*`` matches any)."""
+    if not if_none_match or not etag:
+        return False
+    tags = {_opaque(t) for t in if_none_match.split(",")}
+    return "*" in tags or _opaque(etag) in tags
+
+
+def not_modified(etag: str, cache_control: str = DOCUMENT_CACHE_CONTROL) -> Response:
+    """An empty ``304`` carrying the headers a ``200`` would have had for caching."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
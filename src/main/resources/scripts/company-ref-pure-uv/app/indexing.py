@@ -0,0 +1,172 @@
+"""
+Indexing policy derived from the queries the repository issues.
+
+Rather than indexing every path and excluding a few, the policy includes
+only the properties some query filters or orders on. Each query builder
+in :class:`BaseCompanyRepository` is run once with placeholder arguments
+and its ``WHERE`` and ``ORDER BY`` clauses are parsed. A new query shape
+therefore brings its index with it, and every write stops paying to
+index ``major_shareholders``, ``board_members``, ``anti_takeover`` and
+the other unqueried subtrees.
+
+A shape that orders by several properties, or that filters on one
+property and orders by another, gets a composite index. A filter and
+``ORDER BY`` on the same single property (the prefix search) is served
+by that property's range index, so it needs none.
+
+Existing containers keep the policy they were created with. Run
+``python -m app.indexing`` to see the difference and ``--apply`` to
+replace it. Cosmos rebuilds the index online, and ``--wait`` polls
+until that finishes.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.cache import TTLCache
+from app.repository.base import KEY_FIELDS, BaseCompanyRepository
+
+IndexOrder = Tuple[str, str]
+
+INDEX_PROGRESS_HEADER = "x-ms-documentdb-collection-index-transformation-progress"
+
+
+def parse_shape(query: str) -> Dict[str, Tuple]:
+    """Properties a query filters on and orders by (top-level ``c.<field>`` references)."""
+    where = re.search(r"\bWHERE (.*?)(?= ORDER BY |$)", query)
+    order = re.search(r"\bORDER BY (.*)$", query)
+    filters = tuple(dict.fromkeys(re.findall(r"c\.(\w+)", where.group(1) if where else "")))
+    order = order.group(1) if order else ""
+    order_by = tuple((f, "descending" if d.upper() == "DESC" else "ascending")
+                     for f, d in re.findall(r"c\.(\w+)(?:\s+(ASC|DESC))?", order, flags=re.IGNORECASE))
+    return {"filters": filters, "order_by": order_by}
+
+
+def query_shapes(repo: Optional[BaseCompanyRepository] = None) -> Dict[str, Dict[str, Tuple]]:
+    """The shape of every query the repositories build, keyed by query name."""
+    repo = repo or BaseCompanyRepository(cache=TTLCache(max_items=0))
+    queries = {
+        "find_by_name_exact": repo._name_exact_query("x"),
+        "search_by_name_prefix": repo._prefix_query("x", 1, after="x"),
+        "find_by_keys": repo._keys_query("x", "x", "x"),
+        **{f"find_many_by_keys.{field}": repo._keys_in_query(field, ["x"]) for field in KEY_FIELDS},
+        "list_companies": repo._list_query(),
+        "scan_search_fields": repo._search_fields_query(),
+        "scan_names": repo._names_query(),
+        "scan_ids": repo._ids_query(),
+    }
+    return {name: parse_shape(query) for name, (query, _) in queries.items()}
+
+
+def build_indexing_policy(shapes: Dict[str, Dict[str, Tuple]]) -> Dict[str, Any]:
+    paths = sorted({f for s in shapes.values() for f in (*s["filters"], *(f for f, _ in s["order_by"]))})
+    composites: List[List[Dict[str, str]]] = []
+    for shape in shapes.values():
+        if not shape["order_by"]:
+            continue
+        ordered = [f for f, _ in shape["order_by"]]
+        # Equality filters lead the composite, then the ORDER BY properties in order
+        keys: List[IndexOrder] = [(f, "ascending") for f in shape["filters"] if f not in ordered]
+        keys += list(shape["order_by"])
+        composite = [{"path": f"/{f}", "order": o} for f, o in keys]
+        if len(composite) > 1 and composite not in composites:
+            composites.append(composite)
+    return {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": [{"path": f"/{p}/?"} for p in paths],
+        "excludedPaths": [{"path": "/*"}, {"path": "/\"_etag\"/?"}],
+        "compositeIndexes": composites,
+    }
+
+
+INDEXING_POLICY = build_indexing_policy(query_shapes())
+
+
+def policy_diff(current: Dict[str, Any], desired: Dict[str, Any] = INDEXING_POLICY) -> Dict[str, List]:
+    """Included/excluded paths and composite indexes to add or remove; empty when equivalent."""
+    def paths(policy, key):
+        return {p["path"] for p in policy.get(key, [])}
+
+    def composites(policy):
+        return {json.dumps([[c["path"], c.get("order", "ascending")] for c in comp])
+                for comp in policy.get("compositeIndexes", [])}
+
+    diff = {}
+    for key in ("includedPaths", "excludedPaths"):
+        add, remove = paths(desired, key) - paths(current, key), paths(current, key) - paths(desired, key)
+        if add:
+            diff[f"add_{key}"] = sorted(add)
+        if remove:
+            diff[f"remove_{key}"] = sorted(remove)
+    add, remove = composites(desired) - composites(current), composites(current) - composites(desired)
+    if add:
+        diff["add_compositeIndexes"] = [json.loads(c) for c in sorted(add)]
+    if remove:
+        diff["remove_compositeIndexes"] = [json.loads(c) for c in sorted(remove)]
+    return diff
+
+
+def index_progress(container) -> int:
+    """Percent complete of an index rebuild after a policy change (100 when idle)."""
+    headers: Dict[str, str] = {}
+    container.read(populate_quota_info=True, response_hook=lambda h, _: headers.update(h))
+    return int(headers.get(INDEX_PROGRESS_HEADER, 100))
+
+
+def apply_policy(database, container_id: str, policy: Dict[str, Any] = INDEXING_POLICY):
+    """Replace the container's indexing policy.
+
+    ``replace_container`` rebuilds the container definition from the arguments
+    it is given, so the partition key, default TTL, conflict resolution policy
+    and analytical store TTL are read and passed back; any other property of
+    the container is not carried over.
+    """
+    from azure.cosmos import PartitionKey
+
+    properties = database.get_container_client(container_id).read()
+    return database.replace_container(
+        container_id,
+        partition_key=PartitionKey(path=properties["partitionKey"]["paths"][0]),
+        indexing_policy=policy,
+        default_ttl=properties.get("defaultTtl"),
+        conflict_resolution_policy=properties.get("conflictResolutionPolicy"),
+        analytical_storage_ttl=properties.get("analyticalStorageTtl"),
+    )
+
+
+def main(argv=None):
+    from app.db import COSMOS_CONTAINER, COSMOS_DB, get_client
+
+    parser = argparse.ArgumentParser(description="Compare or apply the derived indexing policy")
+    parser.add_argument("--container", default=COSMOS_CONTAINER, help="Container (default: COSMOS_CONTAINER)")
+    parser.add_argument("--apply", action="store_true", help="Replace the container's policy if it differs")
+    parser.add_argument("--wait", action="store_true", help="With --apply, poll until the index rebuild finishes")
+    parser.add_argument("--print", dest="print_policy", action="store_true", help="Only print the derived policy")
+    args = parser.parse_args(argv)
+
+    if args.print_policy:
+        print(json.dumps(INDEXING_POLICY, indent=2))
+        return 0
+
+    database = get_client().get_database_client(COSMOS_DB)
+    container = database.get_container_client(args.container)
+    diff = policy_diff(container.read()["indexingPolicy"])
+    print(json.dumps({"container": args.container, "diff": diff}, indent=2))
+    if not diff or not args.apply:
+        return 0 if not diff else 1
+
+    apply_policy(database, args.container)
+    while args.wait:
+        progress = index_progress(container)
+        print(f"index rebuild: {progress}%")
+        if progress >= 100:
+            break
+        time.sleep(5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,76 @@
-from fastapi import FastAPI
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.change_feed import CHANGE_FEED_ENABLED, ChangeFeedProcessor
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware, compression_stats
+from app.db import CosmosNotConfiguredError
+from app.metrics import MetricsMiddleware, registry
+from app.rate_limit import RequestThrottledError
+from app.repository.postgres_company_repository import PostgresCompanyRepository
+from app.repository.protocol import ChangeFeedSource
+from app.repository.sqlite_company_repository import SQLiteCompanyRepository
 from app.routers import companies
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the async Cosmos client (or the SQLite database) once per worker and
+    # warm it up before the worker accepts traffic; requests share its connection pool
+    app.state.ready = False
+    app.state.change_feed = None
+    start = time.perf_counter()
+    try:
+        await companies.svc.repo.warm_up()
+    except CosmosNotConfiguredError as e:
+        logger.warning("Starting without Cosmos DB: %s", e)
+    except Exception:
+        # Requests retry the container lazily; /ready stays 503
+        logger.exception("Cosmos warm-up failed")
+    else:
+        if CHANGE_FEED_ENABLED and not isinstance(companies.svc.repo, ChangeFeedSource):
+            logger.warning("CHANGE_FEED_ENABLED is ignored: the %s backend has no change feed",
+                           type(companies.svc.repo).__name__)
+        elif CHANGE_FEED_ENABLED:
+            # Take the feed position before loading, so changes made during the load are replayed
+            feed = ChangeFeedProcessor(companies.svc.repo, companies.svc.change_consumers())
+            try:
+                await feed.prime()
+                app.state.change_feed = feed
+            except Exception:
+                # Local copies then only see this worker's writes until restart
+                logger.exception("Change feed start failed")
+        try:
+            await companies.svc.load_search_index()
+        except Exception:
+            # Search falls back to Cosmos while the index is cold
+            logger.exception("Search index load failed")
+        try:
+            await companies.svc.load_name_filter()
+        except Exception:
+            # Validate queries Cosmos for every name while the filter is cold
+            logger.exception("Name filter load failed")
+        try:
+            await companies.svc.load_match_index()
+        except Exception:
+            # Match ranks a Cosmos prefix query while the index is cold
+            logger.exception("Match index load failed")
+        app.state.ready = True
+        if app.state.change_feed is not None:
+            app.state.change_feed.start()
+            if companies.svc.name_filter is not None:
+                companies.svc.name_filter.follow(app.state.change_feed)
+        elif companies.svc.name_filter is not None:
+            logger.warning("The name filter needs the change feed; validate queries Cosmos for every name")
+    app.state.warm_up_seconds = round(time.perf_counter() - start, 3)
+    yield
+    if app.state.change_feed is not None:
+        await app.state.change_feed.stop()
+    await companies.svc.repo.close()
+
 app = FastAPI(
     title="Company Reference API",
     version="1.0.0",
@@ -11,16 +81,65 @@ Key features:
 - Unique keys on name (normalized), LEI, and ticker
 - Validate existence by name (`/companies/validate?name=...`)
 - CRUD + search by name prefix + key lookups
-"""
+""",
+    lifespan=lifespan,
 )
 
 app.include_router(companies.router)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+# Added last, so request durations include compression
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(CosmosNotConfiguredError)
+async def cosmos_not_configured(request: Request, exc: CosmosNotConfiguredError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.exception_handler(RequestThrottledError)
+async def request_throttled(request: Request, exc: RequestThrottledError):
+    # Shed by the RU budget, or still throttled by Cosmos after the retries
+    return JSONResponse(status_code=429, content={"detail": exc.message},
+                        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-route, per-operation Cosmos RU/latency histograms in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 only once this worker's Cosmos warm-up has succeeded."""
+    warm_up_seconds = getattr(app.state, "warm_up_seconds", None)
+    if getattr(app.state, "ready", False):
+        return {"status": "ready", "warm_up_seconds": warm_up_seconds}
+    return JSONResponse(status_code=503, content={"status": "not_ready", "warm_up_seconds": warm_up_seconds})
 
 @app.get("/health")
 def health():
+    repo = companies.svc.repo
+    stats = {"cache": repo.cache.stats(), "query_routing": repo.routing_stats(),
+             "partitioning": {"strategy": repo.partitioner.name, "fallback_reads": repo.fallback_reads}}
+    if companies.svc.search_index is not None:
+        stats["search_index"] = companies.svc.search_index.stats()
+    if companies.svc.name_filter is not None:
+        stats["name_filter"] = companies.svc.name_filter.stats()
+    if companies.svc.match_index is not None:
+        stats["match_index"] = companies.svc.match_index.stats()
+    if companies.svc.single_flight is not None:
+        stats["single_flight"] = companies.svc.single_flight.stats()
+    if repo.scheduler is not None:
+        stats["rate_limit"] = repo.scheduler.stats()
+    if COMPRESSION_ENABLED:
+        stats["compression"] = compression_stats.stats()
+    if getattr(app.state, "change_feed", None) is not None:
+        stats["change_feed"] = app.state.change_feed.stats()
+    if isinstance(repo, SQLiteCompanyRepository):
+        return {"status": "ok", "database": "sqlite", "path": repo.path, **stats}
+    if isinstance(repo, PostgresCompanyRepository):
+        return {"status": "ok", "database": "postgres", "pool": repo.pool_stats(), **stats}
     try:
         from app.db import get_client
         get_client()  # This will raise an error if not configured
-        return {"status": "ok", "database": "connected"}
+        return {"status": "ok", "database": "connected", **stats}
     except RuntimeError as e:
-        return {"status": "ok", "database": "not_configured", "message": str(e)}
+        return {"status": "ok", "database": "not_configured", "message": str(e), **stats}
@@ -0,0 +1,163 @@
+import heapq
+import os
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+from app.utils import normalize_name
+
+MATCH_INDEX_ENABLED = os.environ.get("MATCH_INDEX_ENABLED", "false").lower() == "true"
+# Candidates scoring below this are not returned
+MATCH_MIN_SCORE = float(os.environ.get("MATCH_MIN_SCORE", "0.3"))
+# Ids scored per lookup before rarer features stop being followed by commoner ones
+MATCH_MAX_CANDIDATES = int(os.environ.get("MATCH_MAX_CANDIDATES", "2000"))
+
+# Trailing words that only say what kind of legal entity a company is
+LEGAL_SUFFIXES = frozenset({
+    "inc", "incorporated", "corp", "corporation", "co", "company", "cos", "ltd", "limited", "llc", "llp", "lp",
+    "plc", "sa", "ag", "nv", "bv", "se", "spa", "gmbh", "kg", "oy", "ab", "as", "asa", "pte", "pty", "sarl",
+})
+
+MATCH_FIELDS = ("id", "pk", "name")
+
+
+def canonical_name(name: str) -> str:
+    """``normalize_name`` without punctuation, a leading "the" or trailing legal suffixes.
+
+    "Apple, Inc.", "Apple Inc" and "APPLE INCORPORATED" are all "apple".
+    The last remaining word is never stripped.
+    """
+    tokens = re.sub(r"[^\w\s]", " ", normalize_name(name).replace("&", " and ")).split()
+    # "S.A." and "N.V." split into single letters; rejoin runs of them
+    joined: List[str] = []
+    run = False
+    for t in tokens:
+        single = len(t) == 1 and t.isalpha()
+        if single and run:
+            joined[-1] += t
+        else:
+            joined.append(t)
+        run = single
+    core = joined[1:] if len(joined) > 1 and joined[0] == "the" else joined
+    # "& Co." leaves a dangling "and" behind
+    while len(core) > 1 and (core[-1] in LEGAL_SUFFIXES or core[-1] == "and"):
+        core = core[:-1]
+    return " ".join(core)
+
+
+def features(canonical: str) -> FrozenSet[str]:
+    """Character trigrams of the padded name, plus each whole word (``#word``)."""
+    padded = f"  {canonical} "
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    return frozenset(grams | {f"#{t}" for t in canonical.split()})
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Dice coefficient of two feature sets: 1.0 for identical canonical names."""
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class MatchIndex:
+    """In-memory trigram and token index for fuzzy ``/companies/match``.
+
+    Names are reduced to :func:`canonical_name` and broken into
+    :func:`features`. An inverted index maps each feature to the ids whose
+    name has it. A lookup follows the query's features rarest first and
+    scores each id it meets by the Dice coefficient of the two feature
+    sets. It stops once an id not met yet could no longer make the top
+    ``limit``, or after ``MATCH_MAX_CANDIDATES`` ids, so a query made of
+    common words does not score half the index. Until :meth:`load` has run
+    the index is cold and callers should fall back to Cosmos.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, set] = {}
+        self._features: Dict[str, FrozenSet[str]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def load(self, docs: Iterable[Dict[str, Any]]) -> None:
+        self._postings = {}
+        self._features = {}
+        self._docs = {}
+        for doc in docs:
+            self._add(doc)
+        self.ready = True
+
+    def _add(self, doc: Dict[str, Any]) -> None:
+        if not doc.get("name"):
+            return
+        feats = features(canonical_name(doc["name"]))
+        for f in feats:
+            self._postings.setdefault(f, set()).add(doc["id"])
+        self._features[doc["id"]] = feats
+        self._docs[doc["id"]] = {f: doc.get(f) for f in MATCH_FIELDS}
+
+    def upsert(self, doc: Dict[str, Any]) -> None:
+        self.remove(doc["id"])
+        self._add(doc)
+
+    def remove(self, id: str) -> None:
+        self._docs.pop(id, None)
+        for f in self._features.pop(id, ()):
+            ids = self._postings.get(f)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._postings[f]
+
+    def held_keys(self) -> Iterable[Tuple[str, str]]:
+        return [(id, doc["pk"]) for id, doc in self._docs.items()]
+
+    # Change-feed consumer
+    def on_upsert(self, doc: Dict[str, Any]) -> None:
+        self.upsert(doc)
+
+    def on_delete(self, id: str, pk: str) -> None:
+        self.remove(id)
+
+    def match(self, name: str, limit: int = 10, min_score: float = MATCH_MIN_SCORE,
+              max_candidates: int = MATCH_MAX_CANDIDATES) -> List[Dict[str, Any]]:
+        """Up to ``limit`` companies whose names resemble ``name``, best first, with their scores."""
+        query = features(canonical_name(name))
+        n = len(query)
+        postings, known = self._postings, self._features
+        floor = min_score
+        seen: set = set()
+        best: List[Tuple[float, str]] = []
+        for i, f in enumerate(sorted(query, key=lambda f: len(postings.get(f, ())))):
+            # An id first met here shares none of the rarer features: at most n - i in common
+            if 2 * (n - i) / (2 * n - i) < floor or len(seen) >= max_candidates:
+                break
+            new = postings.get(f, set()) - seen
+            seen |= new
+            for id in new:
+                feats = known[id]
+                score = 2 * len(query & feats) / (n + len(feats))
+                if score < floor:
+                    continue
+                if len(best) < limit:
+                    heapq.heappush(best, (score, id))
+                else:
+                    heapq.heappushpop(best, (score, id))
+                if len(best) == limit:
+                    floor = max(floor, best[0][0])
+        ranked = sorted(best, key=lambda s: (-s[0], self._docs[s[1]]["name"]))
+        return [{**self._docs[id], "score": round(score, 3)} for score, id in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "size": len(self._docs), "features": len(self._postings)}
+
+
+def rank(name: str, docs: Iterable[Dict[str, Any]], limit: int = 10,
+         min_score: float = MATCH_MIN_SCORE) -> List[Dict[str, Any]]:
+    """Score and order candidate documents the way :meth:`MatchIndex.match` does."""
+    query = features(canonical_name(name))
+    scored = []
+    for doc in docs:
+        score = similarity(query, features(canonical_name(doc["name"])))
+        if score >= min_score:
+            scored.append((-score, doc["name"], {**{f: doc.get(f) for f in MATCH_FIELDS}, "score": round(score, 3)}))
+    scored.sort(key=lambda s: s[:2])
+    return [doc for _, _, doc in scored[:limit]]
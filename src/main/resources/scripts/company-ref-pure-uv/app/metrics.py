@@ -0,0 +1,249 @@
+"""
+Cosmos RU charge and latency instrumentation, exposed in Prometheus text format.
+
+Every repository call to Cosmos runs inside :func:`cosmos_call`, which
+passes a :class:`CosmosCall` to the SDK as ``response_hook`` and collects
+the request charge, server-side duration and throttle retries of each
+response (a query reports one response per page). The ASGI
+:class:`MetricsMiddleware` attributes the calls made while serving a
+request to its route template, so histograms are labelled by
+``route`` and ``operation`` (the repository method or query name).
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from azure.cosmos import exceptions
+
+METRICS_RESPONSE_HEADERS = os.environ.get("METRICS_RESPONSE_HEADERS", "false").lower() == "true"
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+REQUEST_DURATION_HEADER = "x-ms-request-duration-ms"
+THROTTLE_RETRY_HEADER = "x-ms-throttle-retry-count"
+
+RU_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 250, 500, 1000)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+ITEM_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000)
+
+# Route label for Cosmos calls made outside an HTTP request (startup, CLI)
+NO_ROUTE = "-"
+
+
+class Histogram:
+    """Cumulative-bucket histogram for one label set."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class CosmosCall:
+    """``response_hook`` for one repository call; accumulates every response it sees."""
+
+    __slots__ = ("operation", "request_charge", "server_ms", "retries", "responses", "items", "seconds", "_start")
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.request_charge = 0.0
+        self.server_ms = 0.0
+        self.retries = 0
+        self.responses = 0
+        self.items = 0
+        self.seconds = 0.0
+        self._start = time.perf_counter()
+
+    def __call__(self, headers: Dict[str, Any], result: Any = None) -> None:
+        # query_items also calls the hook once up front, with the pager and the
+        # previous response's headers; only per-page calls carry this query's charge
+        if hasattr(result, "by_page"):
+            return
+        self.responses += 1
+        self.request_charge += float(headers.get(REQUEST_CHARGE_HEADER) or 0)
+        self.server_ms += float(headers.get(REQUEST_DURATION_HEADER) or 0)
+        self.retries += int(headers.get(THROTTLE_RETRY_HEADER) or 0)
+
+    def finish(self) -> None:
+        self.seconds = time.perf_counter() - self._start
+
+
+class RequestStats:
+    """Cosmos calls made while serving one HTTP request."""
+
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls: List[CosmosCall] = []
+
+    @property
+    def request_charge(self) -> float:
+        return sum(c.request_charge for c in self.calls)
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"x-request-charge", f"{self.request_charge:.2f}".encode()),
+            (b"x-cosmos-calls", str(len(self.calls)).encode()),
+            (b"x-cosmos-server-ms", f"{sum(c.server_ms for c in self.calls):.2f}".encode()),
+            (b"x-cosmos-retries", str(sum(c.retries for c in self.calls)).encode()),
+        ]
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class MetricsRegistry:
+    """Histograms keyed by (metric, labels), rendered in Prometheus text format."""
+
+    # name -> (type, help, label names, buckets)
+    METRICS = {
+        "cosmos_request_charge": ("histogram", "Request units charged per Cosmos call", ("route", "operation"), RU_BUCKETS),
+        "cosmos_server_latency_seconds": ("histogram", "Server-side duration reported by Cosmos per call", ("route", "operation"), LATENCY_BUCKETS),
+        "cosmos_client_latency_seconds": ("histogram", "Client-observed duration per Cosmos call, including retries and paging", ("route", "operation"), LATENCY_BUCKETS),
+        "cosmos_items": ("histogram", "Items returned or written per Cosmos call", ("route", "operation"), ITEM_BUCKETS),
+        "cosmos_throttle_retries_total": ("counter", "Throttled (429) retries made by the SDK", ("route", "operation"), None),
+        "http_request_charge": ("histogram", "Request units charged per HTTP request", ("method", "route"), RU_BUCKETS),
+        "http_request_duration_seconds": ("histogram", "HTTP request duration", ("method", "route"), LATENCY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+    def _histogram(self, name: str, labels: Tuple[str, ...]) -> Histogram:
+        key = (name, labels)
+        h = self._series.get(key)
+        if h is None:
+            h = self._series[key] = Histogram(self.METRICS[name][3])
+        return h
+
+    def observe_call(self, route: str, call: CosmosCall) -> None:
+        labels = (route, call.operation)
+        with self._lock:
+            self._histogram("cosmos_request_charge", labels).observe(call.request_charge)
+            self._histogram("cosmos_server_latency_seconds", labels).observe(call.server_ms / 1000)
+            self._histogram("cosmos_client_latency_seconds", labels).observe(call.seconds)
+            self._histogram("cosmos_items", labels).observe(call.items)
+            key = ("cosmos_throttle_retries_total", labels)
+            self._series[key] = self._series.get(key, 0) + call.retries
+
+    def observe_request(self, method: str, route: str, stats: RequestStats, seconds: float) -> None:
+        labels = (method, route)
+        for call in stats.calls:
+            self.observe_call(route, call)
+        with self._lock:
+            self._histogram("http_request_charge", labels).observe(stats.request_charge)
+            self._histogram("http_request_duration_seconds", labels).observe(seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda kv: kv[0])
+            series = [(k, v if isinstance(v, (int, float)) else _snapshot(v)) for k, v in series]
+        lines: List[str] = []
+        last = None
+        for (name, labels), value in series:
+            kind, help_text, label_names, _ = self.METRICS[name]
+            if name != last:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                last = name
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+            if kind == "counter":
+                lines.append(f"{name}{{{base}}} {value}")
+                continue
+            buckets, counts, total, count = value
+            cumulative = 0
+            for le, n in zip((*buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{base}}} {total}")
+            lines.append(f"{name}_count{{{base}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _snapshot(h: Histogram):
+    return h.buckets, list(h.counts), h.sum, h.count
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def cosmos_call(operation: str) -> Iterator[CosmosCall]:
+    """Time one repository call and attribute it to the current request.
+
+    Pass the yielded object as the SDK ``response_hook`` and set ``items``
+    once the result is known. Works across ``await`` as well.
+    """
+    call = CosmosCall(operation)
+    try:
+        yield call
+    except exceptions.CosmosHttpResponseError as e:
+        # Failed calls (404, 409, 429 after retries) are charged too; their headers ride on the error
+        if not call.responses and e.headers:
+            call(e.headers)
+        raise
+    finally:
+        call.finish()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.calls.append(call)
+        else:
+            registry.observe_call(NO_ROUTE, call)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: collects each request's Cosmos calls and records
+    them under the matched route template once the response has been sent.
+
+    With ``echo_headers`` the RU charge, call count, server time and retries
+    of the Cosmos calls made before the response started are added as
+    ``x-request-charge`` / ``x-cosmos-*`` response headers.
+    """
+
+    def __init__(self, app, metrics: MetricsRegistry = registry, echo_headers: bool = METRICS_RESPONSE_HEADERS):
+        self.app = app
+        self.metrics = metrics
+        self.echo_headers = echo_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *stats.headers()]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.echo_headers else send)
+        finally:
+            _request_stats.reset(token)
+            # FastAPI stores the matched APIRoute in the scope; unmatched paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            if path != "/metrics":
+                self.metrics.observe_request(scope["method"], path, stats, time.perf_counter() - start)
@@ -0,0 +1,200 @@
+"""
+Copy companies into a new container partitioned with another strategy.
+
+Usage:
+    python -m app.migrate_partitions --target companies_v2 --strategy hash --buckets 64
+    python -m app.migrate_partitions --target companies_v2 --follow 600 --ru-per-second 2000
+    python -m app.migrate_partitions --target companies_v2 --verify-only --prune
+
+The copy runs online. The source's change-feed position is taken first.
+Every document is then upserted into the target under its new ``pk``,
+``--concurrency`` writes at a time. Changes made during the copy are
+replayed from the feed afterwards, and ``--follow SECONDS`` keeps
+replaying for the cutover window. ``--ru-per-second`` paces the reads
+and writes of both containers so the copy leaves room for live traffic. Finally both containers are listed to
+compare ids and to report how evenly each one's partitions are filled.
+Documents deleted from the source during the copy show up as ``extra``.
+Companies renamed during the copy leave a ``misplaced`` copy under their
+old pk. ``--prune`` deletes both kinds from the target.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from azure.cosmos import exceptions
+from app.partitioning import PARTITION_BUCKETS, get_partitioner
+from app.rate_limit import RequestThrottledError, RUScheduler
+from app.repository.async_company_repository import AsyncCompanyRepository
+
+MIGRATION_PAGE_SIZE = int(os.environ.get("MIGRATION_PAGE_SIZE", "1000"))
+MIGRATION_CONCURRENCY = int(os.environ.get("MIGRATION_CONCURRENCY", "32"))
+# Ids listed per kind of difference in the report
+REPORT_SAMPLE_IDS = 20
+
+
+async def copy_documents(docs: List[Dict[str, Any]], target: AsyncCompanyRepository, sem: asyncio.Semaphore,
+                         failed: List[Dict[str, Any]]) -> None:
+    async def copy(doc):
+        async with sem:
+            try:
+                await target.import_document(doc)
+            except (exceptions.CosmosHttpResponseError, RequestThrottledError) as e:
+                failed.append({"id": doc["id"], "status_code": e.status_code, "error": e.message})
+
+    await asyncio.gather(*(copy(doc) for doc in docs))
+
+
+async def feed_position(source: AsyncCompanyRepository) -> Dict[str, Optional[str]]:
+    """The source's current change-feed token per partition key range."""
+    return {r: (await source.read_change_feed(r, None))[1] for r in await source.feed_ranges()}
+
+
+async def catch_up(source: AsyncCompanyRepository, target: AsyncCompanyRepository, tokens: Dict[str, Optional[str]],
+                   sem: asyncio.Semaphore, failed: List[Dict[str, Any]]) -> int:
+    """Replay source changes since ``tokens`` (advanced in place) into ``target``."""
+    replayed = 0
+    for range_id, token in tokens.items():
+        docs, tokens[range_id] = await source.read_change_feed(range_id, token)
+        await copy_documents(docs, target, sem, failed)
+        replayed += len(docs)
+    return replayed
+
+
+async def list_keys(repo: AsyncCompanyRepository, page_size: int = MIGRATION_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """``{id, pk, name}`` for every document."""
+    docs: List[Dict[str, Any]] = []
+    async for page in repo.iter_pages(page_size, fields=("name",)):
+        docs.extend(page)
+    return docs
+
+
+def partition_spread(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    sizes = Counter(doc["pk"] for doc in docs)
+    mean = len(docs) / len(sizes) if sizes else 0
+    largest = max(sizes.values(), default=0)
+    return {
+        "partitions": len(sizes),
+        "largest": largest,
+        "mean": round(mean, 1),
+        # 1.0 is perfectly even
+        "skew": round(largest / mean, 2) if mean else None,
+    }
+
+
+async def verify(source: AsyncCompanyRepository, target: AsyncCompanyRepository, prune: bool = False,
+                 page_size: int = MIGRATION_PAGE_SIZE) -> Dict[str, Any]:
+    """Compare the containers by id. A target copy is misplaced when its pk is
+    not the one the source document's current name maps to.
+    """
+    source_docs = await list_keys(source, page_size)
+    target_docs = await list_keys(target, page_size)
+    expected = {d["id"]: target.partitioner.pk(d["name"]) for d in source_docs}
+    placed, misplaced, extra = [], [], []
+    for doc in target_docs:
+        pk = expected.get(doc["id"])
+        (extra if pk is None else placed if doc["pk"] == pk else misplaced).append(doc)
+    missing = sorted(set(expected) - {d["id"] for d in placed})
+    if prune:
+        for doc in extra + misplaced:
+            await target.delete(doc["id"], doc["pk"])
+    return {
+        "source_count": len(source_docs),
+        "target_count": len(placed) if prune else len(target_docs),
+        "missing": len(missing),
+        "extra": len(extra),
+        "misplaced": len(misplaced),
+        "pruned": len(extra) + len(misplaced) if prune else 0,
+        "missing_ids": missing[:REPORT_SAMPLE_IDS],
+        "extra_ids": sorted(d["id"] for d in extra)[:REPORT_SAMPLE_IDS],
+        "source_partitions": partition_spread(source_docs),
+        "target_partitions": partition_spread(placed),
+    }
+
+
+async def migrate(source: AsyncCompanyRepository, target: AsyncCompanyRepository,
+                  page_size: int = MIGRATION_PAGE_SIZE, concurrency: int = MIGRATION_CONCURRENCY,
+                  follow_seconds: float = 0, follow_interval: float = 1.0, prune: bool = False) -> Dict[str, Any]:
+    """Copy, replay changes made meanwhile (for ``follow_seconds`` more), then verify."""
+    start = time.perf_counter()
+    sem = asyncio.Semaphore(concurrency)
+    failed: List[Dict[str, Any]] = []
+    tokens = await feed_position(source)
+    copied = 0
+    async for page in source.iter_pages(page_size):
+        await copy_documents(page, target, sem, failed)
+        copied += len(page)
+    copy_seconds = time.perf_counter() - start
+
+    replayed = await catch_up(source, target, tokens, sem, failed)
+    deadline = time.monotonic() + follow_seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(min(follow_interval, max(deadline - time.monotonic(), 0)))
+        replayed += await catch_up(source, target, tokens, sem, failed)
+
+    report = await verify(source, target, prune, page_size)
+    return {
+        "strategy": target.partitioner.name,
+        "copied": copied,
+        "replayed": replayed,
+        "failed": len(failed),
+        "failed_ids": [f["id"] for f in failed][:REPORT_SAMPLE_IDS],
+        "copy_seconds": round(copy_seconds, 3),
+        "docs_per_second": round(copied / copy_seconds, 1) if copy_seconds else None,
+        **report,
+    }
+
+
+def succeeded(report: Dict[str, Any]) -> bool:
+    leftovers = report["extra"] + report["misplaced"] - report["pruned"]
+    return report["missing"] == 0 and leftovers == 0 and not report.get("failed")
+
+
+async def run(args) -> Dict[str, Any]:
+    from app.db import close_async_client, create_async_container
+
+    # Both containers usually share the account's throughput, so they share one budget
+    scheduler = RUScheduler(args.ru_per_second) if args.ru_per_second else None
+    source = AsyncCompanyRepository(container_id=args.source, partitioner=get_partitioner(args.source_strategy),
+                                    scheduler=scheduler)
+    target = AsyncCompanyRepository(container_id=args.target, partitioner=get_partitioner(args.strategy, args.buckets),
+                                    scheduler=scheduler)
+    try:
+        if args.verify_only:
+            return await verify(source, target, args.prune, args.page_size)
+        target._container = await create_async_container(args.target)
+        return await migrate(source, target, args.page_size, args.concurrency, args.follow, prune=args.prune)
+    finally:
+        await close_async_client()
+
+
+def main(argv=None):
+    from app.db import COSMOS_CONTAINER
+
+    parser = argparse.ArgumentParser(description="Copy companies into a container with another partition strategy")
+    parser.add_argument("--source", default=COSMOS_CONTAINER, help="Container to copy from (default: COSMOS_CONTAINER)")
+    parser.add_argument("--source-strategy", default="first_letter", help="Partition strategy of the source")
+    parser.add_argument("--target", required=True, help="Container to copy into; created if missing")
+    parser.add_argument("--strategy", default="hash", choices=["hash", "first_letter"],
+                        help="Partition strategy of the target")
+    parser.add_argument("--buckets", type=int, default=PARTITION_BUCKETS, help="Hash buckets for --strategy hash")
+    parser.add_argument("--page-size", type=int, default=MIGRATION_PAGE_SIZE, help="Documents read per source page")
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONCURRENCY, help="Upserts in flight")
+    parser.add_argument("--ru-per-second", type=float,
+                        help="Pace the copy to this many request units per second (default: unpaced)")
+    parser.add_argument("--follow", type=float, default=0, metavar="SECONDS",
+                        help="Keep replaying source changes for this long after the copy")
+    parser.add_argument("--prune", action="store_true", help="Delete extra and misplaced documents from the target")
+    parser.add_argument("--verify-only", action="store_true", help="Only compare the two containers")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    return 0 if succeeded(result) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
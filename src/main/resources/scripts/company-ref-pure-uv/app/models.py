@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, HttpUrl, field_validator
+from pydantic import BaseModel, Field, HttpUrl, field_validator, model_validator
 from typing import Optional, List
 from datetime import date
 
@@ -67,3 +67,56 @@ class Company(CompanyCreate):
     id: str
     pk: str
     name_lower: str
+
+# Top-level document fields a client may select with ?fields=
+COMPANY_FIELDS = tuple(Company.model_fields)
+
+class CompanyMatch(BaseModel):
+    id: str
+    name: str
+
+class ValidationResult(BaseModel):
+    query: str
+    exists: bool
+    match: Optional[CompanyMatch] = None
+
+class MatchCandidate(BaseModel):
+    id: str
+    pk: str
+    name: str
+    score: float
+
+class MatchResult(BaseModel):
+    query: str
+    canonical: str
+    candidates: List[MatchCandidate]
+
+MAX_BATCH_LOOKUP = 5000
+
+# Upper bound for /companies/search page sizes
+MAX_SEARCH_PAGE_SIZE = 200
+MAX_MATCH_LIMIT = 50
+# Cosmos page size (max_item_count) for streaming GET /companies
+LIST_PAGE_SIZE = 1000
+MAX_LIST_PAGE_SIZE = 5000
+
+class BatchLookupRequest(BaseModel):
+    tickers: List[str] = Field(default_factory=list)
+    isins: List[str] = Field(default_factory=list)
+    leis: List[str] = Field(default_factory=list)
+    fields: Optional[List[str]] = Field(None, description="Fields to return; id and pk are always included")
+
+    @field_validator("fields")
+    @classmethod
+    def known_fields(cls, v):
+        unknown = [f for f in v or [] if f not in COMPANY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return v
+
+    @model_validator(mode="after")
+    def check_size(self):
+        total = len(self.tickers) + len(self.isins) + len(self.leis)
+        if total > MAX_BATCH_LOOKUP:
+            raise ValueError(f"at most {MAX_BATCH_LOOKUP} identifiers per request, got {total}")
+        return self
@@ -0,0 +1,122 @@
+import hashlib
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+NAME_FILTER_ENABLED = os.environ.get("NAME_FILTER_ENABLED", "false").lower() == "true"
+NAME_FILTER_CAPACITY = int(os.environ.get("NAME_FILTER_CAPACITY", "1000000"))
+NAME_FILTER_FP_RATE = float(os.environ.get("NAME_FILTER_FP_RATE", "0.01"))
+# Misses are only definite while the change feed has polled within this many seconds
+NAME_FILTER_MAX_LAG_SECONDS = float(os.environ.get("NAME_FILTER_MAX_LAG_SECONDS", "5"))
+
+
+class NameBloomFilter:
+    """Bloom filter over ``name_lower`` for negative ``/companies/validate`` answers.
+
+    ``might_contain`` never returns False for a name that was added, so a
+    False is a definite miss that needs no Cosmos query. A True may be a
+    false positive and is confirmed against Cosmos; callers report those
+    with :meth:`record_false_positive` so the observed rate shows up in
+    :meth:`stats`. Bits cannot be cleared, so deleted and renamed-away
+    names stay "maybe present" until the next :meth:`load`, which only
+    costs a query.
+
+    Names written by other workers only reach the filter through the
+    change feed, so a miss is definite only while the filter follows a
+    feed (:meth:`follow`) that has polled within ``max_lag`` seconds
+    (:meth:`current`). Before :meth:`load`, without a feed, or while
+    the feed lags, callers should go to Cosmos.
+    """
+
+    def __init__(self, capacity: int = NAME_FILTER_CAPACITY, fp_rate: float = NAME_FILTER_FP_RATE,
+                 max_lag: float = NAME_FILTER_MAX_LAG_SECONDS):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.max_lag = max_lag
+        self.feed: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._size(capacity)
+        self.items = 0
+        self.ready = False
+        self.checks = 0
+        self.definite_misses = 0
+        self.false_positives = 0
+
+    def _size(self, n: int) -> None:
+        # Optimal bit count and hash count for n items at the target false-positive rate
+        n = max(n, 1)
+        self.num_bits = max(8, math.ceil(-n * math.log(self.fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / n * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, name_lower: str):
+        # Kirsch-Mitzenmacher double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(name_lower.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def _add(self, name_lower: str) -> None:
+        for pos in self._positions(name_lower):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.items += 1
+
+    def load(self, names: Iterable[str]) -> None:
+        """Rebuild from every ``name_lower``, sized for at least twice the current count."""
+        names = [n for n in names if n]
+        with self._lock:
+            self._size(max(self.capacity, 2 * len(names)))
+            self.items = 0
+            for name_lower in names:
+                self._add(name_lower)
+            self.ready = True
+
+    def follow(self, feed: Any) -> None:
+        """Trust misses while ``feed`` (a running ChangeFeedProcessor) keeps up."""
+        self.feed = feed
+
+    def current(self) -> bool:
+        """Whether a miss is definite: loaded, and every worker's writes reach the filter in time."""
+        return self.ready and self.feed is not None and self.feed.caught_up(self.max_lag)
+
+    def add(self, name_lower: str) -> None:
+        if name_lower:
+            with self._lock:
+                self._add(name_lower)
+
+    # Change-feed consumer; deletes are ignored because bits cannot be cleared
+    def on_upsert(self, doc: Dict[str, Any]) -> None:
+        self.add(doc.get("name_lower"))
+
+    def on_delete(self, id: str, pk: str) -> None:
+        pass
+
+    def might_contain(self, name_lower: str) -> bool:
+        self.checks += 1
+        bits = self._bits
+        if all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(name_lower)):
+            return True
+        self.definite_misses += 1
+        return False
+
+    def record_false_positive(self) -> None:
+        self.false_positives += 1
+
+    def stats(self) -> Dict[str, Any]:
+        negatives = self.false_positives + self.definite_misses
+        return {
+            "ready": self.ready,
+            "current": self.current(),
+            "items": self.items,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "memory_bytes": len(self._bits),
+            "checks": self.checks,
+            "definite_misses": self.definite_misses,
+            "false_positives": self.false_positives,
+            # Share of absent names the filter let through to Cosmos
+            "false_positive_rate": round(self.false_positives / negatives, 4) if negatives else 0.0,
+            "expected_false_positive_rate": round(
+                (1 - math.exp(-self.num_hashes * self.items / self.num_bits)) ** self.num_hashes, 6),
+        }
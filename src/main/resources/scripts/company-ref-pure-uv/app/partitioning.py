@@ -0,0 +1,96 @@
+"""
+Partition key strategies.
+
+Every strategy derives ``pk`` from the company name alone, so the pk of
+any company can be computed without a lookup (``GET /companies/partition-key``)
+and exact-name queries stay single-partition whichever strategy is used.
+
+``first_letter``
+    The first character of the normalized name. Prefix search runs in one
+    partition, but there are only a few dozen logical partitions and the
+    common letters are far larger than the rest.
+``hash``
+    ``h`` plus a hex bucket of a stable hash of the normalized name
+    (``PARTITION_BUCKETS`` buckets). Names spread evenly, so writes and
+    storage no longer pile up on a few hot partitions; prefix search fans
+    out across partitions instead (or is served by the in-memory index).
+"""
+import hashlib
+import os
+from typing import Iterable, List, Optional, Tuple
+from app.utils import name_key, normalize_name, normalize_names
+
+PARTITION_STRATEGY = os.environ.get("PARTITION_STRATEGY", "first_letter")
+PARTITION_BUCKETS = int(os.environ.get("PARTITION_BUCKETS", "64"))
+# Strategy of COSMOS_FALLBACK_CONTAINER, the container a migration copied from
+FALLBACK_PARTITION_STRATEGY = os.environ.get("FALLBACK_PARTITION_STRATEGY", "first_letter")
+
+
+class FirstLetterPartitioner:
+    name = "first_letter"
+
+    def pk(self, name: str) -> str:
+        return name_key(name)[1]
+
+    def keys(self, name: str) -> Tuple[str, str]:
+        """``(name_lower, pk)``, normalizing the name once."""
+        return name_key(name)
+
+    def keys_many(self, names: Iterable[str]) -> List[Tuple[str, str]]:
+        return [(n, n[0] if n else "_") for n in normalize_names(names)]
+
+    def prefix_pk(self, prefix: str) -> Optional[str]:
+        # Every name starting with the prefix shares its first character, i.e. its pk
+        p = normalize_name(prefix)
+        return p[0] if p else None
+
+    def owns(self, pk: str) -> bool:
+        """Whether ``pk`` could have been produced by this strategy."""
+        return len(pk) == 1
+
+
+class HashPartitioner:
+    name = "hash"
+
+    def __init__(self, buckets: int = PARTITION_BUCKETS):
+        if buckets < 1:
+            raise ValueError("buckets must be at least 1")
+        self.buckets = buckets
+        self._width = len(format(buckets - 1, "x"))
+
+    def pk(self, name: str) -> str:
+        return self._bucket(normalize_name(name))
+
+    def keys(self, name: str) -> Tuple[str, str]:
+        n = normalize_name(name)
+        return n, self._bucket(n)
+
+    def keys_many(self, names: Iterable[str]) -> List[Tuple[str, str]]:
+        return [(n, self._bucket(n)) for n in normalize_names(names)]
+
+    def _bucket(self, normalized: str) -> str:
+        # blake2b rather than hash(): the bucket must be the same in every process and release
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+        return f"h{int.from_bytes(digest, 'little') % self.buckets:0{self._width}x}"
+
+    def prefix_pk(self, prefix: str) -> Optional[str]:
+        return None
+
+    def owns(self, pk: str) -> bool:
+        if len(pk) != 1 + self._width or pk[0] != "h":
+            return False
+        try:
+            return int(pk[1:], 16) < self.buckets
+        except ValueError:
+            return False
+
+
+Partitioner = FirstLetterPartitioner | HashPartitioner
+
+
+def get_partitioner(strategy: str = PARTITION_STRATEGY, buckets: int = PARTITION_BUCKETS) -> Partitioner:
+    if strategy == FirstLetterPartitioner.name:
+        return FirstLetterPartitioner()
+    if strategy == HashPartitioner.name:
+        return HashPartitioner(buckets)
+    raise ValueError(f"Unknown partition strategy: {strategy!r}")
@@ -0,0 +1,229 @@
+"""
+Client-side request-unit budget for the Cosmos calls a worker makes.
+
+:class:`RUScheduler` is a token bucket filled at ``RATE_LIMIT_RU_PER_SECOND``.
+Before each call it takes the operation's expected charge, an average
+of the ``x-ms-request-charge`` values seen for that operation. After the
+call it settles the difference. A caller that finds the bucket empty
+waits for it to refill. Callers queue in arrival order, because each one
+reserves its tokens before it sleeps.
+
+Operations have a priority:
+
+``high``
+    Point reads and writes. They wait up to ``RATE_LIMIT_MAX_WAIT_SECONDS``.
+``low``
+    Search, listing and identifier lookups. They may not dip into the
+    last ``RATE_LIMIT_RESERVE`` of the bucket. They are shed (HTTP 429)
+    once they would wait longer than ``RATE_LIMIT_LOW_PRIORITY_MAX_WAIT_SECONDS``,
+    so under load they give way to point reads.
+``background``
+    Bulk loads, scans, the change feed and migrations. They also stay out
+    of the reserve, but queue for as long as it takes.
+
+A 429 from Cosmos pauses every caller for its ``x-ms-retry-after-ms``.
+The call that got it retries after that delay plus jitter, up to
+``RATE_LIMIT_MAX_RETRIES`` times, so a burst does not come back as a
+synchronized second burst. The SDK's own throttle retries run first. A
+response that needed them (``x-ms-throttle-retry-count``) empties the
+bucket.
+"""
+import asyncio
+import itertools
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from azure.cosmos import exceptions
+from app.db import COSMOS_AUTOSCALE_MAX_RU
+from app.metrics import CosmosCall, cosmos_call
+
+T = TypeVar("T")
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "false").lower() == "true"
+# Workers sharing the container's throughput (the Procfile runs 4)
+RATE_LIMIT_WORKERS = int(os.environ.get("RATE_LIMIT_WORKERS", "4"))
+RATE_LIMIT_RU_PER_SECOND = float(os.environ.get("RATE_LIMIT_RU_PER_SECOND",
+                                                str(COSMOS_AUTOSCALE_MAX_RU / RATE_LIMIT_WORKERS)))
+# Bucket size in seconds of budget: how large a burst is let through at once
+RATE_LIMIT_BURST_SECONDS = float(os.environ.get("RATE_LIMIT_BURST_SECONDS", "1.0"))
+# Share of the bucket only high-priority operations may use
+RATE_LIMIT_RESERVE = float(os.environ.get("RATE_LIMIT_RESERVE", "0.2"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "2.0"))
+RATE_LIMIT_LOW_PRIORITY_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_LOW_PRIORITY_MAX_WAIT_SECONDS", "0.25"))
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+
+RETRY_AFTER_HEADER = "x-ms-retry-after-ms"
+
+HIGH, LOW, BACKGROUND = "high", "low", "background"
+# Operation (query name or item call, as in /metrics) -> priority; anything else is high
+OPERATION_PRIORITY = {
+    "search_by_name_prefix": LOW,
+    "list_companies": LOW,
+    "find_by_keys": LOW,
+    "find_many_by_keys": LOW,
+    "execute_item_batch": BACKGROUND,
+    "upsert_item": BACKGROUND,
+    "scan_search_fields": BACKGROUND,
+    "scan_names": BACKGROUND,
+    "scan_ids": BACKGROUND,
+    "read_change_feed": BACKGROUND,
+    "read_partition_key_ranges": BACKGROUND,
+}
+
+# Expected charge of an operation not seen yet
+DEFAULT_ESTIMATE = 5.0
+# Weight of each new observation in the per-operation average charge
+ESTIMATE_WEIGHT = 0.2
+# Backoff when a 429 carries no retry-after, doubled per attempt
+BASE_BACKOFF_SECONDS = 0.1
+# Retry delays are stretched by up to this fraction at random
+JITTER = 0.5
+
+
+class RequestThrottledError(RuntimeError):
+    """The RU budget or Cosmos turned a call away; try again after ``retry_after`` seconds."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float, message: str = "Request rate is too large"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.message = message
+
+
+def retry_after_seconds(error: exceptions.CosmosHttpResponseError) -> Optional[float]:
+    value = (getattr(error, "headers", None) or {}).get(RETRY_AFTER_HEADER)
+    return float(value) / 1000 if value else None
+
+
+async def run_call(operation: str, fn: Callable[[CosmosCall], Awaitable[T]],
+                   scheduler: Optional["RUScheduler"] = None) -> T:
+    """Run one Cosmos call, ``fn(call)`` with ``call`` as its ``response_hook``.
+
+    With a ``scheduler`` the call is paced and retried by it. Without one it
+    runs once, and a 429 that outlasted the SDK's retries still comes back
+    as :class:`RequestThrottledError` rather than a bare SDK error.
+    """
+    if scheduler is not None:
+        return await scheduler.run(operation, fn)
+    try:
+        with cosmos_call(operation) as call:
+            return await fn(call)
+    except exceptions.CosmosHttpResponseError as e:
+        if e.status_code != 429:
+            raise
+        raise RequestThrottledError(retry_after_seconds(e) or BASE_BACKOFF_SECONDS) from e
+
+
+class RUScheduler:
+    """Per-process token bucket of request units, with priorities and 429 backoff."""
+
+    def __init__(self, ru_per_second: float = RATE_LIMIT_RU_PER_SECOND,
+                 burst_seconds: float = RATE_LIMIT_BURST_SECONDS, reserve: float = RATE_LIMIT_RESERVE,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS,
+                 low_priority_max_wait: float = RATE_LIMIT_LOW_PRIORITY_MAX_WAIT_SECONDS,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES, clock: Callable[[], float] = time.monotonic):
+        if ru_per_second <= 0:
+            raise ValueError("ru_per_second must be positive")
+        self.ru_per_second = ru_per_second
+        self.capacity = ru_per_second * burst_seconds
+        self.reserve = reserve
+        self.max_wait = {HIGH: max_wait, LOW: low_priority_max_wait, BACKGROUND: float("inf")}
+        self.max_retries = max_retries
+        self._clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+        self.paused_until = 0.0
+        self.estimates: Dict[str, float] = {}
+        self.admitted = 0
+        self.queued = 0
+        self.waited_seconds = 0.0
+        self.shed = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.ru_per_second)
+        self._updated = now
+        return now
+
+    def estimate(self, operation: str) -> float:
+        return self.estimates.get(operation, DEFAULT_ESTIMATE)
+
+    async def acquire(self, operation: str, priority: Optional[str] = None) -> float:
+        """Wait until ``operation`` fits in the budget and take its expected charge.
+
+        Raises :class:`RequestThrottledError` instead when the wait would be
+        longer than the operation's priority (by default its
+        ``OPERATION_PRIORITY``) allows.
+        """
+        priority = priority or OPERATION_PRIORITY.get(operation, HIGH)
+        cost = self.estimate(operation)
+        now = self._refill()
+        floor = 0.0 if priority == HIGH else self.capacity * self.reserve
+        wait = max((cost + floor - self.tokens) / self.ru_per_second, self.paused_until - now, 0.0)
+        if wait > self.max_wait[priority]:
+            self.shed += 1
+            raise RequestThrottledError(wait)
+        # Taken before sleeping, so later callers queue behind this one
+        self.tokens -= cost
+        self.admitted += 1
+        if wait > 0:
+            self.queued += 1
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+        return cost
+
+    def settle(self, operation: str, estimate: float, charge: float, retries: int = 0) -> None:
+        """Replace the expected charge with the observed one and learn from it."""
+        self.tokens -= charge - estimate
+        if charge:
+            previous = self.estimates.get(operation)
+            self.estimates[operation] = charge if previous is None else (
+                previous + ESTIMATE_WEIGHT * (charge - previous))
+        if retries:
+            # The SDK was already being throttled: spend nothing more until the bucket refills
+            self.throttled += retries
+            self.tokens = min(self.tokens, 0.0)
+
+    def backoff(self, error: exceptions.CosmosHttpResponseError, attempt: int) -> float:
+        """Pause every caller for the 429's retry-after; return this caller's jittered delay."""
+        self.throttled += 1
+        delay = retry_after_seconds(error) or BASE_BACKOFF_SECONDS * 2 ** attempt
+        self.paused_until = max(self.paused_until, self._clock() + delay)
+        return delay * (1 + JITTER * random.random())
+
+    async def run(self, operation: str, fn: Callable[[CosmosCall], Awaitable[T]]) -> T:
+        for attempt in itertools.count():
+            estimate = await self.acquire(operation)
+            call = None
+            try:
+                with cosmos_call(operation) as call:
+                    return await fn(call)
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code != 429:
+                    raise
+                delay = self.backoff(e, attempt)
+                if attempt >= self.max_retries:
+                    raise RequestThrottledError(delay) from e
+            finally:
+                if call is not None:
+                    self.settle(operation, estimate, call.request_charge, call.retries)
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "ru_per_second": self.ru_per_second,
+            "tokens": round(self.tokens, 2),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "estimates": {op: round(ru, 2) for op, ru in sorted(self.estimates.items())},
+        }
@@ -0,0 +1,435 @@
+import asyncio
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Tuple, TypeVar
+from azure.cosmos import exceptions
+from app.cache import TTLCache
+from app.db import get_async_container, close_async_client
+from app.metrics import CosmosCall, cosmos_call
+from app.partitioning import Partitioner
+from app.rate_limit import BACKGROUND, RequestThrottledError, RUScheduler, run_call
+from app.repository.base import BaseCompanyRepository, Fields, MAX_PATCH_OPERATIONS, project
+from app.utils import non_empty
+
+# Cosmos caps a transactional batch at 100 operations
+MAX_BATCH_OPERATIONS = 100
+# Identifiers per IN (...) clause in batch lookups
+LOOKUP_CHUNK_SIZE = 256
+
+T = TypeVar("T")
+
+class AsyncCompanyRepository(BaseCompanyRepository):
+    """CompanyRepository on top of azure.cosmos.aio.
+
+    Every Cosmos round trip is awaited, so a single worker can keep many
+    requests in flight instead of parking one threadpool thread per call.
+
+    During a partition key migration cutover, ``fallback`` is a repository
+    over the old container. Point reads, updates and deletes addressed with
+    a pk from the old scheme are resolved through it to the document's pk
+    in this container.
+
+    With a ``scheduler`` every call is paced by its RU budget and retried
+    on 429; see :mod:`app.rate_limit`.
+    """
+
+    def __init__(self, cache: Optional[TTLCache] = None, partitioner: Optional[Partitioner] = None,
+                 container_id: Optional[str] = None, fallback: Optional["AsyncCompanyRepository"] = None,
+                 scheduler: Optional[RUScheduler] = None):
+        super().__init__(cache, partitioner)
+        self.container_id = container_id
+        self.fallback = fallback
+        self.scheduler = scheduler
+        self.fallback_reads = 0
+        self._container = None
+
+    async def open(self):
+        if self._container is None:
+            self._container = await get_async_container(self.container_id)
+        return self._container
+
+    async def close(self):
+        await close_async_client()
+        self._container = None
+
+    async def _call(self, operation: str, fn: Callable[[CosmosCall], Awaitable[T]]) -> T:
+        """Run ``fn(call)``, one Cosmos call passing ``call`` as its ``response_hook``."""
+        return await run_call(operation, fn, self.scheduler)
+
+    async def warm_up(self) -> None:
+        """Do the first-request work up front: resolve the container, read its
+        properties (which fails fast if it does not exist), and run one
+        cross-partition query so the SDK caches the partition key ranges and
+        opens pooled connections.
+        """
+        container = await self.open()
+        await self._call("read_container", lambda call: container.read(response_hook=call))
+
+        async def query(call):
+            async for _ in container.query_items(query="SELECT TOP 1 c.id FROM c", parameters=[], response_hook=call):
+                pass
+
+        await self._call("warm_up", query)
+
+    async def _query(self, query_name: str, query: str, params: List[Dict[str, Any]],
+                     partition_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        container = await self.open()
+        kwargs = {}
+        if self._route(query_name, partition_key) is not None:
+            kwargs["partition_key"] = partition_key
+        # Without a partition_key the aio client fans out across partitions implicitly
+        async def run(call):
+            items = [item async for item in container.query_items(
+                query=query, parameters=params, response_hook=call, **kwargs)]
+            call.items = len(items)
+            return items
+
+        return await self._call(query_name, run)
+
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data = self._prepare_create(data)
+        container = await self.open()
+        return await self._create_item(container, data)
+
+    async def _create_item(self, container, body: Dict[str, Any]) -> Dict[str, Any]:
+        async def run(call):
+            created = await container.create_item(body=body, response_hook=call)
+            call.items = 1
+            return created
+
+        return await self._call("create_item", run)
+
+    async def bulk_create(self, rows: List[Dict[str, Any]], concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Create many companies with one transactional batch per partition key.
+
+        Rows are grouped by ``pk`` and written in batches of at most
+        ``MAX_BATCH_OPERATIONS``, with up to ``concurrency`` batches in flight.
+        Returns one ``{"status_code", "doc", "error"}`` result per input row,
+        in input order.
+        """
+        docs = self._prepare_creates(rows)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(docs)
+        by_pk: Dict[str, List[int]] = defaultdict(list)
+        for i, doc in enumerate(docs):
+            by_pk[doc["pk"]].append(i)
+
+        container = await self.open()
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run(pk: str, idxs: List[int]):
+            async with sem:
+                await self._create_batch(container, pk, idxs, docs, results)
+
+        await asyncio.gather(*(
+            run(pk, idxs[j:j + MAX_BATCH_OPERATIONS])
+            for pk, idxs in by_pk.items()
+            for j in range(0, len(idxs), MAX_BATCH_OPERATIONS)
+        ))
+        return results
+
+    async def _create_batch(self, container, pk: str, idxs: List[int], docs: List[Dict[str, Any]],
+                            results: List[Optional[Dict[str, Any]]]) -> None:
+        pending = list(idxs)
+
+        async def run(call):
+            call.items = len(pending)
+            await container.execute_item_batch(
+                batch_operations=[("create", (docs[i],)) for i in pending], partition_key=pk, response_hook=call)
+
+        while pending:
+            try:
+                await self._call("execute_item_batch", run)
+            except exceptions.CosmosBatchOperationError as e:
+                # The batch is atomic: record the failing row, then retry the rest without it
+                failed = pending.pop(e.error_index)
+                status = int(e.operation_responses[e.error_index].get("statusCode", e.status_code))
+                results[failed] = {"status_code": status, "doc": docs[failed], "error": e.http_error_message}
+                continue
+            except (exceptions.CosmosHttpResponseError, RequestThrottledError) as e:
+                for i in pending:
+                    results[i] = {"status_code": e.status_code or 500, "doc": docs[i], "error": e.message}
+                return
+            for i in pending:
+                results[i] = {"status_code": 201, "doc": docs[i], "error": None}
+            return
+
+    async def _read(self, id: str, pk: str) -> Optional[Dict[str, Any]]:
+        container = await self.open()
+
+        async def run(call):
+            try:
+                item = await container.read_item(item=id, partition_key=pk, response_hook=call)
+            except exceptions.CosmosResourceNotFoundError:
+                return None
+            call.items = 1
+            return item
+
+        return await self._call("read_item", run)
+
+    def _is_legacy(self, pk: str) -> bool:
+        """Whether ``pk`` comes from the old container's scheme during a cutover."""
+        return self.fallback is not None and not self.partitioner.owns(pk)
+
+    async def _legacy_document(self, id: str, pk: str) -> Optional[Dict[str, Any]]:
+        self.fallback_reads += 1
+        return await self.fallback._read(id, pk)
+
+    async def _resolve_pk(self, id: str, pk: str) -> Optional[str]:
+        """``pk`` itself, or the current pk of a document addressed by its old one (None if unknown)."""
+        if not self._is_legacy(pk):
+            return pk
+        legacy = await self._legacy_document(id, pk)
+        return self.partitioner.pk(legacy["name"]) if legacy else None
+
+    async def get(self, id: str, pk: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        if self._is_legacy(pk):
+            legacy = await self._legacy_document(id, pk)
+            if legacy is None:
+                return None
+            # Not cached: the entry would be keyed by a pk no write ever invalidates
+            item = await self._read(id, self.partitioner.pk(legacy["name"]))
+            # Documents not copied over yet are served from the old container
+            return project(item or legacy, fields)
+        # Point reads always return the whole document; fields only trims the response
+        item = self.cache.get((pk, id))
+        if item is None:
+            item = await self._read(id, pk)
+            if item is None:
+                return None
+            self.cache.put((pk, id), item)
+        return project(item, fields)
+
+    async def update(self, id: str, pk: str, data: Dict[str, Any],
+                     if_match: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Apply the fields present in ``data``; returns the stored document, or None if missing.
+
+        Normally a single ``patch_item`` round trip. A rename into another
+        partition is a create in the new pk plus a conditional delete of the
+        old document. With ``if_match`` the write only succeeds while the
+        document's ``_etag`` is unchanged; otherwise Cosmos raises a 412.
+        """
+        pk = await self._resolve_pk(id, pk)
+        if pk is None:
+            return None
+        container = await self.open()
+        try:
+            new_pk = self._new_partition(pk, data)
+            if new_pk is not None:
+                return await self._move(container, id, pk, data, if_match)
+            ops = self._patch_operations(data)
+            if not ops:
+                return await self._read(id, pk)
+            if len(ops) > MAX_PATCH_OPERATIONS:
+                return await self._replace(container, id, pk, data, if_match)
+
+            async def patch(call):
+                try:
+                    updated = await container.patch_item(item=id, partition_key=pk, patch_operations=ops,
+                                                         response_hook=call, **self._if_match(if_match))
+                except exceptions.CosmosResourceNotFoundError:
+                    return None
+                call.items = 1
+                return updated
+
+            return await self._call("patch_item", patch)
+        finally:
+            self.cache.invalidate((pk, id))
+
+    async def _replace(self, container, id: str, pk: str, data: Dict[str, Any],
+                       if_match: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Too many fields for one patch: read-modify-write, guarded by the etag that was read
+        existing = await self._read(id, pk)
+        if not existing:
+            return None
+        etag = if_match or existing.get("_etag")
+        existing = self._apply_update(existing, data)
+
+        async def run(call):
+            updated = await container.replace_item(item=id, body=existing, response_hook=call,
+                                                   **self._if_match(etag))
+            call.items = 1
+            return updated
+
+        return await self._call("replace_item", run)
+
+    async def _move(self, container, id: str, pk: str, data: Dict[str, Any],
+                    if_match: Optional[str]) -> Optional[Dict[str, Any]]:
+        # pk cannot be patched: copy into the new partition, then delete the old
+        # document only if nobody changed it in between
+        existing = await self._read(id, pk)
+        if not existing:
+            return None
+        etag = existing.get("_etag")
+        if if_match is not None and if_match != etag:
+            raise exceptions.CosmosAccessConditionFailedError(status_code=412, message="Precondition Failed")
+        moved = self._apply_update(self._moved_document(existing), data)
+        created = await self._create_item(container, moved)
+        try:
+            await self._delete_item(container, id, pk, etag)
+        except (exceptions.CosmosHttpResponseError, RequestThrottledError) as e:
+            await self._delete_item(container, id, created["pk"])
+            if e.status_code == 404:
+                return None
+            raise
+        return created
+
+    async def _delete_item(self, container, id: str, pk: str, etag: Optional[str] = None) -> None:
+        async def run(call):
+            await container.delete_item(item=id, partition_key=pk, response_hook=call, **self._if_match(etag))
+            call.items = 1
+
+        await self._call("delete_item", run)
+
+    async def delete(self, id: str, pk: str) -> bool:
+        pk = await self._resolve_pk(id, pk)
+        if pk is None:
+            return False
+        container = await self.open()
+        try:
+            await self._delete_item(container, id, pk)
+            return True
+        except exceptions.CosmosResourceNotFoundError:
+            return False
+        finally:
+            self.cache.invalidate((pk, id))
+
+    async def find_by_name_exact(self, name: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        items = await self._query("find_by_name_exact", *self._name_exact_query(name, fields), self._name_partition(name))
+        return items[0] if items else None
+
+    async def search_by_name_prefix(self, prefix: str, limit: int = 20, fields: Fields = None,
+                                    after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Up to ``limit`` matches ordered by name_lower, starting after ``after`` if given."""
+        return await self._query("search_by_name_prefix", *self._prefix_query(prefix, limit, fields, after),
+                                 self._prefix_partition(prefix))
+
+    async def iter_pages(self, page_size: int, fields: Fields = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Every company, one Cosmos page (``max_item_count``) at a time, unordered.
+
+        Only the page being yielded is held in memory; the next one is not
+        requested until the caller asks for it. Only the first page can be
+        shed by the scheduler: the rest queue as background work, because a
+        streamed response cannot turn into a 429 once it has started.
+        """
+        container = await self.open()
+        self._route("list_companies", None)
+        query, params = self._list_query(fields)
+        with cosmos_call("list_companies") as call:
+            pager = container.query_items(query=query, parameters=params, max_item_count=page_size,
+                                          response_hook=call)
+            pages = pager.by_page()
+            priority = None
+            while True:
+                # Each page is its own round trip, so each is admitted by the scheduler separately
+                estimate = await self.scheduler.acquire("list_companies", priority) if self.scheduler else 0.0
+                priority = BACKGROUND
+                charged, retries = call.request_charge, call.retries
+                try:
+                    items = [item async for item in await pages.__anext__()]
+                except StopAsyncIteration:
+                    return
+                finally:
+                    if self.scheduler is not None:
+                        self.scheduler.settle("list_companies", estimate, call.request_charge - charged,
+                                              call.retries - retries)
+                call.items += len(items)
+                yield items
+
+    async def scan_search_fields(self) -> List[Dict[str, Any]]:
+        """Projected search fields (plus name_lower) for every company."""
+        return await self._query("scan_search_fields", *self._search_fields_query())
+
+    async def scan_names(self) -> List[str]:
+        """Every company's name_lower."""
+        return await self._query("scan_names", *self._names_query())
+
+    async def scan_ids(self) -> List[str]:
+        """Every company's id, for finding deletes the change feed does not carry."""
+        return await self._query("scan_ids", *self._ids_query())
+
+    async def import_document(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Upsert a document copied from another container under this repository's pk.
+
+        Idempotent, so a copy can be re-run or replayed from a change feed.
+        """
+        doc = self._repartitioned(doc)
+        container = await self.open()
+
+        async def run(call):
+            written = await container.upsert_item(body=doc, response_hook=call)
+            call.items = 1
+            return written
+
+        written = await self._call("upsert_item", run)
+        self.cache.invalidate((doc["pk"], doc["id"]))
+        return written
+
+    async def feed_ranges(self) -> List[str]:
+        """Ids of the container's partition key ranges, the unit the change feed is read in."""
+        container = await self.open()
+        # azure-cosmos 4.7 has no public feed-range API; this is the call its own query routing uses
+        async def run(call):
+            ranges = [r["id"] async for r in container.client_connection._ReadPartitionKeyRanges(
+                container.container_link, response_hook=call)]
+            call.items = len(ranges)
+            return ranges
+
+        return await self._call("read_partition_key_ranges", run)
+
+    async def read_change_feed(self, range_id: str, continuation: Optional[str],
+                               max_item_count: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Documents changed in one partition key range since ``continuation``.
+
+        Returns the changed documents (latest version of each) and the token
+        to pass next time; with no ``continuation`` the read starts from now.
+        """
+        container = await self.open()
+        token = continuation
+
+        async def run(call):
+            def hook(headers, result):
+                nonlocal token
+                call(headers, result)
+                # Each page's etag is the feed position after it; the up-front pager callback carries a stale one
+                if not hasattr(result, "by_page") and headers.get("etag"):
+                    token = headers["etag"]
+
+            docs = [doc async for doc in container.query_items_change_feed(
+                partition_key_range_id=range_id, continuation=continuation,
+                max_item_count=max_item_count, response_hook=hook)]
+            call.items = len(docs)
+            return docs
+
+        docs = await self._call("read_change_feed", run)
+        return docs, token
+
+    async def find_many_by_keys(self, keys: Dict[str, List[str]], concurrency: int = 8,
+                                fields: Fields = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Resolve many identifiers per field with a few concurrent ``IN (...)`` queries.
+
+        ``keys`` maps a field from ``KEY_FIELDS`` to the values to look up.
+        Returns ``{field: {value: document}}`` for the values that matched.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run(field: str, chunk: List[str]):
+            async with sem:
+                return field, await self._query("find_many_by_keys", *self._keys_in_query(field, chunk, fields))
+
+        jobs = []
+        for field, values in keys.items():
+            values = list(dict.fromkeys(v for v in values if non_empty(v)))
+            for j in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                jobs.append(run(field, values[j:j + LOOKUP_CHUNK_SIZE]))
+
+        found: Dict[str, Dict[str, Dict[str, Any]]] = {field: {} for field in keys}
+        for field, items in await asyncio.gather(*jobs):
+            for item in items:
+                found[field].setdefault(item.get(field), item)
+        return found
+
+    async def find_by_keys(self, *, ticker: Optional[str]=None, isin: Optional[str]=None, lei: Optional[str]=None,
+                           fields: Fields = None) -> List[Dict[str, Any]]:
+        q = self._keys_query(ticker, isin, lei, fields)
+        if q is None:
+            return []
+        return await self._query("find_by_keys", *q)
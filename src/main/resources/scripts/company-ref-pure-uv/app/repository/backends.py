@@ -0,0 +1,32 @@
+import os
+from typing import Optional
+from app.db import COSMOS_FALLBACK_CONTAINER
+from app.partitioning import FALLBACK_PARTITION_STRATEGY, get_partitioner
+from app.rate_limit import RUScheduler
+from app.repository.async_company_repository import AsyncCompanyRepository
+from app.repository.postgres_company_repository import PostgresCompanyRepository
+from app.repository.protocol import CompanyRepositoryProtocol
+from app.repository.sqlite_company_repository import SQLiteCompanyRepository
+
+# Where companies are stored: cosmos (default), sqlite (SQLITE_PATH) or postgres (POSTGRES_DSN)
+REPOSITORY_BACKEND = os.environ.get("REPOSITORY_BACKEND", "cosmos").lower()
+BACKENDS = ("cosmos", "sqlite", "postgres")
+
+
+def create_repository(backend: str = REPOSITORY_BACKEND,
+                      scheduler: Optional[RUScheduler] = None) -> CompanyRepositoryProtocol:
+    """The API's repository for ``backend``.
+
+    For Cosmos, ``scheduler`` paces the container and the migration fallback
+    container (``COSMOS_FALLBACK_CONTAINER``) alike. It has no effect on the
+    other backends, which have no RU budget.
+    """
+    if backend == "sqlite":
+        return SQLiteCompanyRepository()
+    if backend == "postgres":
+        return PostgresCompanyRepository()
+    if backend != "cosmos":
+        raise ValueError(f"Unknown REPOSITORY_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    fallback = AsyncCompanyRepository(container_id=COSMOS_FALLBACK_CONTAINER, scheduler=scheduler,
+                                      partitioner=get_partitioner(FALLBACK_PARTITION_STRATEGY)) if COSMOS_FALLBACK_CONTAINER else None
+    return AsyncCompanyRepository(fallback=fallback, scheduler=scheduler)
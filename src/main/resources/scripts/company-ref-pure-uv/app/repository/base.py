@@ -0,0 +1,222 @@
+import time
+import uuid
+from collections import Counter
+from typing import Optional, List, Dict, Any, Sequence, Tuple
+from azure.core import MatchConditions
+from app.cache import TTLCache
+from app.partitioning import Partitioner, get_partitioner
+from app.utils import normalize_name, non_empty
+
+Query = Tuple[str, List[Dict[str, Any]]]
+Fields = Optional[Sequence[str]]
+
+# Identifier fields usable for lookups, with the parameter prefix used in queries
+KEY_FIELDS = {"ticker": "@t", "isin": "@i", "lei": "@l"}
+
+# Fields returned by prefix search (and held by the in-memory search index)
+SEARCH_FIELDS = ("id", "pk", "name", "ticker", "isin", "lei", "country", "sector")
+
+# Cosmos accepts at most 10 operations per patch_item
+MAX_PATCH_OPERATIONS = 10
+
+# Server-generated properties that must not be copied onto a new document
+SYSTEM_PROPERTIES = ("_rid", "_self", "_etag", "_attachments", "_ts")
+
+def projected_fields(fields: Fields, *required: str) -> Optional[Tuple[str, ...]]:
+    """Requested fields plus id, pk and ``required``, or None for whole documents."""
+    if fields is None:
+        return None
+    return tuple(dict.fromkeys(("id", "pk", *required, *fields)))
+
+def prefix_range(prefix: str) -> Tuple[str, Optional[str]]:
+    """Bounds ``[low, high)`` of the strings starting with ``prefix``, in code point order."""
+    if not prefix:
+        return "", None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def project(doc: Dict[str, Any], fields: Fields, *required: str) -> Dict[str, Any]:
+    return pick(doc, projected_fields(fields, *required))
+
+def pick(doc: Dict[str, Any], projection: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """``doc`` limited to ``projection``, as a Cosmos ``SELECT c.a, c.b`` returns it (whole if None)."""
+    if projection is None:
+        return doc
+    return {f: doc[f] for f in projection if f in doc}
+
+class BaseCompanyRepository:
+    """Document shaping and query building shared by the sync and async repositories.
+
+    Subclasses only own the I/O against their Cosmos container. Query
+    builders take an optional ``fields`` projection so callers pull only the
+    properties they need instead of ``SELECT *``. Point reads
+    go through ``cache``, keyed by ``(pk, id)``. ``partitioner`` derives
+    ``pk`` from the name. Queries whose partition can
+    be worked out from their parameters are sent to that single partition;
+    ``query_routing`` counts single-partition vs fan-out queries per method.
+    """
+
+    def __init__(self, cache: Optional[TTLCache] = None, partitioner: Optional[Partitioner] = None):
+        self.cache = cache if cache is not None else TTLCache()
+        self.partitioner = partitioner or get_partitioner()
+        self.query_routing: Counter = Counter()
+
+    def _route(self, query_name: str, partition_key: Optional[str]) -> Optional[str]:
+        kind = "single_partition" if partition_key is not None else "cross_partition"
+        self.query_routing[(query_name, kind)] += 1
+        return partition_key
+
+    def routing_stats(self) -> Dict[str, Dict[str, int]]:
+        stats: Dict[str, Dict[str, int]] = {}
+        for (query_name, kind), n in self.query_routing.items():
+            stats.setdefault(query_name, {"single_partition": 0, "cross_partition": 0})[kind] = n
+        return stats
+
+    def _name_partition(self, name: str) -> Optional[str]:
+        # pk is derived from the normalized name, so an exact match lives in exactly one partition
+        name_lower, pk = self.partitioner.keys(name)
+        return pk if name_lower else None
+
+    def _prefix_partition(self, prefix: str) -> Optional[str]:
+        return self.partitioner.prefix_pk(prefix)
+
+    def _prepare_create(self, data: Dict[str, Any], keys: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+        data = data.copy()
+        data["id"] = data.get("id") or str(uuid.uuid4())
+        data["name_lower"], data["pk"] = keys or self.partitioner.keys(data["name"])
+        if non_empty(data.get("ticker")):
+            data["ticker"] = data["ticker"].upper()
+        return data
+
+    def _prepare_creates(self, rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """``_prepare_create`` for a batch, normalizing all the names in one pass."""
+        keys = self.partitioner.keys_many([r["name"] for r in rows])
+        return [self._prepare_create(r, k) for r, k in zip(rows, keys)]
+
+    def _apply_update(self, existing: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        for k, v in data.items():
+            existing[k] = v
+        if "name" in data and non_empty(data["name"]):
+            existing["name_lower"], existing["pk"] = self.partitioner.keys(existing["name"])
+        if non_empty(existing.get("ticker")):
+            existing["ticker"] = existing["ticker"].upper()
+        return existing
+
+    def _new_partition(self, pk: str, data: Dict[str, Any]) -> Optional[str]:
+        """The pk an update moves the document to, or None if it stays in ``pk``."""
+        if non_empty(data.get("name")):
+            new_pk = self.partitioner.pk(data["name"])
+            if new_pk != pk:
+                return new_pk
+        return None
+
+    def _patch_operations(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """``set`` operations for the fields present in ``data`` (plus derived name_lower)."""
+        data = dict(data)
+        if non_empty(data.get("name")):
+            data["name_lower"] = normalize_name(data["name"])
+        if non_empty(data.get("ticker")):
+            data["ticker"] = data["ticker"].upper()
+        return [{"op": "set", "path": f"/{k}", "value": v} for k, v in data.items()]
+
+    @staticmethod
+    def _moved_document(existing: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in existing.items() if k not in SYSTEM_PROPERTIES}
+
+    def _repartitioned(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """A document from another container, with ``pk`` re-derived by this repository's strategy."""
+        doc = self._moved_document(doc)
+        doc["pk"] = self.partitioner.pk(doc["name"])
+        return doc
+
+    @staticmethod
+    def _stamped(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """``doc`` with a new ``_etag`` and ``_ts``, as Cosmos returns it after a write.
+
+        For backends that version documents themselves.
+        """
+        doc = {k: v for k, v in doc.items() if k not in SYSTEM_PROPERTIES}
+        doc["_etag"] = f'"{uuid.uuid4()}"'
+        doc["_ts"] = int(time.time())
+        return doc
+
+    @staticmethod
+    def _key_columns(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """The indexed columns of a document in a SQL backend; empty identifiers are NULL."""
+        return {
+            "pk": doc["pk"],
+            "id": doc["id"],
+            "name_lower": doc["name_lower"],
+            **{f: doc.get(f) if non_empty(doc.get(f)) else None for f in KEY_FIELDS},
+            "etag": doc["_etag"],
+        }
+
+    @staticmethod
+    def _if_match(etag: Optional[str]) -> Dict[str, Any]:
+        """SDK keyword arguments for an ``If-Match`` precondition on ``etag``."""
+        if etag is None:
+            return {}
+        return {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+
+    def _select_clause(self, fields: Fields, *required: str) -> str:
+        projection = projected_fields(fields, *required)
+        return "*" if projection is None else self._select(projection)
+
+    def _name_exact_query(self, name: str, fields: Fields = None) -> Query:
+        nl = normalize_name(name)
+        query = f"SELECT {self._select_clause(fields)} FROM c WHERE c.name_lower = @nl"
+        return query, [{"name": "@nl", "value": nl}]
+
+    def _prefix_query(self, prefix: str, limit: int, fields: Fields = None, after: Optional[str] = None) -> Query:
+        # name is always selected: it is what the results are ordered and paged by
+        p = normalize_name(prefix)
+        params = [{"name": "@p", "value": p}, {"name": "@lim", "value": limit}]
+        where = "STARTSWITH(c.name_lower, @p)"
+        if after is not None:
+            # Keyset paging: name_lower is unique, so "after the last one seen" is exact
+            where += " AND c.name_lower > @after"
+            params.append({"name": "@after", "value": after})
+        query = (
+            f"SELECT TOP @lim {self._select(projected_fields(fields, 'name') or SEARCH_FIELDS)} "
+            f"FROM c WHERE {where} ORDER BY c.name_lower"
+        )
+        return query, params
+
+    def _search_fields_query(self) -> Query:
+        return f"SELECT {self._select(SEARCH_FIELDS + ('name_lower',))} FROM c", []
+
+    def _list_query(self, fields: Fields = None) -> Query:
+        return f"SELECT {self._select_clause(fields)} FROM c", []
+
+    def _names_query(self) -> Query:
+        return "SELECT VALUE c.name_lower FROM c", []
+
+    def _ids_query(self) -> Query:
+        return "SELECT VALUE c.id FROM c", []
+
+    @staticmethod
+    def _select(fields) -> str:
+        return ", ".join(f"c.{f}" for f in fields)
+
+    def _keys_query(self, ticker: Optional[str], isin: Optional[str], lei: Optional[str],
+                    fields: Fields = None) -> Optional[Query]:
+        clauses = []
+        params = []
+        if non_empty(ticker):
+            clauses.append("c.ticker = @t")
+            params.append({"name": "@t", "value": ticker.upper()})
+        if non_empty(isin):
+            clauses.append("c.isin = @i")
+            params.append({"name": "@i", "value": isin})
+        if non_empty(lei):
+            clauses.append("c.lei = @l")
+            params.append({"name": "@l", "value": lei})
+        if not clauses:
+            return None
+        return f"SELECT {self._select_clause(fields)} FROM c WHERE " + " OR ".join(clauses), params
+
+    def _keys_in_query(self, field: str, values: List[str], fields: Fields = None) -> Query:
+        """``SELECT ... WHERE c.<field> IN (@x0, @x1, ...)`` for one identifier type."""
+        prefix = KEY_FIELDS[field]
+        names = [f"{prefix}{i}" for i in range(len(values))]
+        query = f"SELECT {self._select_clause(fields, field)} FROM c WHERE c.{field} IN ({', '.join(names)})"
+        return query, [{"name": n, "value": v} for n, v in zip(names, values)]
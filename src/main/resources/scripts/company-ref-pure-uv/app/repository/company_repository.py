@@ -1,11 +1,20 @@
-import uuid
 from typing import Optional, List, Dict, Any
 from azure.cosmos import exceptions
+from app.cache import TTLCache
 from app.db import get_container
-from app.utils import normalize_name, derive_pk_from_name, non_empty
+from app.metrics import cosmos_call
+from app.partitioning import Partitioner
+from app.repository.base import BaseCompanyRepository, Fields, project
 
-class CompanyRepository:
-    def __init__(self):
+class CompanyRepository(BaseCompanyRepository):
+    """Synchronous repository for scripts and tests; the API uses AsyncCompanyRepository.
+
+    Updates stay a plain read + replace: patches, If-Match and partition
+    moves live only in the async write path.
+    """
+
+    def __init__(self, cache: Optional[TTLCache] = None, partitioner: Optional[Partitioner] = None):
+        super().__init__(cache, partitioner)
         self._container = None
 
     @property
@@ -15,85 +24,77 @@ class CompanyRepository:
         return self._container
 
     def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        data = data.copy()
-        data["id"] = data.get("id") or str(uuid.uuid4())
-        data["name_lower"] = normalize_name(data["name"])
-        data["pk"] = derive_pk_from_name(data["name"])
-        if non_empty(data.get("ticker")):
-            data["ticker"] = data["ticker"].upper()
-        try:
-            return self.container.create_item(body=data)
-        except exceptions.CosmosHttpResponseError as e:
-            raise e
+        data = self._prepare_create(data)
+        with cosmos_call("create_item") as call:
+            created = self.container.create_item(body=data, response_hook=call)
+            call.items = 1
+        return created
 
-    def get(self, id: str, pk: str) -> Optional[Dict[str, Any]]:
-        try:
-            return self.container.read_item(item=id, partition_key=pk)
-        except exceptions.CosmosResourceNotFoundError:
-            return None
+    def _read(self, id: str, pk: str) -> Optional[Dict[str, Any]]:
+        with cosmos_call("read_item") as call:
+            try:
+                item = self.container.read_item(item=id, partition_key=pk, response_hook=call)
+            except exceptions.CosmosResourceNotFoundError:
+                return None
+            call.items = 1
+        return item
+
+    def get(self, id: str, pk: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        # Point reads always return the whole document; fields only trims the response
+        item = self.cache.get((pk, id))
+        if item is None:
+            item = self._read(id, pk)
+            if item is None:
+                return None
+            self.cache.put((pk, id), item)
+        return project(item, fields)
 
     def update(self, id: str, pk: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        existing = self.get(id, pk)
+        # Read-modify-write always starts from the stored document, never the cache
+        existing = self._read(id, pk)
         if not existing:
             return None
-        for k, v in data.items():
-            existing[k] = v
-        if "name" in data and non_empty(data["name"]):
-            existing["name_lower"] = normalize_name(existing["name"])
-            existing["pk"] = derive_pk_from_name(existing["name"])
-        if non_empty(existing.get("ticker")):
-            existing["ticker"] = existing["ticker"].upper()
-        return self.container.replace_item(item=existing["id"], body=existing)
+        existing = self._apply_update(existing, data)
+        with cosmos_call("replace_item") as call:
+            updated = self.container.replace_item(item=existing["id"], body=existing, response_hook=call)
+            call.items = 1
+        self.cache.invalidate((pk, id))
+        return updated
 
     def delete(self, id: str, pk: str) -> bool:
         try:
-            self.container.delete_item(item=id, partition_key=pk)
+            with cosmos_call("delete_item") as call:
+                self.container.delete_item(item=id, partition_key=pk, response_hook=call)
+                call.items = 1
             return True
         except exceptions.CosmosResourceNotFoundError:
             return False
+        finally:
+            self.cache.invalidate((pk, id))
 
-    def find_by_name_exact(self, name: str) -> Optional[Dict[str, Any]]:
-        nl = normalize_name(name)
-        query = "SELECT * FROM c WHERE c.name_lower = @nl"
-        items = list(self.container.query_items(
-            query=query,
-            parameters=[{"name": "@nl", "value": nl}],
-            enable_cross_partition_query=True
-        ))
+    def _query(self, query_name: str, query: str, params: List[Dict[str, Any]],
+               partition_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        if self._route(query_name, partition_key) is not None:
+            kwargs = {"partition_key": partition_key}
+        else:
+            kwargs = {"enable_cross_partition_query": True}
+        with cosmos_call(query_name) as call:
+            items = list(self.container.query_items(query=query, parameters=params, response_hook=call, **kwargs))
+            call.items = len(items)
+        return items
+
+    def find_by_name_exact(self, name: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        items = self._query("find_by_name_exact", *self._name_exact_query(name, fields), self._name_partition(name))
         return items[0] if items else None
 
-    def search_by_name_prefix(self, prefix: str, limit: int = 20) -> List[Dict[str, Any]]:
-        p = normalize_name(prefix)
-        query = (
-            "SELECT TOP @lim c.id, c.pk, c.name, c.ticker, c.isin, c.lei, c.country, c.sector "
-            "FROM c WHERE STARTSWITH(c.name_lower, @p) "
-            "ORDER BY c.name_lower"
-        )
-        items = list(self.container.query_items(
-            query=query,
-            parameters=[{"name": "@p", "value": p},
-                        {"name": "@lim", "value": limit}],
-            enable_cross_partition_query=True
-        ))
-        return items
+    def search_by_name_prefix(self, prefix: str, limit: int = 20, fields: Fields = None,
+                              after: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._query("search_by_name_prefix", *self._prefix_query(prefix, limit, fields, after),
+                           self._prefix_partition(prefix))
 
-    def find_by_keys(self, *, ticker: Optional[str]=None, isin: Optional[str]=None, lei: Optional[str]=None) -> List[Dict[str, Any]]:
-        clauses = []
-        params = []
-        if non_empty(ticker):
-            clauses.append("c.ticker = @t")
-            params.append({"name": "@t", "value": ticker.upper()})
-        if non_empty(isin):
-            clauses.append("c.isin = @i")
-            params.append({"name": "@i", "value": isin})
-        if non_empty(lei):
-            clauses.append("c.lei = @l")
-            params.append({"name": "@l", "value": lei})
-        if not clauses:
+    def find_by_keys(self, *, ticker: Optional[str]=None, isin: Optional[str]=None, lei: Optional[str]=None,
+                     fields: Fields = None) -> List[Dict[str, Any]]:
+        q = self._keys_query(ticker, isin, lei, fields)
+        if q is None:
             return []
-        query = "SELECT * FROM c WHERE " + " OR ".join(clauses)
-        return list(self.container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=True
-        ))
+        return self._query("find_by_keys", *q)
@@ -0,0 +1,90 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol, Tuple, runtime_checkable
+from app.cache import TTLCache
+from app.partitioning import Partitioner
+from app.repository.base import Fields
+
+
+class RepositoryError(RuntimeError):
+    """A write a backend refused; ``status_code`` is the HTTP status it maps to, as for Cosmos errors."""
+
+    status_code = 500
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class ConflictError(RepositoryError):
+    """A unique key (``name_lower``, ``ticker`` or ``lei``) is already taken in the partition."""
+
+    status_code = 409
+
+
+class PreconditionFailedError(RepositoryError):
+    """The document's ``_etag`` no longer matches the ``If-Match`` given."""
+
+    status_code = 412
+
+
+class CompanyRepositoryProtocol(Protocol):
+    """What :class:`~app.services.company_service.CompanyService` and the app need from a backend.
+
+    Documents are dicts shaped like the Cosmos ones: ``id``, ``pk`` (from
+    ``partitioner``), the derived ``name_lower`` and an ``_etag`` that changes
+    on every write. Unique-key violations raise an error with
+    ``status_code == 409`` and failed ``if_match`` preconditions one with
+    ``412``: Cosmos SDK errors from the Cosmos backend, :class:`RepositoryError`
+    subclasses from the others.
+    """
+
+    cache: TTLCache
+    partitioner: Partitioner
+    # Cosmos only; None and 0 elsewhere, read by /health
+    scheduler: Optional[Any]
+    fallback_reads: int
+
+    async def warm_up(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+    def routing_stats(self) -> Dict[str, Dict[str, int]]: ...
+
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    async def bulk_create(self, rows: List[Dict[str, Any]], concurrency: int = 8) -> List[Dict[str, Any]]: ...
+
+    async def get(self, id: str, pk: str, fields: Fields = None) -> Optional[Dict[str, Any]]: ...
+
+    async def update(self, id: str, pk: str, data: Dict[str, Any],
+                     if_match: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+
+    async def delete(self, id: str, pk: str) -> bool: ...
+
+    async def find_by_name_exact(self, name: str, fields: Fields = None) -> Optional[Dict[str, Any]]: ...
+
+    async def search_by_name_prefix(self, prefix: str, limit: int = 20, fields: Fields = None,
+                                    after: Optional[str] = None) -> List[Dict[str, Any]]: ...
+
+    def iter_pages(self, page_size: int, fields: Fields = None) -> AsyncIterator[List[Dict[str, Any]]]: ...
+
+    async def scan_search_fields(self) -> List[Dict[str, Any]]: ...
+
+    async def scan_names(self) -> List[str]: ...
+
+    async def find_by_keys(self, *, ticker: Optional[str] = None, isin: Optional[str] = None,
+                           lei: Optional[str] = None, fields: Fields = None) -> List[Dict[str, Any]]: ...
+
+    async def find_many_by_keys(self, keys: Dict[str, List[str]], concurrency: int = 8,
+                                fields: Fields = None) -> Dict[str, Dict[str, Dict[str, Any]]]: ...
+
+
+@runtime_checkable
+class ChangeFeedSource(Protocol):
+    """A backend whose changes other workers can follow (see :mod:`app.change_feed`)."""
+
+    async def feed_ranges(self) -> List[str]: ...
+
+    async def read_change_feed(self, range_id: str, continuation: Optional[str],
+                               max_item_count: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]: ...
+
+    async def scan_ids(self) -> List[str]: ...
@@ -0,0 +1,261 @@
+import json
+import os
+import sqlite3
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterable, Sequence
+from app.cache import TTLCache
+from app.partitioning import Partitioner
+from app.repository.base import (BaseCompanyRepository, Fields, KEY_FIELDS, SEARCH_FIELDS, pick, prefix_range,
+                                 project, projected_fields)
+from app.repository.protocol import ConflictError, PreconditionFailedError
+from app.utils import normalize_name, non_empty
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "company_ref.db")
+# How long a write waits for another worker's transaction on the same file
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Identifiers per IN (...) clause in batch lookups, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# Cosmos unique keys are scoped to the logical partition, so these are too.
+# NULLs never collide, so companies without a ticker or LEI do not conflict.
+# The single-column indexes serve lookups and prefix search across partitions.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    pk TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    ticker TEXT,
+    isin TEXT,
+    lei TEXT,
+    etag TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (pk, id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_pk_name_lower ON companies (pk, name_lower);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_pk_ticker ON companies (pk, ticker);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_pk_lei ON companies (pk, lei);
+CREATE INDEX IF NOT EXISTS ix_companies_name_lower ON companies (name_lower);
+CREATE INDEX IF NOT EXISTS ix_companies_ticker ON companies (ticker);
+CREATE INDEX IF NOT EXISTS ix_companies_isin ON companies (isin);
+CREATE INDEX IF NOT EXISTS ix_companies_lei ON companies (lei);
+"""
+
+INSERT = ("INSERT INTO companies (pk, id, name_lower, ticker, isin, lei, etag, doc) "
+          "VALUES (:pk, :id, :name_lower, :ticker, :isin, :lei, :etag, :doc)")
+
+
+class SQLiteCompanyRepository(BaseCompanyRepository):
+    """The async repository interface on an embedded SQLite database.
+
+    For edge deployments and load tests: the full API with local reads and
+    no cloud round trips. Documents are stored as JSON, with ``name_lower``,
+    ``ticker``, ``isin`` and ``lei`` copied into indexed columns. Unique
+    keys behave like the Cosmos ``unique_key_policy``. The database runs in
+    WAL mode, so the workers of one host can share a file: readers never
+    block and writers queue for up to ``SQLITE_BUSY_TIMEOUT_MS``.
+
+    Calls run on the event loop thread, because a local read takes well
+    under a millisecond, less than handing it to a thread would cost.
+    Writes are single statements or short transactions with no ``await``
+    inside, so coroutines cannot interleave within one.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, cache: Optional[TTLCache] = None,
+                 partitioner: Optional[Partitioner] = None):
+        super().__init__(cache, partitioner)
+        self.path = path
+        self.scheduler = None
+        self.fallback_reads = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable across process crashes; an OS crash may lose the last commits, as WAL allows
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+    async def warm_up(self) -> None:
+        """Open the database, creating the table and indexes if missing."""
+        self.open().execute("SELECT 1 FROM companies LIMIT 1").fetchall()
+
+    def _rows(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        return [json.loads(doc) for doc, in self.open().execute(sql, params)]
+
+    def _row(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {**self._key_columns(doc), "doc": json.dumps(doc)}
+
+    def _insert(self, doc: Dict[str, Any]) -> None:
+        try:
+            self.open().execute(INSERT, self._row(doc))
+        except sqlite3.IntegrityError as e:
+            raise ConflictError(f"Unique key conflict: {e}") from e
+
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        doc = self._stamped(self._prepare_create(data))
+        self._insert(doc)
+        return doc
+
+    async def bulk_create(self, rows: List[Dict[str, Any]], concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Create many companies in one transaction; a conflicting row is reported and skipped.
+
+        Returns one ``{"status_code", "doc", "error"}`` result per input row,
+        in input order. ``concurrency`` is accepted for the interface and unused.
+        """
+        conn = self.open()
+        results = []
+        conn.execute("BEGIN")
+        try:
+            for row in rows:
+                doc = self._stamped(self._prepare_create(row))
+                try:
+                    self._insert(doc)
+                    results.append({"status_code": 201, "doc": doc, "error": None})
+                except ConflictError as e:
+                    results.append({"status_code": e.status_code, "doc": doc, "error": e.message})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def _read(self, id: str, pk: str) -> Optional[Dict[str, Any]]:
+        docs = self._rows("SELECT doc FROM companies WHERE pk = ? AND id = ?", (pk, id))
+        return docs[0] if docs else None
+
+    async def get(self, id: str, pk: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        item = self.cache.get((pk, id))
+        if item is None:
+            item = self._read(id, pk)
+            if item is None:
+                return None
+            self.cache.put((pk, id), item)
+        return project(item, fields)
+
+    async def update(self, id: str, pk: str, data: Dict[str, Any],
+                     if_match: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Apply the fields present in ``data``; returns the stored document, or None if missing.
+
+        One transaction, including a rename that moves the document to
+        another ``pk``. With ``if_match`` the write only succeeds while the
+        document's ``_etag`` is unchanged; otherwise :class:`PreconditionFailedError`.
+        """
+        conn = self.open()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._read(id, pk)
+            if existing is None:
+                conn.execute("ROLLBACK")
+                return None
+            if if_match is not None and if_match != existing["_etag"]:
+                raise PreconditionFailedError("Precondition Failed")
+            if not data:
+                conn.execute("ROLLBACK")
+                return existing
+            updated = self._stamped(self._apply_update(existing, data))
+            try:
+                conn.execute("UPDATE companies SET pk = :pk, id = :id, name_lower = :name_lower, ticker = :ticker, "
+                             "isin = :isin, lei = :lei, etag = :etag, doc = :doc WHERE pk = :old_pk AND id = :id",
+                             {**self._row(updated), "old_pk": pk})
+            except sqlite3.IntegrityError as e:
+                raise ConflictError(f"Unique key conflict: {e}") from e
+            conn.execute("COMMIT")
+            return updated
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.cache.invalidate((pk, id))
+
+    async def delete(self, id: str, pk: str) -> bool:
+        try:
+            return self.open().execute("DELETE FROM companies WHERE pk = ? AND id = ?", (pk, id)).rowcount > 0
+        finally:
+            self.cache.invalidate((pk, id))
+
+    async def find_by_name_exact(self, name: str, fields: Fields = None) -> Optional[Dict[str, Any]]:
+        docs = self._rows("SELECT doc FROM companies WHERE name_lower = ? LIMIT 1", (normalize_name(name),))
+        return project(docs[0], fields) if docs else None
+
+    async def search_by_name_prefix(self, prefix: str, limit: int = 20, fields: Fields = None,
+                                    after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Up to ``limit`` matches ordered by name_lower, starting after ``after`` if given."""
+        # UTF-8 byte order (SQLite's BINARY collation) is code point order, so this is a range scan
+        low, high = prefix_range(normalize_name(prefix))
+        where, params = ["name_lower >= ?"], [low]
+        if high is not None:
+            where.append("name_lower < ?")
+            params.append(high)
+        if after is not None:
+            where.append("name_lower > ?")
+            params.append(after)
+        docs = self._rows(f"SELECT doc FROM companies WHERE {' AND '.join(where)} ORDER BY name_lower LIMIT ?",
+                          (*params, limit))
+        projection = projected_fields(fields, "name") or SEARCH_FIELDS
+        return [pick(doc, projection) for doc in docs]
+
+    async def iter_pages(self, page_size: int, fields: Fields = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Every company, ``page_size`` at a time, in insertion order.
+
+        Each page is its own query keyed on ``rowid``, so no cursor is held
+        open while the caller works through a page.
+        """
+        last = 0
+        while True:
+            rows = self.open().execute("SELECT rowid, doc FROM companies WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                       (last, page_size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [project(json.loads(doc), fields) for _, doc in rows]
+
+    async def scan_search_fields(self) -> List[Dict[str, Any]]:
+        """Projected search fields (plus name_lower) for every company."""
+        return [pick(doc, SEARCH_FIELDS + ("name_lower",)) for doc in self._rows("SELECT doc FROM companies")]
+
+    async def scan_names(self) -> List[str]:
+        """Every company's name_lower."""
+        return [name for name, in self.open().execute("SELECT name_lower FROM companies")]
+
+    def _keys_in(self, field: str, values: Iterable[str], fields: Fields) -> List[Dict[str, Any]]:
+        values = list(values)
+        marks = ", ".join("?" * len(values))
+        docs = self._rows(f"SELECT doc FROM companies WHERE {field} IN ({marks})", values)
+        return [project(doc, fields, field) for doc in docs]
+
+    async def find_many_by_keys(self, keys: Dict[str, List[str]], concurrency: int = 8,
+                                fields: Fields = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Resolve many identifiers per field with ``IN (...)`` queries on the identifier indexes.
+
+        ``keys`` maps a field from ``KEY_FIELDS`` to the values to look up.
+        Returns ``{field: {value: document}}`` for the values that matched.
+        """
+        found: Dict[str, Dict[str, Dict[str, Any]]] = {field: {} for field in keys}
+        for field, values in keys.items():
+            if field not in KEY_FIELDS:
+                raise ValueError(f"Unknown key field: {field}")
+            values = list(dict.fromkeys(v for v in values if non_empty(v)))
+            for j in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                for item in self._keys_in(field, values[j:j + LOOKUP_CHUNK_SIZE], fields):
+                    found[field].setdefault(item.get(field), item)
+        return found
+
+    async def find_by_keys(self, *, ticker: Optional[str]=None, isin: Optional[str]=None, lei: Optional[str]=None,
+                           fields: Fields = None) -> List[Dict[str, Any]]:
+        values = {"ticker": ticker.upper() if non_empty(ticker) else None, "isin": isin, "lei": lei}
+        clauses = [(f"{field} = ?", value) for field, value in values.items() if non_empty(value)]
+        if not clauses:
+            return []
+        docs = self._rows("SELECT doc FROM companies WHERE " + " OR ".join(c for c, _ in clauses),
+                          [v for _, v in clauses])
+        return [project(doc, fields) for doc in docs]
@@ -0,0 +1,69 @@
+"""
+Fast response path for documents that come from our own container.
+
+Routes declare ``response_model=Company`` or ``List[dict]``, so by default
+FastAPI validates every returned document against the model and then
+runs it through ``jsonable_encoder`` before serializing. For large search
+and lookup responses that work dominates the CPU time of a request. It
+checks nothing new, because every document was validated against
+``CompanyCreate``/``CompanyUpdate`` on its way in.
+
+With ``FAST_RESPONSES=true``, routes return a :class:`FastJSONResponse`
+themselves, which FastAPI passes through untouched. Its body is
+serialized in one call to ``orjson`` when that is installed, or to the
+standard library ``json`` otherwise. Company documents are trimmed to the
+``Company`` fields, and fields a stored document lacks get the model's
+default, so the response has the same shape either way.
+"""
+import copy
+import json
+import os
+from typing import Any, Dict, Optional
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+from app.models import COMPANY_FIELDS, Company
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+FAST_RESPONSES = os.environ.get("FAST_RESPONSES", "false").lower() == "true"
+
+# What validation fills in for a field a document lacks, as JSON (required fields have no default)
+_FIELD_DEFAULTS = {f: None if field.is_required() else to_jsonable_python(field.get_default(call_default_factory=True))
+                   for f, field in Company.model_fields.items()}
+
+
+def _default(value: Any) -> str:
+    # Documents created in-process may still hold dates and URLs as objects
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized directly, without validation or ``jsonable_encoder``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def company_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A stored document trimmed to the fields of the ``Company`` response model, missing ones defaulted."""
+    return {f: doc[f] if f in doc else copy.deepcopy(_FIELD_DEFAULTS[f]) for f in COMPANY_FIELDS}
+
+
+def trusted(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Any:
+    """``content`` as a :class:`FastJSONResponse` in fast mode; as-is (validated by the route) otherwise."""
+    if not FAST_RESPONSES:
+        return content
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def trusted_company(doc: Dict[str, Any], status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Any:
+    return trusted(company_document(doc), status_code, headers) if FAST_RESPONSES else doc
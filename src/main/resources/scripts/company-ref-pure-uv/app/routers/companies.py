@@ -1,47 +1,155 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
-from app.models import CompanyCreate, CompanyUpdate, Company
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional, List, Tuple
+from app.bulk_load import BULK_CHUNK_ROWS, BULK_CONCURRENCY, aiter_lines, parse_rows
+from app.http_cache import (DOCUMENT_CACHE_CONTROL, LOOKUP_CACHE_MAX_AGE, SEARCH_CACHE_MAX_AGE, cache_control,
+                            etag_matches, not_modified)
+from app.models import (CompanyCreate, CompanyUpdate, Company, BatchLookupRequest, ValidationResult, MatchResult,
+                        COMPANY_FIELDS, MAX_SEARCH_PAGE_SIZE, MAX_MATCH_LIMIT, LIST_PAGE_SIZE, MAX_LIST_PAGE_SIZE)
+from app.repository.base import SYSTEM_PROPERTIES
+from app.name_filter import NameBloomFilter, NAME_FILTER_ENABLED
+from app.match_index import MATCH_INDEX_ENABLED, MATCH_MIN_SCORE, MatchIndex
+from app.search_index import PrefixIndex, SEARCH_INDEX_ENABLED
 from app.services.company_service import CompanyService
+from app.single_flight import SINGLE_FLIGHT_ENABLED, SingleFlight
+from app.rate_limit import RATE_LIMIT_ENABLED, RUScheduler
+from app.responses import FAST_RESPONSES, FastJSONResponse, dumps, trusted, trusted_company
+from app.repository.backends import REPOSITORY_BACKEND, create_repository
 
 router = APIRouter(prefix="/companies", tags=["companies"])
-svc = CompanyService()
+# One RU budget per worker, shared by the container and its migration fallback
+scheduler = RUScheduler() if RATE_LIMIT_ENABLED and REPOSITORY_BACKEND == "cosmos" else None
+svc = CompanyService(repo=create_repository(REPOSITORY_BACKEND, scheduler),
+                     search_index=PrefixIndex() if SEARCH_INDEX_ENABLED else None,
+                     name_filter=NameBloomFilter() if NAME_FILTER_ENABLED else None,
+                     match_index=MatchIndex() if MATCH_INDEX_ENABLED else None,
+                     single_flight=SingleFlight() if SINGLE_FLIGHT_ENABLED else None)
+
+def selected_fields(fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return; id and pk are always included")) -> Optional[Tuple[str, ...]]:
+    if fields is None:
+        return None
+    names = tuple(f.strip() for f in fields.split(",") if f.strip())
+    # Field names end up in the SELECT clause, so only known document fields are allowed
+    unknown = [f for f in names if f not in COMPANY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
 
 @router.post("", response_model=Company, status_code=201)
-def create_company(payload: CompanyCreate):
-    created = svc.create_company(payload.model_dump())
-    return created
+async def create_company(payload: CompanyCreate):
+    created = await svc.create_company(payload.model_dump(mode="json"))
+    return trusted_company(created, status_code=201)
+
+@router.get("", response_class=StreamingResponse)
+async def list_companies(page_size: int = Query(LIST_PAGE_SIZE, ge=1, le=MAX_LIST_PAGE_SIZE),
+                         fields: Optional[Tuple[str, ...]] = Depends(selected_fields)):
+    """Every company as NDJSON, streamed page by page from the Cosmos iterator (unordered)."""
+    # _etag and _ts are kept for incremental sync consumers
+    internal = set(SYSTEM_PROPERTIES) - {"_etag", "_ts"}
+    pages = svc.iter_companies(page_size, fields=fields)
+    # Read before the response starts, so a shed or throttled listing is still answered with a 429
+    first = await anext(pages, None)
+
+    async def ndjson():
+        page = first
+        while page is not None:
+            docs = ({k: v for k, v in doc.items() if k not in internal} for doc in page)
+            if FAST_RESPONSES:
+                yield b"".join(dumps(doc) + b"\n" for doc in docs)
+            else:
+                yield "".join(json.dumps(doc) + "\n" for doc in docs).encode("utf-8")
+            page = await anext(pages, None)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-@router.get("/{pk}/{id}", response_model=Company)
-def get_company(pk: str, id: str):
-    item = svc.get_company(id, pk)
+@router.post(":bulk")
+async def bulk_import(request: Request, concurrency: int = Query(BULK_CONCURRENCY, ge=1, le=64)):
+    """Stream NDJSON (default) or CSV (``Content-Type: text/csv``) rows into Cosmos."""
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    rows = parse_rows(aiter_lines(request.stream()), fmt)
+    return await svc.bulk_import(rows, chunk_rows=BULK_CHUNK_ROWS, concurrency=concurrency)
+
+@router.get("/{pk}/{id}", response_model=Company, responses={304: {"description": "Matches If-None-Match"}})
+async def get_company(response: Response, pk: str, id: str,
+                      fields: Optional[Tuple[str, ...]] = Depends(selected_fields),
+                      if_none_match: Optional[str] = Header(None, description="ETag of the copy the client holds")):
+    if fields is None and if_none_match is not None:
+        # A live cached copy knows the current etag: confirm the client's without reading the document
+        cached = svc.cached_etag(id, pk)
+        if etag_matches(if_none_match, cached):
+            return not_modified(cached)
+    item = await svc.get_company(id, pk, fields=fields)
     if not item:
         raise HTTPException(status_code=404, detail="Company not found")
-    return item
+    if fields is not None:
+        # A projection is not a full Company; return only the selected fields
+        return FastJSONResponse(item) if FAST_RESPONSES else JSONResponse(jsonable_encoder(item))
+    etag = item.get("_etag")
+    if etag is None:
+        return trusted_company(item)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag, "Cache-Control": DOCUMENT_CACHE_CONTROL}
+    response.headers.update(headers)
+    return trusted_company(item, headers=headers)
 
 @router.put("/{pk}/{id}", response_model=Company)
-def update_company(pk: str, id: str, payload: CompanyUpdate):
-    updated = svc.update_company(id, pk, payload.model_dump())
+async def update_company(pk: str, id: str, payload: CompanyUpdate,
+                         if_match: Optional[str] = Header(None, description="_etag the update is based on")):
+    # Only fields present in the body are written; omitted fields keep their stored values
+    updated = await svc.update_company(id, pk, payload.model_dump(mode="json", exclude_unset=True), if_match=if_match)
     if not updated:
         raise HTTPException(status_code=404, detail="Company not found")
-    return updated
+    return trusted_company(updated)
 
 @router.delete("/{pk}/{id}", status_code=204)
-def delete_company(pk: str, id: str):
-    ok = svc.delete_company(id, pk)
+async def delete_company(pk: str, id: str):
+    ok = await svc.delete_company(id, pk)
     if not ok:
         raise HTTPException(status_code=404, detail="Company not found")
     return
 
 @router.get("/search", response_model=List[dict])
-def search(prefix: str = Query(..., min_length=1), limit: int = 20):
-    return svc.search_by_name_prefix(prefix, limit)
+async def search(response: Response, prefix: str = Query(..., min_length=1),
+                 page_size: Optional[int] = Query(None, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+                 limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE, description="Alias of page_size"),
+                 cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+                 fields: Optional[Tuple[str, ...]] = Depends(selected_fields)):
+    page = await svc.search_page(prefix, page_size or limit, cursor, fields=fields)
+    headers = {"Cache-Control": cache_control(SEARCH_CACHE_MAX_AGE)}
+    if page["next_cursor"] is not None:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    response.headers.update(headers)
+    return trusted(page["items"], headers=headers)
+
+@router.get("/validate", response_model=ValidationResult)
+async def validate(name: str = Query(..., min_length=1)):
+    return trusted(await svc.validate_name_exists(name))
 
-@router.get("/validate")
-def validate(name: str = Query(..., min_length=1)):
-    return svc.validate_name_exists(name)
+@router.get("/match", response_model=MatchResult)
+async def match(name: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=MAX_MATCH_LIMIT),
+                min_score: float = Query(MATCH_MIN_SCORE, ge=0, le=1)):
+    """Ranked fuzzy matches for a company name, ignoring case, punctuation and legal suffixes."""
+    return trusted(await svc.match_name(name, limit, min_score))
+
+@router.get("/partition-key")
+def partition_key(name: str = Query(..., min_length=1)):
+    """The ``pk`` a company with this name is stored under, for point reads by ``/{pk}/{id}``."""
+    return svc.partition_key(name)
 
 @router.get("/lookup")
-def lookup(ticker: Optional[str] = None, isin: Optional[str] = None, lei: Optional[str] = None):
+async def lookup(response: Response, ticker: Optional[str] = None, isin: Optional[str] = None,
+                 lei: Optional[str] = None, fields: Optional[Tuple[str, ...]] = Depends(selected_fields)):
+    headers = {"Cache-Control": cache_control(LOOKUP_CACHE_MAX_AGE)}
+    response.headers.update(headers)
     if not any([ticker, isin, lei]):
         return []
-    return svc.find_by_keys(ticker=ticker, isin=isin, lei=lei)
+    return trusted(await svc.find_by_keys(ticker=ticker, isin=isin, lei=lei, fields=fields), headers=headers)
+
+@router.post("/lookup:batch")
+async def lookup_batch(payload: BatchLookupRequest):
+    return trusted(await svc.find_many_by_keys(tickers=payload.tickers, isins=payload.isins, leis=payload.leis,
+                                               fields=payload.fields))
@@ -0,0 +1,86 @@
+import bisect
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.repository.base import SEARCH_FIELDS, Fields, project
+from app.utils import normalize_name
+
+SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "false").lower() == "true"
+
+
+class PrefixIndex:
+    """In-memory sorted index over ``name_lower`` for ``/companies/search``.
+
+    Holds only the projected search fields. Lookups are a bisect into a
+    sorted list of ``(name_lower, id)`` keys, followed by a walk while the
+    prefix still matches, so results come back in the same order as the
+    Cosmos ``ORDER BY c.name_lower`` query. Until :meth:`load` has run the
+    index is cold and callers should fall back to Cosmos.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        self._docs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _project(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {f: doc.get(f) for f in SEARCH_FIELDS}
+
+    def load(self, docs: Iterable[Dict[str, Any]]) -> None:
+        entries = {d["id"]: (d["name_lower"], self._project(d)) for d in docs if d.get("name_lower")}
+        self._keys = sorted((nl, id) for id, (nl, _) in entries.items())
+        self._docs = entries
+        self.ready = True
+
+    def upsert(self, doc: Dict[str, Any]) -> None:
+        if not doc.get("name_lower"):
+            return
+        self.remove(doc["id"])
+        key = (doc["name_lower"], doc["id"])
+        bisect.insort(self._keys, key)
+        self._docs[doc["id"]] = (doc["name_lower"], self._project(doc))
+
+    def remove(self, id: str) -> None:
+        entry = self._docs.pop(id, None)
+        if entry is None:
+            return
+        key = (entry[0], id)
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def held_keys(self) -> Iterable[Tuple[str, str]]:
+        return [(id, doc["pk"]) for id, (_, doc) in self._docs.items()]
+
+    # Change-feed consumer
+    def on_upsert(self, doc: Dict[str, Any]) -> None:
+        self.upsert(doc)
+
+    def on_delete(self, id: str, pk: str) -> None:
+        self.remove(id)
+
+    def covers(self, fields: Fields) -> bool:
+        """Whether a search projecting ``fields`` can be answered from the index."""
+        return fields is None or set(fields) <= set(SEARCH_FIELDS)
+
+    def search(self, prefix: str, limit: int = 20, fields: Fields = None,
+               after: Optional[str] = None) -> List[Dict[str, Any]]:
+        p = normalize_name(prefix)
+        results = []
+        i = bisect.bisect_left(self._keys, (p,))
+        if after is not None:
+            # First key strictly greater than ``after``, as in the Cosmos keyset query
+            i = max(i, bisect.bisect_left(self._keys, (after + "\0",)))
+        while i < len(self._keys) and len(results) < limit:
+            name_lower, id = self._keys[i]
+            if not name_lower.startswith(p):
+                break
+            results.append(project(dict(self._docs[id][1]), fields, "name"))
+            i += 1
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "size": len(self._docs)}
@@ -1,39 +1,237 @@
-from typing import Optional, List, Dict, Any
+import time
+from collections import Counter
+from typing import Optional, List, Dict, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Hashable, Tuple
 from azure.cosmos import exceptions
 from fastapi import HTTPException
-from app.repository.company_repository import CompanyRepository
+from pydantic import ValidationError
+from app.match_index import MATCH_MIN_SCORE, MatchIndex, canonical_name, rank
+from app.models import CompanyCreate
+from app.name_filter import NameBloomFilter
+from app.repository.async_company_repository import AsyncCompanyRepository
+from app.repository.base import Fields
+from app.repository.protocol import CompanyRepositoryProtocol, RepositoryError
+from app.search_index import PrefixIndex
+from app.single_flight import SingleFlight
+from app.utils import decode_cursor, encode_cursor, normalize_name
+
+# Prefix matches ranked by /companies/match while the match index is cold
+MATCH_FALLBACK_CANDIDATES = 200
+
+
+def _key(value: Any) -> Hashable:
+    """``value`` as part of a single-flight key (``fields`` may arrive as a list)."""
+    return tuple(value) if isinstance(value, (list, tuple)) else value
+
 
 class CompanyService:
-    def __init__(self, repo: CompanyRepository | None = None):
-        self.repo = repo or CompanyRepository()
+    def __init__(self, repo: CompanyRepositoryProtocol | None = None, search_index: PrefixIndex | None = None,
+                 name_filter: NameBloomFilter | None = None, match_index: MatchIndex | None = None,
+                 single_flight: SingleFlight | None = None):
+        self.repo = repo or AsyncCompanyRepository()
+        self.search_index = search_index
+        self.name_filter = name_filter
+        self.match_index = match_index
+        self.single_flight = single_flight
+
+    async def _coalesced(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """``call()``, shared with identical reads already in flight when single-flight is on."""
+        if self.single_flight is None:
+            return await call()
+        return await self.single_flight.do(key, call)
+
+    def _written(self) -> None:
+        # Reads arriving after a write must not join a read that started before it
+        if self.single_flight is not None:
+            self.single_flight.forget()
+
+    async def load_search_index(self) -> None:
+        if self.search_index is not None:
+            self.search_index.load(await self.repo.scan_search_fields())
+
+    async def load_name_filter(self) -> None:
+        if self.name_filter is not None:
+            self.name_filter.load(await self.repo.scan_names())
+
+    async def load_match_index(self) -> None:
+        if self.match_index is not None:
+            self.match_index.load(await self.repo.scan_search_fields())
+
+    def change_consumers(self) -> List[Any]:
+        """The local copies a change-feed processor should keep current."""
+        return [c for c in (self.repo.cache, self.search_index, self.name_filter, self.match_index) if c is not None]
+
+    def _indexed(self, doc: Dict[str, Any]) -> None:
+        """Apply a created or updated document to the in-memory indexes."""
+        self._written()
+        if self.search_index is not None:
+            self.search_index.upsert(doc)
+        if self.name_filter is not None:
+            self.name_filter.add(doc.get("name_lower"))
+        if self.match_index is not None:
+            self.match_index.upsert(doc)
+
+    async def create_company(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            created = await self.repo.create(data)
+        except (exceptions.CosmosHttpResponseError, RepositoryError) as e:
+            if e.status_code == 409:
+                raise HTTPException(status_code=409, detail=f"Company with name '{data.get('name')}' already exists")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        self._indexed(created)
+        return created
+
+    async def bulk_import(self, rows: AsyncIterable[Tuple[Optional[Dict[str, Any]], Optional[str]]],
+                          chunk_rows: int = 1000, concurrency: int = 8) -> Dict[str, Any]:
+        """Validate and create a stream of ``(row, parse_error)`` pairs chunk by chunk.
+
+        Returns a per-row report (``created``/``conflict``/``invalid``/``error``)
+        plus a throughput summary.
+        """
+        start = time.perf_counter()
+        results: List[Dict[str, Any]] = []
+        counts: Counter = Counter()
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        row_no = 0
+
+        async def flush():
+            written = await self.repo.bulk_create([data for _, data in chunk], concurrency=concurrency)
+            for (n, _), res in zip(chunk, written):
+                doc, code = res["doc"], res["status_code"]
+                status = "created" if code == 201 else "conflict" if code == 409 else "error"
+                counts[status] += 1
+                entry = {"row": n, "status": status, "id": doc["id"], "pk": doc["pk"], "name": doc["name"]}
+                if status == "created":
+                    self._indexed(doc)
+                else:
+                    entry["status_code"] = code
+                    entry["error"] = res["error"]
+                results.append(entry)
+            chunk.clear()
+
+        async for row, error in rows:
+            row_no += 1
+            if error is None:
+                try:
+                    chunk.append((row_no, CompanyCreate.model_validate(row).model_dump(mode="json")))
+                except ValidationError as e:
+                    error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            if error is not None:
+                counts["invalid"] += 1
+                results.append({"row": row_no, "status": "invalid", "error": error})
+            if len(chunk) >= chunk_rows:
+                await flush()
+        if chunk:
+            await flush()
+
+        results.sort(key=lambda r: r["row"])
+        seconds = time.perf_counter() - start
+        summary = {
+            "rows": row_no,
+            **{k: counts[k] for k in ("created", "conflict", "invalid", "error")},
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(row_no / seconds, 1) if seconds else None,
+        }
+        return {"summary": summary, "results": results}
+
+    def cached_etag(self, id: str, pk: str) -> Optional[str]:
+        """The ``_etag`` of the cached document, if this worker holds a live copy; no read is made."""
+        return self.repo.cache.etag((pk, id))
 
-    def create_company(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_company(self, id: str, pk: str, fields: Fields = None):
+        return await self._coalesced(("get", pk, id, _key(fields)), lambda: self.repo.get(id, pk, fields=fields))
+
+    async def update_company(self, id: str, pk: str, data: Dict[str, Any], if_match: Optional[str] = None):
         try:
-            return self.repo.create(data)
-        except exceptions.CosmosHttpResponseError as e:
+            updated = await self.repo.update(id, pk, data, if_match=if_match)
+        except (exceptions.CosmosHttpResponseError, RepositoryError) as e:
+            if e.status_code == 412:
+                raise HTTPException(status_code=412, detail="Company was modified since it was read")
             if e.status_code == 409:
                 raise HTTPException(status_code=409, detail=f"Company with name '{data.get('name')}' already exists")
             raise HTTPException(status_code=500, detail="Internal server error")
+        if updated:
+            self._indexed(updated)
+        return updated
 
-    def get_company(self, id: str, pk: str):
-        return self.repo.get(id, pk)
+    async def delete_company(self, id: str, pk: str) -> bool:
+        ok = await self.repo.delete(id, pk)
+        self._written()
+        if ok and self.search_index is not None:
+            self.search_index.remove(id)
+        if ok and self.match_index is not None:
+            self.match_index.remove(id)
+        return ok
 
-    def update_company(self, id: str, pk: str, data: Dict[str, Any]):
-        return self.repo.update(id, pk, data)
+    async def search_by_name_prefix(self, prefix: str, limit: int = 20, fields: Fields = None,
+                                    after: Optional[str] = None):
+        # Serve typeahead from memory once the index is warm; Cosmos otherwise
+        if self.search_index is not None and self.search_index.ready and self.search_index.covers(fields):
+            return self.search_index.search(prefix, limit, fields=fields, after=after)
+        return await self.repo.search_by_name_prefix(prefix, limit, fields=fields, after=after)
 
-    def delete_company(self, id: str, pk: str) -> bool:
-        return self.repo.delete(id, pk)
+    async def search_page(self, prefix: str, page_size: int = 20, cursor: Optional[str] = None,
+                          fields: Fields = None) -> Dict[str, Any]:
+        """One page of prefix matches plus the cursor for the next page (None on the last page)."""
+        try:
+            after = decode_cursor(cursor) if cursor is not None else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # One extra row tells whether another page exists
+        items = await self.search_by_name_prefix(prefix, page_size + 1, fields=fields, after=after)
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = encode_cursor(normalize_name(items[-1]["name"]))
+        return {"items": items, "next_cursor": next_cursor}
 
-    def search_by_name_prefix(self, prefix: str, limit: int = 20):
-        return self.repo.search_by_name_prefix(prefix, limit)
+    def iter_companies(self, page_size: int, fields: Fields = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        return self.repo.iter_pages(page_size, fields=fields)
 
-    def validate_name_exists(self, name: str) -> Dict[str, Any]:
-        hit = self.repo.find_by_name_exact(name)
+    async def validate_name_exists(self, name: str) -> Dict[str, Any]:
+        # Without a caught-up change feed the filter may lack names written by other workers
+        screened = self.name_filter is not None and self.name_filter.current()
+        if screened and not self.name_filter.might_contain(normalize_name(name)):
+            # Definite miss: the name was never loaded into, added to or fed to the filter
+            return {"query": name, "exists": False, "match": None}
+        hit = await self._coalesced(("find_by_name_exact", normalize_name(name)),
+                                    lambda: self.repo.find_by_name_exact(name, fields=("name",)))
+        if screened and hit is None:
+            self.name_filter.record_false_positive()
         return {
             "query": name,
             "exists": hit is not None,
             "match": {"id": hit.get("id"), "name": hit.get("name")} if hit else None
         }
 
-    def find_by_keys(self, **kwargs):
-        return self.repo.find_by_keys(**kwargs)
+    async def match_name(self, name: str, limit: int = 10, min_score: float = MATCH_MIN_SCORE) -> Dict[str, Any]:
+        """Companies whose names resemble ``name``, ranked by trigram similarity."""
+        canonical = canonical_name(name)
+        if self.match_index is not None and self.match_index.ready:
+            candidates = self.match_index.match(name, limit, min_score)
+        else:
+            # Cold or disabled: one prefix query on the first word, ranked the same way
+            first = canonical.split(" ", 1)[0]
+            docs = await self.search_by_name_prefix(first, MATCH_FALLBACK_CANDIDATES, fields=("name",)) if first else []
+            candidates = rank(name, docs, limit, min_score)
+        return {"query": name, "canonical": canonical, "candidates": candidates}
+
+    def partition_key(self, name: str) -> Dict[str, Any]:
+        partitioner = self.repo.partitioner
+        return {"name": name, "pk": partitioner.pk(name), "strategy": partitioner.name}
+
+    async def find_by_keys(self, **kwargs):
+        key = ("find_by_keys", *sorted((k, _key(v)) for k, v in kwargs.items()))
+        return await self._coalesced(key, lambda: self.repo.find_by_keys(**kwargs))
+
+    async def find_many_by_keys(self, *, tickers: List[str], isins: List[str], leis: List[str],
+                                fields: Fields = None) -> Dict[str, Dict[str, Any]]:
+        """Map every requested identifier, as the caller sent it, to its company, or None when there is no match."""
+        requested = {"ticker": tickers, "isin": isins, "lei": leis}
+        # Tickers are stored upper-cased: only the value queried is normalized, not the caller's key
+        queried = {field: [v.upper() if field == "ticker" else v for v in values]
+                   for field, values in requested.items()}
+        found = await self.repo.find_many_by_keys({f: v for f, v in queried.items() if v}, fields=fields)
+        return {
+            f"{field}s": {v: found.get(field, {}).get(q) for v, q in zip(values, queried[field])}
+            for field, values in requested.items()
+        }
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "false").lower() == "true"
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapse concurrent identical reads into one repository call.
+
+    The first caller for a key starts the call; callers that arrive while
+    it is in flight wait for the same result (or exception) instead of
+    issuing their own. Nothing is kept once the call finishes, so a result
+    is never older than a read started when it was requested. Writers call
+    :meth:`forget` after writing: reads that arrive later start a fresh call
+    rather than joining one that began before the write.
+
+    The call runs as its own task and waiters are shielded, so a caller
+    that is cancelled (a client disconnect) neither cancels the call for
+    the others nor fails them. Joined callers share the result object, as
+    they would a cached one; it must not be mutated.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.collapsed = 0
+        self.max_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """The result of ``call()``, shared with every concurrent caller of the same ``key``."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.collapsed += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Retrieved here so an exception nobody is left waiting for is not logged as lost
+            task.exception()
+
+    def forget(self) -> None:
+        """Stop new callers from joining the calls in flight; their current waiters still get the results."""
+        self._inflight.clear()
+        self._waiters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.collapsed
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "collapse_ratio": round(self.collapsed / total, 4) if total else None,
+            "in_flight": len(self._inflight),
+            "max_waiters": self.max_waiters,
+        }
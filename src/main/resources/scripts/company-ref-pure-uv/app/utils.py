@@ -1,14 +1,75 @@
+import base64
+import binascii
+import functools
+import json
+import os
 import re
-from typing import Optional
+import unicodedata
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# "lower": str.lower, the form every stored name_lower has been written in.
+# "unicode": NFKC plus case folding, so compatibility forms (full-width letters,
+# ligatures) and folded case ("ß" and "ss") compare equal. Switching changes
+# name_lower and pk of non-ASCII names, so stored documents must be re-imported.
+NAME_NORMALIZATION = os.environ.get("NAME_NORMALIZATION", "lower")
+# Normalized names memoized per worker (for hot names); 0 turns the memo off
+NAME_NORMALIZE_CACHE_SIZE = int(os.environ.get("NAME_NORMALIZE_CACHE_SIZE", "0"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _collapse(x: str) -> str:
+    # Whitespace other than " " is never printable, so a printable string
+    # without a double space is already collapsed and skips the regex
+    return _WHITESPACE.sub(" ", x) if "  " in x or not x.isprintable() else x
+
+def _lower(name: str) -> str:
+    return _collapse(name.strip().lower())
+
+def _unicode(name: str) -> str:
+    if name.isascii():
+        # NFKC leaves ASCII alone and casefold() is lower() on it
+        return _collapse(name.strip().lower())
+    folded = unicodedata.normalize("NFKC", unicodedata.normalize("NFKC", name).casefold())
+    return _collapse(folded.strip())
+
+def make_normalizer(form: str = NAME_NORMALIZATION, cache_size: int = NAME_NORMALIZE_CACHE_SIZE) -> Callable[[str], str]:
+    """The name normalizer for ``form``, memoized in an LRU of ``cache_size`` names if positive."""
+    forms = {"lower": _lower, "unicode": _unicode}
+    if form not in forms:
+        raise ValueError(f"Unknown name normalization: {form!r}")
+    fn = forms[form]
+    return functools.lru_cache(maxsize=cache_size)(fn) if cache_size > 0 else fn
+
+_normalize = make_normalizer()
 
 def normalize_name(name: str) -> str:
-    x = name.strip().lower()
-    x = re.sub(r"\s+", " ", x)
-    return x
+    return _normalize(name)
+
+def normalize_names(names: Iterable[str]) -> List[str]:
+    """``normalize_name`` over many names, e.g. a bulk load, without the per-call overhead."""
+    return list(map(_normalize, names))
+
+def name_key(name: str) -> Tuple[str, str]:
+    """``(name_lower, pk)`` of a name, normalizing it once."""
+    n = _normalize(name)
+    return n, n[0] if n else "_"
 
 def derive_pk_from_name(name: str) -> str:
-    n = normalize_name(name)
-    return n[0] if n else "_"
+    return name_key(name)[1]
 
 def non_empty(x: Optional[str]) -> bool:
     return isinstance(x, str) and x.strip() != ""
+
+def encode_cursor(key: str) -> str:
+    """Opaque, URL-safe paging cursor for a keyset position."""
+    return base64.urlsafe_b64encode(json.dumps({"after": key}).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    """Inverse of :func:`encode_cursor`; raises ValueError for anything else."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(data, dict) or not isinstance(data.get("after"), str):
+        raise ValueError("invalid cursor")
+    return data["after"]
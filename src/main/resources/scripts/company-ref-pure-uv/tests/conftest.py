@@ -1,111 +1,811 @@
 """
 Test utilities and fixtures for the Company Reference API tests.
 """
+import asyncio
+import bisect
+import itertools
+import operator
+import re
+import time
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from typing import Dict, Any, List, Optional
 from fastapi.testclient import TestClient
 
 
+class MockDocuments:
+    """A mock container's documents and the indexes its queries use.
+
+    Documents iterate in insertion order, like the list this replaces, and
+    are indexed by ``(pk, id)``, by partition, by value for each of
+    ``INDEXED`` and, for ``name_lower``, in sorted order. ``append``,
+    ``extend`` and ``clear`` keep the indexes current, so tests can still
+    seed or empty a container directly; anything else must go through
+    :meth:`put` and :meth:`remove`.
+    """
+
+    INDEXED = ("name_lower", "ticker", "isin", "lei")
+
+    def __init__(self, docs=()):
+        self.by_key: Dict[tuple, Dict[str, Any]] = {}
+        self.by_pk: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        self.by_value: Dict[str, Dict[Any, Dict[tuple, Dict[str, Any]]]] = {f: {} for f in self.INDEXED}
+        self.seq: Dict[tuple, int] = {}
+        self._names: List[tuple] = []  # (name_lower, key), sorted by name_lower when _sorted
+        self._sorted = True
+        self.extend(docs)
+
+    @staticmethod
+    def key(doc: Dict[str, Any]) -> tuple:
+        return doc.get("pk"), doc["id"]
+
+    def __iter__(self):
+        return iter(list(self.by_key.values()))
+
+    def __len__(self) -> int:
+        return len(self.by_key)
+
+    def __getitem__(self, index):
+        return list(self.by_key.values())[index]
+
+    def append(self, doc: Dict[str, Any]):
+        self.put(doc)
+
+    def extend(self, docs):
+        self._sorted = False
+        for doc in docs:
+            self.put(doc)
+
+    def clear(self):
+        self.__init__()
+
+    def get(self, pk: Any, id: str) -> Optional[Dict[str, Any]]:
+        return self.by_key.get((pk, id))
+
+    def put(self, doc: Dict[str, Any]):
+        """Store ``doc``, replacing (in place, keeping its position) any document with its key."""
+        key = self.key(doc)
+        old = self.by_key.get(key)
+        if old is not None:
+            self._unindex(key, old)
+        self.by_key[key] = doc
+        self.by_pk.setdefault(key[0], {})[key[1]] = doc
+        self.seq.setdefault(key, len(self.seq))
+        for field in self.INDEXED:
+            value = doc.get(field)
+            if value is not None:
+                self.by_value[field].setdefault(value, {})[key] = doc
+        if isinstance(doc.get("name_lower"), str):
+            if self._sorted:
+                bisect.insort(self._names, (doc["name_lower"], key), key=_first)
+            else:
+                self._names.append((doc["name_lower"], key))
+
+    def remove(self, doc: Dict[str, Any]):
+        key = self.key(doc)
+        self._unindex(key, self.by_key.pop(key))
+        del self.by_pk[key[0]][key[1]]
+        if not self.by_pk[key[0]]:
+            del self.by_pk[key[0]]
+        del self.seq[key]
+
+    def _unindex(self, key: tuple, doc: Dict[str, Any]):
+        for field in self.INDEXED:
+            holders = self.by_value[field].get(doc.get(field))
+            if holders is not None:
+                holders.pop(key, None)
+                if not holders:
+                    del self.by_value[field][doc.get(field)]
+        name = doc.get("name_lower")
+        if isinstance(name, str):
+            names = self.names()
+            i = bisect.bisect_left(names, name, key=_first)
+            while names[i][1] != key:
+                i += 1
+            del names[i]
+
+    def names(self) -> List[tuple]:
+        """The ``(name_lower, key)`` index in name order.
+
+        Single writes insert in place; ``extend`` appends and leaves the
+        sort to the next read, so seeding many documents costs one sort.
+        """
+        if not self._sorted:
+            self._names.sort(key=_first)
+            self._sorted = True
+        return self._names
+
+    def name_range(self, low: Optional[str], low_inclusive: bool, high: Optional[str],
+                   high_inclusive: bool):
+        """Keys whose name_lower is within the bounds, in name order (None is unbounded)."""
+        names = self.names()
+        start = 0 if low is None else (bisect.bisect_left if low_inclusive else bisect.bisect_right)(
+            names, low, key=_first)
+        end = len(names) if high is None else (bisect.bisect_right if high_inclusive else bisect.bisect_left)(
+            names, high, key=_first)
+        for i in range(start, end):
+            yield names[i][1]
+
+
+def _first(entry: tuple):
+    return entry[0]
+
+
+_TOKEN = re.compile(r"\s*(?:(@\w+)|c\.(\w+)|(\d+)|(>=|<=|!=|[=<>(),*])|([A-Za-z]\w*))")
+_KEYWORDS = {"SELECT", "TOP", "VALUE", "FROM", "WHERE", "AND", "OR", "IN", "ORDER", "BY", "ASC", "DESC", "STARTSWITH"}
+
+
+class MockQuery:
+    """A query in the Cosmos SQL subset the repositories issue, parsed once.
+
+    ``SELECT [TOP n] * | VALUE c.f | c.f, ... FROM c [WHERE ...] [ORDER BY c.f [ASC|DESC]]``
+    where conditions are ``=``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` and
+    ``IN (...)`` on a property, ``STARTSWITH(c.f, @p)``, combined with
+    ``AND``, ``OR`` and parentheses. Operands are ``@parameters`` or
+    integers. Anything else is a 400, as Cosmos would answer.
+
+    The ``WHERE`` tree is nested tuples: ``("or", [...])``,
+    ``("and", [...])``, ``(op, field, operand)`` with ``op`` one of the
+    comparisons, ``"in"`` (operand is a list) or ``"startswith"``.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+        self._expect("SELECT")
+        self.top = self._operand() if self._accept("TOP") else None
+        self.value = False
+        if self._accept("*"):
+            self.fields = None
+        else:
+            self.value = self._accept("VALUE")
+            self.fields = [self._field()]
+            while not self.value and self._accept(","):
+                self.fields.append(self._field())
+        self._expect("FROM")
+        self._expect("c")
+        self.where = self._or() if self._accept("WHERE") else None
+        self.order = None
+        if self._accept("ORDER"):
+            self._expect("BY")
+            field = self._field()
+            descending = self._accept("DESC")
+            if not descending:
+                self._accept("ASC")
+            self.order = (field, descending)
+        if self.pos != len(self.tokens):
+            self._fail()
+        from app.indexing import parse_shape
+        shape = parse_shape(text)
+        self.shape_fields = [*shape["filters"], *(f for f, _ in shape["order_by"])]
+
+    def _tokenize(self, text: str) -> List[tuple]:
+        tokens, pos = [], 0
+        while pos < len(text.rstrip()):
+            m = _TOKEN.match(text, pos)
+            if m is None:
+                self._fail()
+            param, field, number, op, word = m.groups()
+            if param:
+                tokens.append(("param", param))
+            elif field:
+                tokens.append(("field", field))
+            elif number:
+                tokens.append(("const", int(number)))
+            elif op:
+                tokens.append(("op", op))
+            else:
+                tokens.append(("kw", word.upper() if word.upper() in _KEYWORDS else word))
+            pos = m.end()
+        return tokens
+
+    def _fail(self):
+        from azure.cosmos.exceptions import CosmosHttpResponseError
+        raise CosmosHttpResponseError(status_code=400, message=f"Unsupported query: {self.text}")
+
+    def _peek(self) -> Optional[tuple]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _accept(self, value: str) -> bool:
+        token = self._peek()
+        if token is not None and token[0] in ("kw", "op") and token[1] == value:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str):
+        if not self._accept(value):
+            self._fail()
+
+    def _take(self, kind: str):
+        token = self._peek()
+        if token is None or token[0] != kind:
+            self._fail()
+        self.pos += 1
+        return token[1]
+
+    def _field(self) -> str:
+        return self._take("field")
+
+    def _operand(self) -> tuple:
+        token = self._peek()
+        if token is None or token[0] not in ("param", "const"):
+            self._fail()
+        self.pos += 1
+        return token
+
+    def _or(self) -> tuple:
+        terms = [self._and()]
+        while self._accept("OR"):
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def _and(self) -> tuple:
+        terms = [self._predicate()]
+        while self._accept("AND"):
+            terms.append(self._predicate())
+        return terms[0] if len(terms) == 1 else ("and", terms)
+
+    def _predicate(self) -> tuple:
+        if self._accept("("):
+            node = self._or()
+            self._expect(")")
+            return node
+        if self._accept("STARTSWITH"):
+            self._expect("(")
+            field = self._field()
+            self._expect(",")
+            operand = self._operand()
+            self._expect(")")
+            return ("startswith", field, operand)
+        field = self._field()
+        if self._accept("IN"):
+            self._expect("(")
+            operands = [self._operand()]
+            while self._accept(","):
+                operands.append(self._operand())
+            self._expect(")")
+            return ("in", field, operands)
+        for op in ("=", "!=", "<=", ">=", "<", ">"):
+            if self._accept(op):
+                return (op, field, self._operand())
+        self._fail()
+
+    def bind(self, node: Any, params: Dict[str, Any]) -> Any:
+        """``node`` with its operands replaced by their values."""
+        if node[0] == "param":
+            if node[1] not in params:
+                self._fail()
+            return params[node[1]]
+        if node[0] == "const":
+            return node[1]
+        if node[0] in ("or", "and"):
+            return (node[0], [self.bind(n, params) for n in node[1]])
+        if node[0] == "in":
+            return ("in", node[1], [self.bind(o, params) for o in node[2]])
+        return (node[0], node[1], self.bind(node[2], params))
+
+
+_COMPARE = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+            ">": operator.gt, ">=": operator.ge}
+
+
+def _matches(node: tuple, doc: Dict[str, Any]) -> bool:
+    """Whether ``doc`` satisfies a bound ``WHERE`` tree; comparing mismatched types is false, as in Cosmos."""
+    op = node[0]
+    if op == "or":
+        return any(_matches(n, doc) for n in node[1])
+    if op == "and":
+        return all(_matches(n, doc) for n in node[1])
+    value = doc.get(node[1])
+    if op == "in":
+        return value in node[2]
+    if op == "startswith":
+        return isinstance(value, str) and value.startswith(node[2])
+    if value is None:
+        return False
+    try:
+        return _COMPARE[op](value, node[2])
+    except TypeError:
+        return False
+
+
 class MockCosmosContainer:
-    """Mock Azure Cosmos DB container for testing."""
-    
-    def __init__(self):
-        self.items: List[Dict[str, Any]] = []
+    """In-memory stand-in for an Azure Cosmos DB container.
+
+    ``latency`` (seconds) simulates the network round trip of each call.
+    Each call reports a rough request charge through ``response_hook``.
+    Every write is appended to ``changes``, which backs the change feed.
+
+    Documents live in :class:`MockDocuments`, so point operations and the
+    unique-key check are hash lookups, and queries (see :class:`MockQuery`)
+    are served from the value and name indexes where they can be: an
+    equality or ``IN`` on an indexed property, or a ``name_lower`` range
+    (``STARTSWITH``, comparisons) read in name order and stopped at ``TOP``.
+    Other queries scan the partition in scope. Unique keys are enforced
+    within a logical partition, as Cosmos's ``unique_key_policy`` is.
+
+    Given an ``indexing_policy``, writes are charged per indexed term and
+    queries filtering or ordering on an unindexed property pay for a scan
+    of every document in scope, roughly as Cosmos does; otherwise every
+    call has a flat charge. Queries also report the documents they
+    examined and returned in ``x-ms-documentdb-query-metrics``.
+    """
+
+    READ_CHARGE = 1.0
+    WRITE_CHARGE = 5.71
+    QUERY_CHARGE = 2.8
+    WRITE_BASE_CHARGE = 4.5
+    INDEX_TERM_CHARGE = 0.15
+    SCAN_CHARGE = 0.05
+    UNIQUE_KEYS = ("name_lower", "ticker", "lei")
+
+    def __init__(self, latency: float = 0.0, indexing_policy: Optional[Dict[str, Any]] = None):
+        self._items = MockDocuments()
         self.next_id = 1
-    
-    def create_item(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.next_etag = 1
+        self.latency = latency
+        self.indexing_policy = indexing_policy
+        self.changes: List[Dict[str, Any]] = []
+        self._queries: Dict[str, MockQuery] = {}
+        self.properties: Dict[str, Any] = {"id": "companies", "partitionKey": {"paths": ["/pk"], "kind": "Hash"}}
+
+    @property
+    def items(self) -> MockDocuments:
+        return self._items
+
+    @items.setter
+    def items(self, docs):
+        # Assigning another container's items shares them, indexes included
+        self._items = docs if isinstance(docs, MockDocuments) else MockDocuments(docs)
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _stamp(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        item["_etag"] = f'"{self.next_etag:08x}"'
+        self.next_etag += 1
+        self.changes.append(dict(item))
+        return item
+
+    def _check_etag(self, existing: Dict[str, Any], etag: Optional[str] = None, match_condition=None):
+        if etag is not None and existing.get("_etag") != etag:
+            from azure.cosmos.exceptions import CosmosAccessConditionFailedError
+            raise CosmosAccessConditionFailedError(status_code=412, message="Precondition Failed")
+
+    def _existing(self, id: str, pk: Any) -> Dict[str, Any]:
+        existing = self.items.get(pk, id)
+        if existing is None:
+            from azure.cosmos.exceptions import CosmosResourceNotFoundError
+            raise CosmosResourceNotFoundError()
+        return existing
+
+    def _charge(self, response_hook, request_charge: float, result: Any = None, **headers: str):
+        if response_hook is not None:
+            response_hook({"x-ms-request-charge": str(request_charge),
+                           "x-ms-request-duration-ms": str(self.latency * 1000 / 2), **headers}, result)
+
+    def _write_charge(self, doc: Dict[str, Any], factor: float = 1.0) -> float:
+        if self.indexing_policy is None:
+            return self.WRITE_CHARGE * factor
+        terms = sum(_is_indexed(path, self.indexing_policy) for path in _leaf_paths(doc))
+        return round((self.WRITE_BASE_CHARGE + self.INDEX_TERM_CHARGE * terms) * factor, 2)
+
+    def _query_charge(self, query: MockQuery, scanned: int, returned: int) -> float:
+        charge = self.QUERY_CHARGE + 0.1 * returned
+        if self.indexing_policy is not None:
+            if not all(_is_indexed((f,), self.indexing_policy) for f in query.shape_fields):
+                charge += self.SCAN_CHARGE * scanned
+        return round(charge, 2)
+
+    def read(self, response_hook=None, **kwargs) -> Dict[str, Any]:
+        """Container properties, like ContainerProxy.read()."""
+        self._round_trip()
+        properties = dict(self.properties)
+        self._charge(response_hook, self.READ_CHARGE, properties)
+        return properties
+
+    def create_item(self, body: Dict[str, Any], response_hook=None) -> Dict[str, Any]:
         """Mock create_item method."""
+        self._round_trip()
+        created = self._create(body)
+        self._charge(response_hook, self._write_charge(created), created)
+        return created
+
+    def _check_unique(self, item: Dict[str, Any], replacing: bool = False):
+        key = MockDocuments.key(item)
+        conflict = key in self.items.by_key and not replacing
+        for field in self.UNIQUE_KEYS:
+            value = item.get(field)
+            if value is not None and value != "":
+                # Unique keys are scoped to the logical partition, as in Cosmos
+                conflict = conflict or any(k[0] == key[0] and k[1] != key[1]
+                                           for k in self.items.by_value[field].get(value, ()))
+        if conflict:
+            from azure.cosmos.exceptions import CosmosHttpResponseError
+            raise CosmosHttpResponseError(status_code=409, message="Conflict")
+
+    def _create(self, body: Dict[str, Any]) -> Dict[str, Any]:
         item = body.copy()
         if "id" not in item:
             item["id"] = str(self.next_id)
             self.next_id += 1
-        
-        # Check for unique key violations (simplified)
-        for existing in self.items:
-            if existing.get("name_lower") == item.get("name_lower"):
-                from azure.cosmos.exceptions import CosmosHttpResponseError
-                raise CosmosHttpResponseError(status_code=409, message="Conflict")
-            if item.get("lei") and existing.get("lei") == item.get("lei"):
-                from azure.cosmos.exceptions import CosmosHttpResponseError
-                raise CosmosHttpResponseError(status_code=409, message="Conflict")
-            if item.get("ticker") and existing.get("ticker") == item.get("ticker"):
-                from azure.cosmos.exceptions import CosmosHttpResponseError
-                raise CosmosHttpResponseError(status_code=409, message="Conflict")
-        
-        self.items.append(item)
-        return item
-    
-    def read_item(self, item: str, partition_key: str) -> Dict[str, Any]:
+        self._check_unique(item)
+        self.items.put(self._stamp(item))
+        return dict(item)
+
+    def _replace(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        item = dict(body)
+        self._check_unique(item, replacing=True)
+        self.items.put(self._stamp(item))
+        return dict(item)
+
+    def execute_item_batch(self, batch_operations: List[tuple], partition_key: str,
+                           response_hook=None) -> List[Dict[str, Any]]:
+        """Mock transactional batch (create operations only); all or nothing."""
+        self._round_trip()
+        self._charge(response_hook, sum(self._write_charge(args[0]) for _, args, *_ in batch_operations))
+        from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError
+        logged = len(self.changes)
+        results = []
+        for i, (op, args, *_) in enumerate(batch_operations):
+            body = args[0]
+            try:
+                if op != "create" or body.get("pk") != partition_key:
+                    raise CosmosHttpResponseError(status_code=400, message="Bad request")
+                results.append({"statusCode": 201, "resourceBody": self._create(body)})
+            except CosmosHttpResponseError as e:
+                for result in results:
+                    self.items.remove(result["resourceBody"])
+                del self.changes[logged:]
+                responses = [{"statusCode": e.status_code if j == i else 424} for j in range(len(batch_operations))]
+                raise CosmosBatchOperationError(error_index=i, headers={}, status_code=e.status_code,
+                                                message=e.message, operation_responses=responses)
+        return results
+
+    def read_item(self, item: str, partition_key: str, response_hook=None) -> Dict[str, Any]:
         """Mock read_item method."""
-        for existing in self.items:
-            if existing["id"] == item and existing["pk"] == partition_key:
-                return existing
-        from azure.cosmos.exceptions import CosmosResourceNotFoundError
-        raise CosmosResourceNotFoundError()
-    
-    def replace_item(self, item: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        self._round_trip()
+        existing = self._existing(item, partition_key)
+        self._charge(response_hook, self.READ_CHARGE, existing)
+        return dict(existing)
+
+    def replace_item(self, item: str, body: Dict[str, Any], response_hook=None, **conditions) -> Dict[str, Any]:
         """Mock replace_item method."""
-        for i, existing in enumerate(self.items):
-            if existing["id"] == item:
-                self.items[i] = body
-                return body
-        from azure.cosmos.exceptions import CosmosResourceNotFoundError
-        raise CosmosResourceNotFoundError()
-        from azure.cosmos.exceptions import CosmosResourceNotFoundError
-        raise CosmosResourceNotFoundError()
-    
-    def delete_item(self, item: str, partition_key: str):
+        self._round_trip()
+        self._check_etag(self._existing(item, body.get("pk")), **conditions)
+        replaced = self._replace(body)
+        self._charge(response_hook, self._write_charge(body, 2), body)
+        return replaced
+
+    def upsert_item(self, body: Dict[str, Any], response_hook=None) -> Dict[str, Any]:
+        """Mock upsert_item method: replace the (id, pk) document, or create it."""
+        self._round_trip()
+        if self.items.get(body.get("pk"), body["id"]) is not None:
+            upserted = self._replace(body)
+            self._charge(response_hook, self._write_charge(body, 2), body)
+            return upserted
+        created = self._create(body)
+        self._charge(response_hook, self._write_charge(created), created)
+        return created
+
+    def patch_item(self, item: str, partition_key: str, patch_operations: List[Dict[str, Any]],
+                   response_hook=None, **conditions) -> Dict[str, Any]:
+        """Mock patch_item method (``set`` operations on top-level paths)."""
+        self._round_trip()
+        existing = self._existing(item, partition_key)
+        self._check_etag(existing, **conditions)
+        patched = dict(existing)
+        for op in patch_operations:
+            assert op["op"] == "set" and op["path"].count("/") == 1
+            patched[op["path"][1:]] = op["value"]
+        patched = self._replace(patched)
+        self._charge(response_hook, self._write_charge(patched, 1.1), patched)
+        return patched
+
+    def delete_item(self, item: str, partition_key: str, response_hook=None, **conditions):
         """Mock delete_item method."""
-        for i, existing in enumerate(self.items):
-            if existing["id"] == item and existing["pk"] == partition_key:
-                del self.items[i]
-                return
-        from azure.cosmos.exceptions import CosmosResourceNotFoundError
-        raise CosmosResourceNotFoundError()
-    
-    def query_items(self, query: str, parameters: List[Dict[str, Any]], 
-                   enable_cross_partition_query: bool = False) -> List[Dict[str, Any]]:
-        """Mock query_items method (simplified query processing)."""
-        # Extract parameter values
-        param_dict = {}
-        for param in parameters:
-            param_dict[param["name"]] = param["value"]
-        
-        results = []
-        
-        # Handle different query types (simplified)
-        if "WHERE c.name_lower = @nl" in query:
-            nl = param_dict.get("@nl")
-            results = [item for item in self.items if item.get("name_lower") == nl]
-        
-        elif "WHERE STARTSWITH(c.name_lower, @p)" in query:
-            p = param_dict.get("@p")
-            limit = param_dict.get("@lim", 20)
-            results = [item for item in self.items if item.get("name_lower", "").startswith(p)]
-            results = sorted(results, key=lambda x: x.get("name_lower", ""))[:limit]
-        
-        elif "c.ticker" in query or "c.isin" in query or "c.lei" in query:
-            # Handle key lookups (both single criteria and OR combinations)
-            ticker = param_dict.get("@t")
-            isin = param_dict.get("@i")
-            lei = param_dict.get("@l")
-            
-            for item in self.items:
-                match = False
-                if ticker and item.get("ticker") == ticker:
-                    match = True
-                if isin and item.get("isin") == isin:
-                    match = True
-                if lei and item.get("lei") == lei:
-                    match = True
-                
-                if match and item not in results:
-                    results.append(item)
-        
+        self._round_trip()
+        existing = self._existing(item, partition_key)
+        self._check_etag(existing, **conditions)
+        self.items.remove(existing)
+        self._charge(response_hook, self._write_charge(existing))
+
+    def query_items_change_feed(self, continuation: Optional[str] = None, response_hook=None,
+                                **kwargs) -> List[Dict[str, Any]]:
+        """Mock latest-version change feed over a single partition key range.
+
+        The continuation is the position in ``changes`` (sent back in the
+        ``etag`` header, like Cosmos); none means "from now". Only the latest
+        version of each document since then is returned, and deletes never are.
+        """
+        self._round_trip()
+        start = len(self.changes) if continuation is None else int(continuation.strip('"'))
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for change in self.changes[start:]:
+            latest.pop((change["pk"], change["id"]), None)
+            latest[(change["pk"], change["id"])] = change
+        results = [dict(c) for c in latest.values()]
+        if response_hook is not None:
+            response_hook({"x-ms-request-charge": str(self.QUERY_CHARGE + 0.1 * len(results)),
+                           "etag": f'"{len(self.changes)}"'}, {"Documents": results})
+        return results
+
+    def _candidates(self, where: Optional[tuple], partition_key: Any):
+        """Documents that may match ``where``, and whether they come in name_lower order.
+
+        Each ``OR`` branch is served by a value index (an equality or ``IN``
+        on an ``INDEXED`` property) or the name index (bounds on
+        ``name_lower``); if any branch can be neither, the scope is scanned.
+        """
+        items = self.items
+        scope = items.by_key.values() if partition_key is None else items.by_pk.get(partition_key, {}).values()
+        if where is None:
+            return scope, False
+        sources = [self._index_source(branch) for branch in (where[1] if where[0] == "or" else [where])]
+        if any(source is None for source in sources):
+            return scope, False
+        in_scope = (lambda k: True) if partition_key is None else (lambda k: k[0] == partition_key)
+        if len(sources) == 1 and sources[0][1]:
+            # A single name range streams in order, so TOP stops reading early
+            return (items.by_key[k] for k in sources[0][0] if in_scope(k)), True
+        union = {k for keys, _ in sources for k in keys if in_scope(k)}
+        return [items.by_key[k] for k in sorted(union, key=items.seq.__getitem__)], False
+
+    def _index_source(self, branch: tuple) -> Optional[tuple]:
+        """Keys from an index that include every match of one ``OR`` branch, and whether they are in name order."""
+        terms = [t for t in (branch[1] if branch[0] == "and" else [branch]) if len(t) == 3]
+        for op, field, value in terms:
+            if op in ("=", "in") and field in MockDocuments.INDEXED:
+                index = self.items.by_value[field]
+                return [k for v in ([value] if op == "=" else value) for k in index.get(v, ())], False
+        bounds = self._name_bounds(terms)
+        return None if bounds is None else (self.items.name_range(*bounds), True)
+
+    @staticmethod
+    def _name_bounds(terms: List[tuple]) -> Optional[tuple]:
+        """``(low, low_inclusive, high, high_inclusive)`` on name_lower implied by ``terms``, or None."""
+        from app.repository.base import prefix_range
+        low, low_inclusive, high, high_inclusive = None, True, None, False
+        for op, field, value in terms:
+            if field != "name_lower" or not isinstance(value, str):
+                continue
+            if op == "startswith":
+                term_low, term_high = prefix_range(value)
+                lows, highs = [(term_low, True)], [(term_high, False)] if term_high is not None else []
+            else:
+                lows = [(value, op == ">=")] if op in (">", ">=") else []
+                highs = [(value, op == "<=")] if op in ("<", "<=") else []
+            for value, inclusive in lows:
+                if low is None or value > low or (value == low and not inclusive):
+                    low, low_inclusive = value, inclusive
+            for value, inclusive in highs:
+                if high is None or value < high or (value == high and not inclusive):
+                    high, high_inclusive = value, inclusive
+        if low is None and high is None:
+            return None
+        return low, low_inclusive, high, high_inclusive
+
+    def query_items(self, query: str, parameters: List[Dict[str, Any]],
+                   enable_cross_partition_query: bool = False,
+                   partition_key: Optional[str] = None, response_hook=None) -> List[Dict[str, Any]]:
+        """Mock query_items method.
+
+        With ``partition_key`` only that partition is searched, as in Cosmos.
+        """
+        self._round_trip()
+        parsed = self._queries.get(query)
+        if parsed is None:
+            parsed = self._queries[query] = MockQuery(query)
+        params = {p["name"]: p["value"] for p in parameters}
+        where = None if parsed.where is None else parsed.bind(parsed.where, params)
+        top = None if parsed.top is None else parsed.bind(parsed.top, params)
+
+        candidates, in_name_order = self._candidates(where, partition_key)
+        examined = 0
+
+        def matching():
+            nonlocal examined
+            for doc in candidates:
+                examined += 1
+                if where is None or _matches(where, doc):
+                    yield doc
+
+        results = matching()
+        if parsed.order is not None and not (in_name_order and parsed.order == ("name_lower", False)):
+            field, descending = parsed.order
+            results = sorted(results, key=lambda d: (d.get(field) is not None, d.get(field)), reverse=descending)
+        results = list(itertools.islice(results, top))
+
+        # Apply a "SELECT c.a, c.b ..." projection; "SELECT *" returns whole documents
+        if parsed.fields is None:
+            results = [dict(item) for item in results]
+        elif parsed.value:
+            results = [item.get(parsed.fields[0]) for item in results]
+        else:
+            results = [{f: item[f] for f in parsed.fields if f in item} for item in results]
+
+        scope = len(self.items) if partition_key is None else len(self.items.by_pk.get(partition_key, ()))
+        self._charge(response_hook, self._query_charge(parsed, scope, len(results)), {"Documents": results},
+                     **{"x-ms-documentdb-query-metrics":
+                        f"retrievedDocumentCount={examined};outputDocumentCount={len(results)}"})
         return results
 
 
+def _leaf_paths(value: Any, path: tuple = ()) -> List[tuple]:
+    """Paths of the scalar values in a document; array elements are ``[]``."""
+    if isinstance(value, dict):
+        return [p for k, v in value.items() for p in _leaf_paths(v, path + (k,))]
+    if isinstance(value, list):
+        return [p for v in value for p in _leaf_paths(v, path + ("[]",))]
+    return [path]
+
+
+def _is_indexed(path: tuple, policy: Dict[str, Any]) -> bool:
+    """Whether an indexing policy indexes the scalar at ``path``.
+
+    The most specific matching path wins (longer, then ``/?`` over ``/*``),
+    and an excluded path wins a tie, as in Cosmos.
+    """
+    best = None
+    for included, key in ((True, "includedPaths"), (False, "excludedPaths")):
+        for entry in policy.get(key, []):
+            *segments, wildcard = [s.strip('"') for s in entry["path"].split("/")[1:]]
+            segments = tuple(segments)
+            if path == segments if wildcard == "?" else path[:len(segments)] == segments:
+                rank = (len(segments), wildcard == "?", not included)
+                if best is None or rank > best[0]:
+                    best = (rank, included)
+    return best is not None and best[1]
+
+
+class MockCosmosDatabase:
+    """In-memory stand-in for a DatabaseProxy holding MockCosmosContainers.
+
+    ``replace_container`` rebuilds the container definition from only the
+    arguments it is given, as Cosmos does, so a property the caller does not
+    pass back is dropped.
+    """
+
+    def __init__(self, **containers: MockCosmosContainer):
+        self.containers = containers
+
+    def get_container_client(self, container: str) -> MockCosmosContainer:
+        return self.containers[container]
+
+    def replace_container(self, container: str, partition_key: Dict[str, Any],
+                          indexing_policy: Optional[Dict[str, Any]] = None, default_ttl: Optional[int] = None,
+                          conflict_resolution_policy: Optional[Dict[str, Any]] = None,
+                          analytical_storage_ttl: Optional[int] = None, **kwargs) -> MockCosmosContainer:
+        properties = {"id": container, "partitionKey": dict(partition_key), "indexingPolicy": indexing_policy,
+                      "defaultTtl": default_ttl, "conflictResolutionPolicy": conflict_resolution_policy,
+                      "analyticalStorageTtl": analytical_storage_ttl}
+        replaced = self.containers[container]
+        replaced.properties = {k: v for k, v in properties.items() if v is not None}
+        replaced.indexing_policy = indexing_policy
+        return replaced
+
+
+class AsyncMockCosmosContainer:
+    """Async (azure.cosmos.aio-style) view over a MockCosmosContainer.
+
+    Shares the wrapped container's items, so sync and async fixtures see the
+    same data. Latency is awaited instead of slept, like a real aio round trip.
+    """
+
+    def __init__(self, container: Optional[MockCosmosContainer] = None, latency: float = 0.0):
+        self.sync = container or MockCosmosContainer()
+        self.latency = latency
+        self.container_link = "dbs/companydb/colls/companies"
+        self.client_connection = AsyncMockClientConnection(["0"])
+
+    @property
+    def items(self) -> List[Dict[str, Any]]:
+        return self.sync.items
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def read(self, response_hook=None) -> Dict[str, Any]:
+        """Container properties, like ContainerProxy.read()."""
+        await self._round_trip()
+        return self.sync.read(response_hook=response_hook)
+
+    async def create_item(self, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        await self._round_trip()
+        return self.sync.create_item(body=body, **kwargs)
+
+    async def read_item(self, item: str, partition_key: str, **kwargs) -> Dict[str, Any]:
+        await self._round_trip()
+        return self.sync.read_item(item=item, partition_key=partition_key, **kwargs)
+
+    async def replace_item(self, item: str, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        await self._round_trip()
+        return self.sync.replace_item(item=item, body=body, **kwargs)
+
+    async def upsert_item(self, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        await self._round_trip()
+        return self.sync.upsert_item(body=body, **kwargs)
+
+    async def patch_item(self, item: str, partition_key: str, patch_operations: List[Dict[str, Any]], **kwargs):
+        await self._round_trip()
+        return self.sync.patch_item(item=item, partition_key=partition_key, patch_operations=patch_operations, **kwargs)
+
+    async def delete_item(self, item: str, partition_key: str, **kwargs):
+        await self._round_trip()
+        return self.sync.delete_item(item=item, partition_key=partition_key, **kwargs)
+
+    async def execute_item_batch(self, batch_operations: List[tuple], partition_key: str, **kwargs) -> List[Dict[str, Any]]:
+        await self._round_trip()
+        return self.sync.execute_item_batch(batch_operations=batch_operations, partition_key=partition_key, **kwargs)
+
+    def query_items(self, query: str, parameters: List[Dict[str, Any]], max_item_count: Optional[int] = None,
+                    **kwargs) -> "AsyncMockItemPaged":
+        """Returns an AsyncItemPaged-like pager; iterate it, or its ``by_page()``."""
+        results = self.sync.query_items(query=query, parameters=parameters, **kwargs)
+        return AsyncMockItemPaged(self, results, max_item_count)
+
+    def query_items_change_feed(self, partition_key_range_id: Optional[str] = None,
+                                continuation: Optional[str] = None, max_item_count: Optional[int] = None,
+                                **kwargs) -> "AsyncMockItemPaged":
+        results = self.sync.query_items_change_feed(continuation=continuation, **kwargs)
+        return AsyncMockItemPaged(self, results, max_item_count)
+
+
+class AsyncMockClientConnection:
+    """The slice of the aio client connection the repository reaches into."""
+
+    def __init__(self, range_ids: List[str]):
+        self.range_ids = range_ids
+
+    async def _ReadPartitionKeyRanges(self, collection_link: str, response_hook=None, **kwargs):
+        if response_hook is not None:
+            response_hook({"x-ms-request-charge": "1"}, {"PartitionKeyRanges": []})
+        for range_id in self.range_ids:
+            yield {"id": range_id}
+
+
+class AsyncMockItemPaged:
+    """Stand-in for azure.core AsyncItemPaged over precomputed query results.
+
+    Each page costs one simulated round trip. ``by_page(token)`` resumes
+    from a ``continuation_token`` (an offset) like the SDK's.
+    """
+
+    def __init__(self, container: AsyncMockCosmosContainer, results: List[Dict[str, Any]],
+                 page_size: Optional[int] = None):
+        self.container = container
+        self.results = results
+        self.page_size = page_size or max(len(results), 1)
+        self.continuation_token: Optional[str] = None
+
+    async def _items(self, chunk):
+        for item in chunk:
+            yield item
+
+    def __aiter__(self):
+        return self._all()
+
+    async def _all(self):
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    async def by_page(self, continuation_token: Optional[str] = None):
+        start = int(continuation_token or 0)
+        while True:
+            await self.container._round_trip()
+            end = start + self.page_size
+            self.continuation_token = str(end) if end < len(self.results) else None
+            yield self._items(self.results[start:end])
+            if self.continuation_token is None:
+                return
+            start = end
+
+
 @pytest.fixture
 def mock_container():
     """Provide a mock Cosmos DB container."""
@@ -175,11 +875,23 @@ def test_client():
 
 
 @pytest.fixture
-def mock_get_container(mock_container):
-    """Mock the get_container function to return our mock container."""
+def async_mock_container(mock_container):
+    """Provide an async mock container sharing items with ``mock_container``."""
+    return AsyncMockCosmosContainer(mock_container)
+
+
+@pytest.fixture
+def mock_get_container(mock_container, async_mock_container):
+    """Mock the get_container functions to return our mock containers."""
+    from app.routers.companies import svc
+    svc.repo._container = None
+    svc.repo.cache.clear()
     with patch('app.db.get_container', return_value=mock_container):
         with patch('app.repository.company_repository.get_container', return_value=mock_container):
-            yield mock_container
+            with patch('app.repository.async_company_repository.get_async_container',
+                       AsyncMock(return_value=async_mock_container)):
+                yield mock_container
+    svc.repo._container = None
 
 
 @pytest.fixture
@@ -192,9 +904,16 @@ def mock_company_repository(mock_container):
 
 
 @pytest.fixture
-def mock_company_service(mock_company_repository):
-    """Provide a mocked CompanyService."""
+def mock_async_company_repository(async_mock_container):
+    """Provide an AsyncCompanyRepository over the async mock container."""
+    from app.repository.async_company_repository import AsyncCompanyRepository
+    repo = AsyncCompanyRepository()
+    repo._container = async_mock_container
+    return repo
+
+
+@pytest.fixture
+def mock_company_service(mock_async_company_repository):
+    """Provide a CompanyService over the async mock repository."""
     from app.services.company_service import CompanyService
-    service = CompanyService()
-    service.repository = mock_company_repository
-    return service
\ No newline at end of file
+    return CompanyService(repo=mock_async_company_repository)
\ No newline at end of file
@@ -1,6 +1,7 @@
 """
 Integration tests for the FastAPI endpoints.
 """
+import json
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
@@ -23,6 +24,79 @@ class TestHealthEndpoint:
         assert "message" in data
 
 
+class TestLifespan:
+    """Test the application lifespan handler."""
+
+    def test_lifespan_opens_and_closes_repository(self, mock_get_container):
+        """Test the async client is opened on startup and closed on shutdown."""
+        from app.routers.companies import svc
+
+        with TestClient(app) as client:
+            assert svc.repo._container is not None
+            assert client.get("/health").status_code == 200
+        assert svc.repo._container is None
+
+    def test_lifespan_loads_search_index(self, mock_get_container, sample_companies_list):
+        """Test the prefix index is loaded at startup when enabled."""
+        from app.routers.companies import svc
+        from app.repository.company_repository import CompanyRepository
+        from app.search_index import PrefixIndex
+
+        repo = CompanyRepository()
+        repo._container = mock_get_container
+        for company in sample_companies_list:
+            repo.create(company)
+
+        svc.search_index = PrefixIndex()
+        try:
+            with TestClient(app) as client:
+                assert svc.search_index.ready
+                assert client.get("/health").json()["search_index"]["size"] == 3
+                names = [c["name"] for c in client.get("/companies/search?prefix=a").json()]
+                assert names == ["Amazon.com Inc.", "Apple Inc."]
+        finally:
+            svc.search_index = None
+
+    def test_lifespan_loads_name_filter(self, mock_get_container, sample_companies_list):
+        """Test the name filter is loaded at startup but answers no misses without the change feed."""
+        from app.routers.companies import svc
+        from app.name_filter import NameBloomFilter
+
+        svc.name_filter = NameBloomFilter(capacity=100)
+        try:
+            with TestClient(app) as client:
+                client.post("/companies", json=sample_companies_list[0])
+                assert client.get("/companies/validate?name=apple inc.").json()["exists"] is True
+                assert client.get("/companies/validate?name=Nobody Ltd").json()["exists"] is False
+                stats = client.get("/health").json()["name_filter"]
+                assert stats["ready"] and not stats["current"] and stats["definite_misses"] == 0
+        finally:
+            svc.name_filter = None
+
+    def test_lifespan_without_db_config(self):
+        """Test the app still starts when Cosmos is not configured."""
+        with TestClient(app) as client:
+            response = client.post("/companies", json={"name": "Test Company"})
+            assert response.status_code == 503
+            assert client.get("/ready").status_code == 503
+
+    def test_ready_after_warm_up(self, mock_get_container):
+        """Test /ready reports ready once warm-up has finished."""
+        with TestClient(app) as client:
+            response = client.get("/ready")
+            assert response.status_code == 200
+            assert response.json()["status"] == "ready"
+
+    def test_not_ready_when_warm_up_fails(self, mock_get_container):
+        """Test a failed warm-up keeps /ready at 503 while /health stays up."""
+        from app.routers.companies import svc
+
+        with patch.object(svc.repo, "warm_up", side_effect=ConnectionError("unreachable")):
+            with TestClient(app) as client:
+                assert client.get("/ready").json()["status"] == "not_ready"
+                assert client.get("/health").status_code == 200
+
+
 class TestCompanyEndpoints:
     """Test the company CRUD endpoints."""
     
@@ -133,6 +207,20 @@ class TestCompanyEndpoints:
         assert data["notes"] == "Updated notes"
         assert data["name"] == sample_company_data["name"]  # Unchanged
     
+    def test_update_if_match_and_rename(self, client_with_mock_db):
+        """Test If-Match preconditions and renames that change the pk."""
+        client = client_with_mock_db
+        created = client.post("/companies", json={"name": "Apple Inc.", "ticker": "AAPL"}).json()
+
+        response = client.put(f"/companies/a/{created['id']}", json={"sector": "X"}, headers={"If-Match": '"stale"'})
+        assert response.status_code == 412
+
+        response = client.put(f"/companies/a/{created['id']}", json={"name": "Zeta Fruit"})
+        assert response.status_code == 200
+        assert response.json()["pk"] == "z"
+        assert response.json()["ticker"] == "AAPL"
+        assert client.get(f"/companies/z/{created['id']}").status_code == 200
+
     def test_update_company_not_found(self, client_with_mock_db):
         """Test updating non-existent company."""
         client = client_with_mock_db
@@ -206,14 +294,15 @@ class TestSearchEndpoints:
         assert any("Amazon" in name for name in names)
     
     def test_search_by_prefix_with_limit(self, client_with_test_data):
-        """Test searching with limit parameter."""
+        """Test limit caps the page like page_size; an empty prefix is rejected (see test_search_empty_prefix)."""
         client = client_with_test_data
         
-        response = client.get("/companies/search?prefix=&limit=2")
+        response = client.get("/companies/search?prefix=A&limit=1")
         assert response.status_code == 200
         
         data = response.json()
-        assert len(data) <= 2
+        assert len(data) == 1
+        assert "X-Next-Cursor" in response.headers
     
     def test_search_missing_prefix(self, client_with_test_data):
         """Test search without prefix parameter."""
@@ -345,6 +434,144 @@ class TestSearchEndpoints:
         assert len(data) == 0
 
 
+class TestBatchLookupEndpoint:
+    """Test POST /companies/lookup:batch."""
+
+    def test_lookup_batch_maps_identifiers(self, mock_get_container, sample_companies_list):
+        """Test every requested identifier maps to its match or null."""
+        client = TestClient(app)
+        for company in sample_companies_list:
+            client.post("/companies", json=company)
+
+        response = client.post("/companies/lookup:batch", json={
+            "tickers": ["aapl", "MSFT", "ZZZZ", "Msft"],
+            "isins": ["US0231351067"],
+        })
+        assert response.status_code == 200
+
+        data = response.json()
+        assert list(data["tickers"]) == ["aapl", "MSFT", "ZZZZ", "Msft"]
+        assert data["tickers"]["aapl"]["name"] == "Apple Inc."
+        assert data["tickers"]["Msft"]["name"] == "Microsoft Corporation"
+        assert data["tickers"]["MSFT"]["name"] == "Microsoft Corporation"
+        assert data["tickers"]["ZZZZ"] is None
+        assert data["isins"]["US0231351067"]["name"] == "Amazon.com Inc."
+        assert data["leis"] == {}
+
+    def test_lookup_batch_size_limit(self, mock_get_container):
+        """Test oversized requests are rejected."""
+        client = TestClient(app)
+        response = client.post("/companies/lookup:batch", json={"tickers": [f"T{i}" for i in range(5001)]})
+        assert response.status_code == 422
+
+
+class TestFieldSelection:
+    """Test ?fields= projections and the slim validate response."""
+
+    @pytest.fixture
+    def client(self, mock_get_container, sample_companies_list):
+        client = TestClient(app)
+        for company in sample_companies_list:
+            client.post("/companies", json=company)
+        return client
+
+    def test_get_with_fields(self, client):
+        """Test a point read returns only the selected fields."""
+        match = client.get("/companies/validate?name=Apple Inc.").json()["match"]
+        response = client.get(f"/companies/a/{match['id']}?fields=name,ticker")
+        assert response.status_code == 200
+        assert response.json() == {"id": match["id"], "pk": "a", "name": "Apple Inc.", "ticker": "AAPL"}
+
+    def test_search_and_lookup_with_fields(self, client):
+        """Test search and lookup honour fields."""
+        results = client.get("/companies/search?prefix=A&fields=name").json()
+        assert [set(r) for r in results] == [{"id", "pk", "name"}] * 2
+        results = client.get("/companies/lookup?ticker=MSFT&fields=country").json()
+        assert results == [{"id": results[0]["id"], "pk": "m", "country": "US"}]
+
+    def test_batch_lookup_with_fields(self, client):
+        """Test batch lookups honour fields."""
+        data = client.post("/companies/lookup:batch", json={"tickers": ["AAPL"], "fields": ["name"]}).json()
+        assert set(data["tickers"]["AAPL"]) == {"id", "pk", "name", "ticker"}
+
+    def test_unknown_fields_rejected(self, client):
+        """Test unknown field names never reach the query."""
+        assert client.get("/companies/search?prefix=A&fields=name,c.secret").status_code == 422
+        assert client.post("/companies/lookup:batch", json={"tickers": ["AAPL"], "fields": ["x"]}).status_code == 422
+
+    def test_validate_response_shape(self, client):
+        """Test validate returns only the match's id and name."""
+        data = client.get("/companies/validate?name=apple inc.").json()
+        assert data["exists"] is True
+        assert set(data["match"]) == {"id", "name"}
+
+
+class TestPagingAndStreaming:
+    """Test cursor paging on search and the streamed catalog listing."""
+
+    @pytest.fixture
+    def client(self, mock_get_container):
+        client = TestClient(app)
+        for name in ["Acme", "Adobe", "Airbus", "Alcoa", "Amgen", "Apple", "Asana", "Boeing"]:
+            client.post("/companies", json={"name": name})
+        return client
+
+    def _walk(self, client, url):
+        names, pages = [], 0
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            names += [r["name"] for r in response.json()]
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            url = f"/companies/search?prefix=a&page_size=3&cursor={cursor}" if cursor else None
+        return names, pages
+
+    def test_search_pages_with_cursor(self, client):
+        """Test following X-Next-Cursor visits every match once, in order."""
+        names, pages = self._walk(client, "/companies/search?prefix=a&page_size=3")
+        assert names == ["Acme", "Adobe", "Airbus", "Alcoa", "Amgen", "Apple", "Asana"]
+        assert pages == 3
+
+    def test_search_pages_from_index(self, client):
+        """Test the warm prefix index pages identically."""
+        from app.routers.companies import svc
+        from app.search_index import PrefixIndex
+
+        svc.search_index = PrefixIndex()
+        try:
+            with TestClient(app) as warm_client:
+                assert svc.search_index.ready
+                names, _ = self._walk(warm_client, "/companies/search?prefix=a&page_size=3")
+            assert names == ["Acme", "Adobe", "Airbus", "Alcoa", "Amgen", "Apple", "Asana"]
+        finally:
+            svc.search_index = None
+
+    def test_search_bounds_and_bad_cursor(self, client):
+        """Test page sizes are capped and malformed cursors rejected."""
+        assert client.get("/companies/search?prefix=a&page_size=201").status_code == 422
+        assert client.get("/companies/search?prefix=a&limit=1000").status_code == 422
+        assert client.get("/companies/search?prefix=a&cursor=garbage!").status_code == 400
+        assert "X-Next-Cursor" not in client.get("/companies/search?prefix=b").headers
+
+    def test_list_streams_ndjson(self, client, async_mock_container):
+        """Test GET /companies streams every company, one Cosmos page at a time."""
+        spy = patch.object(async_mock_container, "_round_trip", wraps=async_mock_container._round_trip)
+        with spy as round_trips:
+            response = client.get("/companies?page_size=3&fields=name")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == 8
+        assert set(rows[0]) == {"id", "pk", "name"}
+        assert round_trips.call_count == 3
+
+    def test_list_keeps_etag(self, client):
+        """Test whole documents keep _etag for incremental consumers."""
+        rows = [json.loads(line) for line in client.get("/companies").text.splitlines()]
+        assert all(r["_etag"] for r in rows)
+
+
 class TestAPIValidation:
     """Test API validation and error handling."""
     
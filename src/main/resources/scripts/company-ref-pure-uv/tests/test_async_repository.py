@@ -0,0 +1,215 @@
+"""
+Unit tests for the AsyncCompanyRepository class.
+"""
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from azure.cosmos.exceptions import CosmosHttpResponseError
+from app.repository.async_company_repository import AsyncCompanyRepository
+
+
+class TestAsyncCompanyRepository:
+    """Test the AsyncCompanyRepository class."""
+
+    @pytest.fixture
+    def repository(self, mock_async_company_repository):
+        """Create repository instance with mocked async container."""
+        return mock_async_company_repository
+
+    async def test_create_company_basic(self, repository, sample_company_data):
+        """Test creating a basic company."""
+        result = await repository.create(sample_company_data)
+
+        assert result["name"] == sample_company_data["name"]
+        assert result["name_lower"] == "apple inc."
+        assert result["pk"] == "a"
+        assert result["ticker"] == "AAPL"
+        assert "id" in result
+
+    async def test_create_company_duplicate_name(self, repository, sample_company_data):
+        """Test creating company with duplicate name raises error."""
+        await repository.create(sample_company_data)
+
+        with pytest.raises(CosmosHttpResponseError):
+            await repository.create(sample_company_data)
+
+    async def test_get_existing_and_missing(self, repository, sample_company_data):
+        """Test point reads for existing and non-existent companies."""
+        created = await repository.create(sample_company_data)
+
+        result = await repository.get(created["id"], created["pk"])
+        assert result["id"] == created["id"]
+        assert await repository.get("nonexistent", "n") is None
+
+    async def test_update_existing_company(self, repository, sample_company_data):
+        """Test updating an existing company."""
+        created = await repository.create(sample_company_data)
+
+        result = await repository.update(created["id"], created["pk"], {"sector": "Consumer Electronics"})
+        assert result["sector"] == "Consumer Electronics"
+        assert result["name"] == sample_company_data["name"]
+
+    async def test_update_nonexistent_company(self, repository):
+        """Test updating a non-existent company returns None."""
+        assert await repository.update("nonexistent", "n", {"sector": "Tech"}) is None
+
+    async def test_delete_company(self, repository, sample_company_data):
+        """Test deleting existing and non-existent companies."""
+        created = await repository.create(sample_company_data)
+
+        assert await repository.delete(created["id"], created["pk"]) is True
+        assert await repository.delete(created["id"], created["pk"]) is False
+
+    async def test_queries(self, repository, sample_companies_list):
+        """Test exact-name, prefix and key queries."""
+        for company in sample_companies_list:
+            await repository.create(company)
+
+        assert (await repository.find_by_name_exact("apple inc."))["name"] == "Apple Inc."
+        assert await repository.find_by_name_exact("Nonexistent") is None
+        assert len(await repository.search_by_name_prefix("A")) == 2
+        assert len(await repository.find_by_keys(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")) == 2
+        assert await repository.find_by_keys() == []
+
+    async def test_name_queries_are_single_partition(self, repository, sample_companies_list):
+        """Test exact-name and prefix queries are routed to one partition."""
+        for company in sample_companies_list:
+            await repository.create(company)
+
+        assert (await repository.find_by_name_exact("Microsoft Corporation"))["ticker"] == "MSFT"
+        assert len(await repository.search_by_name_prefix("a")) == 2
+        await repository.find_by_keys(ticker="AAPL")
+
+        stats = repository.routing_stats()
+        assert stats["find_by_name_exact"]["single_partition"] == 1
+        assert stats["search_by_name_prefix"]["single_partition"] == 1
+        assert stats["find_by_keys"]["cross_partition"] == 1
+
+    async def test_open_resolves_container_once(self, async_mock_container):
+        """Test open() resolves the container lazily and only once."""
+        getter = AsyncMock(return_value=async_mock_container)
+        with patch("app.repository.async_company_repository.get_async_container", getter):
+            repo = AsyncCompanyRepository()
+            await repo.open()
+            await repo.get("x", "x")
+        getter.assert_awaited_once()
+
+    async def test_warm_up(self, repository, async_mock_container):
+        """Test warm-up reads the container and primes cross-partition routing."""
+        async_mock_container.read = AsyncMock(wraps=async_mock_container.read)
+        with patch.object(async_mock_container, "query_items", wraps=async_mock_container.query_items) as spy:
+            await repository.warm_up()
+        async_mock_container.read.assert_awaited_once()
+        assert "partition_key" not in spy.call_args.kwargs
+
+    async def test_skip_create_if_not_exists(self):
+        """Test the container is resolved without control-plane calls when disabled."""
+        from app import db
+        client = Mock()
+        with patch.object(db, "COSMOS_CREATE_IF_NOT_EXISTS", False), \
+                patch.object(db, "get_async_client", return_value=client), \
+                patch.object(db, "_async_container", None):
+            container = await db.get_async_container()
+        client.create_database_if_not_exists.assert_not_called()
+        assert container is client.get_database_client.return_value.get_container_client.return_value
+
+    async def test_close_drops_container(self, repository):
+        """Test close() releases the client and the cached container."""
+        with patch("app.repository.async_company_repository.close_async_client", AsyncMock()) as closer:
+            await repository.close()
+        closer.assert_awaited_once()
+        assert repository._container is None
+
+
+class TestBatchLookup:
+    """Test many-identifier lookups."""
+
+    async def test_find_many_by_keys_chunks_and_maps(self, mock_async_company_repository, sample_companies_list):
+        """Test identifiers are resolved in chunked IN queries and keyed by value."""
+        repo = mock_async_company_repository
+        for company in sample_companies_list:
+            await repo.create(company)
+
+        with patch("app.repository.async_company_repository.LOOKUP_CHUNK_SIZE", 2):
+            found = await repo.find_many_by_keys({
+                "ticker": ["AAPL", "MSFT", "NOPE", "AAPL", ""],
+                "lei": ["PQOH26KWDF7CG10L6792"],
+            })
+
+        assert set(found["ticker"]) == {"AAPL", "MSFT"}
+        assert found["lei"]["PQOH26KWDF7CG10L6792"]["name"] == "Amazon.com Inc."
+        # 3 distinct tickers in chunks of 2, plus one LEI chunk
+        assert repo.routing_stats()["find_many_by_keys"]["cross_partition"] == 3
+
+
+class TestPartialUpdate:
+    """Test patch-based updates, etag preconditions and partition moves."""
+
+    @pytest.fixture
+    async def created(self, mock_async_company_repository):
+        return await mock_async_company_repository.create(
+            {"name": "Apple Inc.", "ticker": "AAPL", "sector": "Technology", "notes": "keep"})
+
+    async def test_single_patch_round_trip(self, mock_async_company_repository, async_mock_container, created):
+        """Test an update is one patch_item with only the set fields."""
+        repo = mock_async_company_repository
+        async_mock_container.read_item = AsyncMock(wraps=async_mock_container.read_item)
+        async_mock_container.patch_item = AsyncMock(wraps=async_mock_container.patch_item)
+
+        updated = await repo.update(created["id"], "a", {"sector": "Hardware", "ticker": "aapl2"})
+
+        async_mock_container.read_item.assert_not_awaited()
+        ops = async_mock_container.patch_item.call_args.kwargs["patch_operations"]
+        assert ops == [{"op": "set", "path": "/sector", "value": "Hardware"},
+                       {"op": "set", "path": "/ticker", "value": "AAPL2"}]
+        assert updated["notes"] == "keep"
+        assert updated["_etag"] != created["_etag"]
+
+    async def test_if_match(self, mock_async_company_repository, created):
+        """Test a stale etag is rejected and the current one accepted."""
+        repo = mock_async_company_repository
+        with pytest.raises(CosmosHttpResponseError) as exc:
+            await repo.update(created["id"], "a", {"sector": "X"}, if_match='"stale"')
+        assert exc.value.status_code == 412
+        updated = await repo.update(created["id"], "a", {"sector": "X"}, if_match=created["_etag"])
+        assert updated["sector"] == "X"
+
+    async def test_rename_within_partition(self, mock_async_company_repository, created):
+        """Test a rename that keeps the pk is patched in place."""
+        updated = await mock_async_company_repository.update(created["id"], "a", {"name": "Apple Computer"})
+        assert (updated["pk"], updated["name_lower"]) == ("a", "apple computer")
+
+    async def test_rename_moves_partition(self, mock_async_company_repository, async_mock_container, created):
+        """Test a rename into another partition moves the document, keeping its id."""
+        repo = mock_async_company_repository
+        moved = await repo.update(created["id"], "a", {"name": "Zeta Fruit"}, if_match=created["_etag"])
+
+        assert (moved["id"], moved["pk"], moved["notes"]) == (created["id"], "z", "keep")
+        assert await repo.get(created["id"], "a") is None
+        assert (await repo.get(created["id"], "z"))["name"] == "Zeta Fruit"
+        assert len(async_mock_container.items) == 1
+
+    async def test_move_rolls_back_on_concurrent_change(self, mock_async_company_repository, async_mock_container, created):
+        """Test the copy is removed when the old document changed before the delete."""
+        repo = mock_async_company_repository
+        real_create = async_mock_container.create_item
+
+        async def create_then_concurrent_write(body, **kwargs):
+            result = await real_create(body=body, **kwargs)
+            await async_mock_container.patch_item(item=created["id"], partition_key="a",
+                                                  patch_operations=[{"op": "set", "path": "/sector", "value": "Y"}])
+            return result
+
+        async_mock_container.create_item = create_then_concurrent_write
+        with pytest.raises(CosmosHttpResponseError) as exc:
+            await repo.update(created["id"], "a", {"name": "Zeta Fruit"})
+        assert exc.value.status_code == 412
+        assert [(d["pk"], d["sector"]) for d in async_mock_container.items] == [("a", "Y")]
+
+    async def test_many_fields_fall_back_to_replace(self, mock_async_company_repository, async_mock_container, created):
+        """Test updates beyond the patch operation limit use a conditional replace."""
+        async_mock_container.replace_item = AsyncMock(wraps=async_mock_container.replace_item)
+        data = {f: "x" for f in ("isin", "lei", "country", "sector", "ceo", "notes",
+                                 "exchange", "industry", "jurisdiction_of_incorporation", "ticker", "website")}
+        updated = await mock_async_company_repository.update(created["id"], "a", data)
+        assert updated["ticker"] == "X"
+        assert async_mock_container.replace_item.call_args.kwargs["etag"] == created["_etag"]
@@ -0,0 +1,405 @@
+"""
+Load benchmarks for the Company Reference API.
+
+These run against the mock containers with simulated round-trip latency and
+print their numbers; run them with ``pytest -m slow -s``.
+"""
+import asyncio
+import time
+import pytest
+import httpx
+from fastapi import FastAPI
+from app.repository.company_repository import CompanyRepository
+from tests.conftest import MockCosmosContainer, AsyncMockCosmosContainer
+
+pytestmark = pytest.mark.slow
+
+COSMOS_LATENCY = 0.2  # seconds per simulated Cosmos round trip (cross-region, throttled)
+REQUESTS = 400
+
+
+async def _fire(app, paths, concurrency=REQUESTS):
+    """Issue all paths concurrently against an ASGI app; return requests/sec."""
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(path):
+            async with sem:
+                r = await client.get(path)
+                assert r.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in paths))
+        return len(paths) / (time.perf_counter() - start)
+
+
+def _seed(container, n):
+    repo = CompanyRepository()
+    repo._container = container
+    return [repo.create({"name": f"Company {i:03d}", "ticker": f"C{i:03d}"}) for i in range(n)]
+
+
+async def test_async_routes_outperform_sync_threadpool(mock_get_container):
+    """Point reads: async Cosmos path vs the old sync def route in the threadpool."""
+    store = MockCosmosContainer()
+    companies = _seed(store, n=REQUESTS)
+    blocking_store = MockCosmosContainer(latency=COSMOS_LATENCY)
+    blocking_store.items = store.items
+    # Distinct ids so the point-read cache does not absorb the round trips
+    paths = [f"/companies/{c['pk']}/{c['id']}" for c in companies]
+
+    # Baseline: the previous sync route shape over the blocking repository
+    sync_repo = CompanyRepository()
+    sync_repo._container = blocking_store
+    sync_app = FastAPI()
+
+    @sync_app.get("/companies/{pk}/{id}")
+    def get_company(pk: str, id: str):
+        return sync_repo.get(id, pk)
+
+    from app.main import app
+    from app.routers.companies import svc
+    svc.repo._container = AsyncMockCosmosContainer(store, latency=COSMOS_LATENCY)
+
+    sync_rps = await _fire(sync_app, paths)
+    async_rps = await _fire(app, paths)
+
+    print(f"\nGET /companies/{{pk}}/{{id}} with {COSMOS_LATENCY * 1000:.0f} ms Cosmos latency, "
+          f"{len(paths)} concurrent requests: sync {sync_rps:.0f} req/s, async {async_rps:.0f} req/s "
+          f"({async_rps / sync_rps:.1f}x)")
+    assert async_rps > sync_rps * 1.5
+
+
+def test_prefix_index_search_latency():
+    """Typeahead over 100k names: in-memory index lookup time per query."""
+    from app.search_index import PrefixIndex
+
+    index = PrefixIndex()
+    index.load({"id": str(i), "pk": "c", "name": f"Company {i:06d}", "name_lower": f"company {i:06d}"}
+               for i in range(100_000))
+
+    prefixes = [f"company {i:04d}" for i in range(0, 1000, 7)]
+    start = time.perf_counter()
+    for p in prefixes:
+        assert len(index.search(p, limit=20)) == 20
+    per_query_us = (time.perf_counter() - start) / len(prefixes) * 1e6
+
+    print(f"\nPrefixIndex.search over {len(index)} names: {per_query_us:.1f} us/query")
+    assert per_query_us < 1000
+
+
+
+def test_match_index_latency():
+    """Fuzzy /companies/match over 100k names built from few words: lookup time per query."""
+    import random
+    from app.match_index import MatchIndex
+
+    rng = random.Random(1)
+    words = ["global", "apple", "micro", "systems", "energy", "capital", "bank", "north", "pacific", "tech", "pharma",
+             "foods", "motor", "steel", "united", "first", "american", "national", "holdings", "group", "partners"]
+    suffixes = ["Inc.", "Corp", "Ltd", "PLC", "S.A.", "AG", "LLC", ""]
+    names = [f"{rng.choice(words).title()} {rng.choice(words).title()} {i} {rng.choice(suffixes)}"
+             for i in range(100_000)]
+    index = MatchIndex()
+    start = time.perf_counter()
+    index.load({"id": str(i), "pk": "c", "name": name} for i, name in enumerate(names))
+    load_seconds = time.perf_counter() - start
+
+    queries = [(str(i), names[i].upper().replace(" ", ", ", 1)) for i in range(0, 100_000, 997)]
+    start = time.perf_counter()
+    for id, query in queries:
+        assert index.match(query)[0]["id"] == id
+    per_query_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+    print(f"\nMatchIndex over {len(index)} names: loaded in {load_seconds:.1f} s, {per_query_ms:.2f} ms/query")
+    assert per_query_ms < 15
+
+
+async def test_sqlite_backend_read_latency(tmp_path):
+    """SQLite backend over 50k companies: uncached point reads, ticker lookups and prefix pages."""
+    from app.cache import TTLCache
+    from app.repository.sqlite_company_repository import SQLiteCompanyRepository
+
+    repo = SQLiteCompanyRepository(str(tmp_path / "bench.db"), cache=TTLCache(max_items=0))
+    start = time.perf_counter()
+    docs = await repo.bulk_create([{"name": f"Company {i:06d}", "ticker": f"C{i:06d}", "isin": f"US{i:010d}"}
+                                   for i in range(50_000)])
+    load_seconds = time.perf_counter() - start
+
+    async def per_call_us(fn, args):
+        start = time.perf_counter()
+        for a in args:
+            assert await fn(a)
+        return (time.perf_counter() - start) / len(args) * 1e6
+
+    sample = [r["doc"] for r in docs[::97]]
+    read_us = await per_call_us(lambda d: repo.get(d["id"], d["pk"]), sample)
+    lookup_us = await per_call_us(lambda d: repo.find_by_keys(ticker=d["ticker"]), sample)
+    search_us = await per_call_us(lambda d: repo.search_by_name_prefix(d["name_lower"][:11], 20), sample)
+    await repo.close()
+
+    print(f"\nSQLite, 50k companies (bulk load {load_seconds:.1f} s): point read {read_us:.0f} us, "
+          f"ticker lookup {lookup_us:.0f} us, 20-row prefix page {search_us:.0f} us")
+    assert read_us < 1000 and lookup_us < 1000
+
+def test_mock_container_at_scale():
+    """The in-memory Cosmos stand-in with 100k companies: seeding, then repository calls per second."""
+    from app.cache import TTLCache
+
+    store = MockCosmosContainer()
+    repo = CompanyRepository(cache=TTLCache(max_items=0))
+    repo._container = store
+    start = time.perf_counter()
+    docs = [repo.create({"name": f"Company {i:06d}", "ticker": f"C{i:06d}", "isin": f"US{i:010d}"})
+            for i in range(100_000)]
+    load_seconds = time.perf_counter() - start
+
+    sample = docs[::101]
+    start = time.perf_counter()
+    for d in sample:
+        assert repo.get(d["id"], d["pk"])
+        assert repo.find_by_keys(ticker=d["ticker"])
+        assert len(repo.search_by_name_prefix(d["name_lower"][:11], 20)) == 20
+        repo.update(d["id"], d["pk"], {"sector": "Industrials"})
+    per_round_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    print(f"\nMockCosmosContainer, 100k companies: {len(docs) / load_seconds:.0f} creates/s, "
+          f"read + lookup + prefix page + update {per_round_us:.0f} us")
+    assert load_seconds < 30 and per_round_us < 2000
+
+
+async def test_bulk_create_vs_per_row_creates():
+    """Loading rows: one create_item per row vs transactional batches per partition."""
+    from app.repository.async_company_repository import AsyncCompanyRepository
+
+    rows = [{"name": f"{chr(ord('a') + i % 26)} company {i:04d}"} for i in range(200)]
+
+    per_row = AsyncCompanyRepository()
+    per_row._container = AsyncMockCosmosContainer(latency=0.005)
+    start = time.perf_counter()
+    for row in rows:
+        await per_row.create(row)
+    per_row_rps = len(rows) / (time.perf_counter() - start)
+
+    bulk = AsyncCompanyRepository()
+    bulk._container = AsyncMockCosmosContainer(latency=0.005)
+    start = time.perf_counter()
+    results = await bulk.bulk_create(rows, concurrency=8)
+    bulk_rps = len(rows) / (time.perf_counter() - start)
+
+    assert all(r["status_code"] == 201 for r in results)
+    print(f"\nLoading {len(rows)} rows with 5 ms Cosmos latency: per-row {per_row_rps:.0f} rows/s, "
+          f"bulk {bulk_rps:.0f} rows/s ({bulk_rps / per_row_rps:.1f}x)")
+    assert bulk_rps > per_row_rps * 5
+
+
+async def test_patch_update_vs_read_replace():
+    """Updates: the old read_item + replace_item vs a single patch_item."""
+    from app.repository.async_company_repository import AsyncCompanyRepository
+    from app.metrics import CosmosCall
+
+    repo = AsyncCompanyRepository()
+    repo._container = AsyncMockCosmosContainer(latency=0.005)
+    docs = [await repo.create({"name": f"Company {i:03d}"}) for i in range(100)]
+
+    container = repo._container
+    old_charge = CosmosCall("read_replace")
+    start = time.perf_counter()
+    for doc in docs:
+        existing = await container.read_item(item=doc["id"], partition_key=doc["pk"], response_hook=old_charge)
+        existing["sector"] = "Before"
+        await container.replace_item(item=doc["id"], body=existing, response_hook=old_charge)
+    read_replace_ms = (time.perf_counter() - start) / len(docs) * 1000
+
+    new_charge = CosmosCall("patch")
+    repo._container.sync.patch_item = _hooked(repo._container.sync.patch_item, new_charge)
+    start = time.perf_counter()
+    for doc in docs:
+        await repo.update(doc["id"], doc["pk"], {"sector": "After"})
+    patch_ms = (time.perf_counter() - start) / len(docs) * 1000
+
+    print(f"\nUpdate with 5 ms Cosmos latency: read+replace {read_replace_ms:.1f} ms "
+          f"({old_charge.request_charge / len(docs):.1f} RU), patch {patch_ms:.1f} ms "
+          f"({new_charge.request_charge / len(docs):.1f} RU, mock charges)")
+    assert patch_ms < read_replace_ms * 0.7
+
+
+def _hooked(fn, hook):
+    def wrapper(*args, response_hook=None, **kwargs):
+        return fn(*args, response_hook=hook, **kwargs)
+    return wrapper
+
+
+# The wildcard policy containers were created with before the policy was derived from the queries
+WILDCARD_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": "/\"_etag\"/?"}, {"path": "/notes/?"}],
+}
+
+
+def _rich_company(i):
+    return {
+        "id": str(i), "pk": "c", "name": f"Company {i:03d}", "name_lower": f"company {i:03d}",
+        "ticker": f"C{i:03d}", "isin": f"US{i:010d}", "lei": f"LEI{i:017d}", "sector": "Industrials",
+        "notes": "Seeded for the indexing benchmark.",
+        "major_shareholders": [{"name": f"Fund {j}", "stake": 1.5 * j, "country": "US"} for j in range(10)],
+        "board_members": [{"name": f"Director {j}", "role": "member", "since": 2010 + j} for j in range(12)],
+        "anti_takeover": {"poison_pill": False, "staggered_board": True, "supermajority": {"merger": 0.67}},
+    }
+
+
+def test_indexing_policy_request_charges():
+    """RU per write and per query: the old wildcard policy vs the one derived from the query shapes."""
+    from app.indexing import INDEXING_POLICY
+    from app.metrics import CosmosCall
+    from app.repository.base import BaseCompanyRepository
+
+    repo = BaseCompanyRepository()
+    queries = {
+        "find_by_name_exact": repo._name_exact_query("Company 042"),
+        "search_by_name_prefix": repo._prefix_query("company 04", 20),
+        "find_by_keys": repo._keys_query("C042", None, "LEI00000000000000000042"),
+        "find_many_by_keys": repo._keys_in_query("isin", [f"US{i:010d}" for i in range(10)]),
+    }
+
+    charges = {}
+    for label, policy in (("wildcard", WILDCARD_POLICY), ("derived", INDEXING_POLICY)):
+        container = MockCosmosContainer(indexing_policy=policy)
+        write = CosmosCall("create")
+        for i in range(200):
+            container.create_item(_rich_company(i), response_hook=write)
+        charges[label] = {"write": write.request_charge / 200}
+        for name, (query, params) in queries.items():
+            call = CosmosCall(name)
+            container.query_items(query, params, enable_cross_partition_query=True, response_hook=call)
+            charges[label][name] = call.request_charge
+
+    print("\nRU charge (stand-in charge model)   wildcard   derived")
+    for op in charges["wildcard"]:
+        print(f"  {op:<32} {charges['wildcard'][op]:>8.2f}  {charges['derived'][op]:>8.2f}")
+    assert charges["derived"]["write"] < charges["wildcard"]["write"] * 0.5
+    assert all(charges["derived"][q] <= charges["wildcard"][q] for q in queries)
+
+
+def test_compression_bytes_vs_cpu():
+    """Response compression per encoding and payload size: bytes saved vs CPU per response on one worker."""
+    from app.compression import GzipEncoder, available_encoders
+    from app.responses import dumps
+
+    encoders = {"gzip-1": lambda: GzipEncoder(1), "gzip-6": GzipEncoder,
+                **{name: factory for name, factory in available_encoders().items() if name != "gzip"}}
+    import random
+    rng = random.Random(7)
+    words = "acquisition board capital control director equity holding merger offer proxy share tender vote".split()
+
+    def varied(i):
+        # Realistic entropy: free text and numbers differ between documents
+        doc = _rich_company(i)
+        doc["notes"] = " ".join(rng.choice(words) for _ in range(60))
+        for holder in doc["major_shareholders"]:
+            holder.update(name=f"Fund {rng.randrange(10**6)}", stake=round(rng.uniform(0, 10), 3))
+        return doc
+
+    payloads = {f"{n} docs": dumps([varied(i) for i in range(n)]) for n in (1, 10, 100, 1000)}
+    payloads["1 doc, trimmed"] = dumps({"id": "1", "pk": "c", "name": "Company 001", "ticker": "C001"})
+
+    print(f"\n  {'payload':<16} {'bytes':>9}  " + "  ".join(f"{name:>22}" for name in encoders))
+    print(f"  {'':<16} {'':>9}  " + "  ".join(f"{'ratio   us/resp   MB/s':>22}" for _ in encoders))
+    ratios = {}
+    for label, body in sorted(payloads.items(), key=lambda item: len(item[1])):
+        cells = []
+        for name, factory in encoders.items():
+            repeat = max(3, 2_000_000 // len(body))
+            start = time.process_time()
+            for _ in range(repeat):
+                encoder = factory()
+                sent = len(encoder.compress(body) + encoder.finish())
+            cpu = (time.process_time() - start) / repeat
+            ratios[label, name] = sent / len(body)
+            cells.append(f"{sent / len(body):>6.3f} {cpu * 1e6:>9.0f} {len(body) / cpu / 1e6:>6.0f}")
+        print(f"  {label:<16} {len(body):>9}  " + "  ".join(cells))
+    assert ratios["100 docs", "gzip-6"] < 0.2
+    assert ratios["1 doc, trimmed", "gzip-6"] > 0.8
+
+
+def test_name_normalization_throughput():
+    """Normalizing 50k names: the original regex-per-call path vs the batch API and the memo."""
+    import random
+    import re
+    from app.utils import make_normalizer, normalize_names
+
+    def original(name):
+        x = name.strip().lower()
+        return re.sub(r"\s+", " ", x)
+
+    rng = random.Random(11)
+    words = "Global Capital Holdings Energy Micro Systems Bank Group Inc. Corp Ltd PLC".split()
+    names = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 4))) + ("  " if i % 10 == 0 else "")
+             for i in range(50_000)]
+    # Name traffic repeats: 1000 names make up every request
+    hot = [names[rng.randrange(1000)] for _ in range(50_000)]
+    memo = make_normalizer("lower", 4096)
+    unicode = make_normalizer("unicode", 0)
+
+    timings = {}
+    for label, run in [
+        ("original, per name", lambda: [original(n) for n in names]),
+        ("original, name + pk", lambda: [(original(n), original(n)[:1]) for n in names]),
+        ("normalize_names", lambda: normalize_names(names)),
+        ("unicode form, batch", lambda: list(map(unicode, names))),
+        ("original, hot names", lambda: [original(n) for n in hot]),
+        ("memo, hot names", lambda: list(map(memo, hot))),
+    ]:
+        start = time.perf_counter()
+        result = run()
+        timings[label] = time.perf_counter() - start
+        print(f"  {label:<22} {timings[label]:>6.2f}s  {len(result) / timings[label] / 1e6:>5.1f} M names/s")
+    assert normalize_names(names[:1000]) == [original(n) for n in names[:1000]]
+    assert timings["normalize_names"] < timings["original, per name"] / 2
+    assert timings["memo, hot names"] < timings["original, hot names"] / 2
+
+
+async def test_fast_responses_throughput(mock_get_container):
+    """Large search and batch lookup responses: validated vs directly serialized, requests/sec on one worker."""
+    from unittest.mock import patch
+    from app.main import app
+    from app.routers.companies import svc
+    from app.search_index import PrefixIndex
+
+    store = MockCosmosContainer()
+    docs = []
+    for i in range(200):
+        doc = _rich_company(i)
+        del doc["anti_takeover"]
+        doc["major_shareholders"] = [{"holder_name": f"Fund {j}", "percent": 1.5 * j} for j in range(10)]
+        doc["board_members"] = [f"Director {j}" for j in range(12)]
+        docs.append(doc)
+    store.items = docs
+    svc.repo._container = AsyncMockCosmosContainer(store)
+    svc.search_index = PrefixIndex()
+    svc.search_index.load(docs)
+    lookup = {"tickers": [f"C{i:03d}" for i in range(0, 200, 4)]}
+    requests = [("GET", "/companies/search?prefix=company&page_size=200", None),
+                ("POST", "/companies/lookup:batch", lookup)] * 50
+
+    async def rps():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            for method, path, body in requests:
+                assert (await client.request(method, path, json=body)).status_code == 200
+            return len(requests) / (time.perf_counter() - start)
+
+    try:
+        with patch("app.responses.FAST_RESPONSES", False), patch("app.routers.companies.FAST_RESPONSES", False):
+            validated_rps = await rps()
+        with patch("app.responses.FAST_RESPONSES", True), patch("app.routers.companies.FAST_RESPONSES", True):
+            fast_rps = await rps()
+    finally:
+        svc.search_index = None
+
+    print(f"\nSearch (200 results) and batch lookup (50 documents), sequential on one worker: validated {validated_rps:.0f} req/s, "
+          f"fast {fast_rps:.0f} req/s ({fast_rps / validated_rps:.1f}x)")
+    assert fast_rps > validated_rps * 1.3
@@ -0,0 +1,143 @@
+"""
+Tests for bulk loading: parsing, transactional batches, endpoint and CLI.
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from app.bulk_load import aiter_lines, parse_rows, main
+from app.main import app
+from app.repository import async_company_repository
+
+
+async def _collect(agen):
+    return [x async for x in agen]
+
+
+async def _chunks(*parts):
+    for p in parts:
+        yield p
+
+
+class TestParsing:
+    """Test NDJSON/CSV parsing."""
+
+    async def test_aiter_lines_rejoins_split_chunks(self):
+        """Test lines split across chunk boundaries are reassembled."""
+        lines = await _collect(aiter_lines(_chunks(b'{"a":', b' 1}\n{"b"', b': 2}')))
+        assert lines == ['{"a": 1}', '{"b": 2}']
+
+    async def test_parse_ndjson(self):
+        """Test NDJSON rows, blank lines and malformed lines."""
+        rows = await _collect(parse_rows(['{"name": "A"}\n', "\n", "not json\n", "[1]\n"]))
+        assert rows[0] == ({"name": "A"}, None)
+        assert rows[1][0] is None and rows[1][1].startswith("invalid JSON")
+        assert rows[2] == (None, "expected a JSON object")
+
+    async def test_parse_csv(self):
+        """Test CSV header handling, empty cells and ragged rows."""
+        lines = ["name,ticker,country\n", "Apple Inc.,aapl,\n", '"Foo, Inc.",FOO,US\n', "bad,row\n"]
+        rows = await _collect(parse_rows(lines, "csv"))
+        assert rows[0] == ({"name": "Apple Inc.", "ticker": "aapl"}, None)
+        assert rows[1] == ({"name": "Foo, Inc.", "ticker": "FOO", "country": "US"}, None)
+        assert rows[2] == (None, "expected 3 columns, got 2")
+
+
+class TestBulkCreate:
+    """Test AsyncCompanyRepository.bulk_create."""
+
+    async def test_groups_by_partition_and_reports_conflicts(self, mock_async_company_repository, async_mock_container):
+        """Test one batch per partition, with conflicting rows reported individually."""
+        repo = mock_async_company_repository
+        await repo.create({"name": "Apple Inc.", "ticker": "AAPL"})
+        spy = AsyncMock(wraps=async_mock_container.execute_item_batch)
+        async_mock_container.execute_item_batch = spy
+
+        results = await repo.bulk_create([
+            {"name": "Amazon.com Inc.", "ticker": "AMZN"},
+            {"name": "apple inc.", "ticker": "APL2"},
+            {"name": "Microsoft Corporation", "ticker": "MSFT"},
+            {"name": "Alphabet Inc.", "ticker": "GOOGL"},
+        ])
+
+        assert [r["status_code"] for r in results] == [201, 409, 201, 201]
+        assert len(async_mock_container.items) == 4
+        # "a" partition: first attempt fails on the conflict, retry without it; "m" partition: one batch
+        assert sorted(c.kwargs["partition_key"] for c in spy.call_args_list) == ["a", "a", "m"]
+
+    async def test_splits_large_partitions(self, mock_async_company_repository, async_mock_container):
+        """Test batches never exceed the Cosmos operation limit."""
+        spy = AsyncMock(wraps=async_mock_container.execute_item_batch)
+        async_mock_container.execute_item_batch = spy
+        with patch.object(async_company_repository, "MAX_BATCH_OPERATIONS", 2):
+            results = await mock_async_company_repository.bulk_create(
+                [{"name": f"Acme {i}"} for i in range(5)])
+        assert all(r["status_code"] == 201 for r in results)
+        assert [len(c.kwargs["batch_operations"]) for c in spy.call_args_list] == [2, 2, 1]
+
+    async def test_batch_level_failure_marks_rows(self, mock_async_company_repository, async_mock_container):
+        """Test a failed batch request (e.g. throttling) fails its rows."""
+        from azure.cosmos.exceptions import CosmosHttpResponseError
+        async_mock_container.execute_item_batch = AsyncMock(
+            side_effect=CosmosHttpResponseError(status_code=429, message="Too many requests"))
+        results = await mock_async_company_repository.bulk_create([{"name": "Acme"}])
+        assert results[0]["status_code"] == 429
+
+
+class TestBulkEndpoint:
+    """Test POST /companies:bulk."""
+
+    def test_ndjson_import(self, mock_get_container):
+        """Test per-row report and summary for an NDJSON body."""
+        client = TestClient(app)
+        body = "\n".join([
+            json.dumps({"name": "Apple Inc.", "ticker": "aapl"}),
+            json.dumps({"name": "Apple Inc."}),
+            json.dumps({"ticker": "NONAME"}),
+            "{oops",
+            json.dumps({"name": "Microsoft Corporation", "website": "https://microsoft.com"}),
+        ])
+        response = client.post("/companies:bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert [r["status"] for r in data["results"]] == ["created", "conflict", "invalid", "invalid", "created"]
+        assert data["results"][2]["error"].startswith("name:")
+        assert data["summary"]["rows"] == 5
+        assert data["summary"]["created"] == 2
+        assert data["summary"]["conflict"] == 1
+        assert data["summary"]["invalid"] == 2
+        assert data["summary"]["rows_per_second"] > 0
+        assert client.get("/companies/lookup?ticker=AAPL").json()[0]["name"] == "Apple Inc."
+
+    def test_csv_import(self, mock_get_container):
+        """Test a CSV body selected by content type."""
+        client = TestClient(app)
+        body = "name,ticker,market_cap_usd\nApple Inc.,AAPL,3000000000000\nAmazon.com Inc.,AMZN,\n"
+        response = client.post("/companies:bulk", content=body, headers={"Content-Type": "text/csv"})
+
+        data = response.json()
+        assert data["summary"]["created"] == 2
+        assert len(mock_get_container.items) == 2
+
+
+class TestBulkLoadCli:
+    """Test python -m app.bulk_load."""
+
+    def test_cli_loads_file_and_writes_report(self, tmp_path, async_mock_container, capsys):
+        """Test the CLI loads a CSV file and writes the NDJSON report."""
+        src = tmp_path / "companies.csv"
+        src.write_text("name,ticker\nApple Inc.,AAPL\nApple Inc.,AAPL\n")
+        report = tmp_path / "report.ndjson"
+
+        with patch("app.repository.async_company_repository.get_async_container",
+                   AsyncMock(return_value=async_mock_container)), \
+                patch("app.repository.async_company_repository.close_async_client", AsyncMock()):
+            code = main([str(src), "--report", str(report), "--chunk-rows", "1"])
+
+        assert code == 0
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["created"] == 1
+        assert summary["conflict"] == 1
+        rows = [json.loads(line) for line in report.read_text().splitlines()]
+        assert [r["status"] for r in rows] == ["created", "conflict"]
@@ -0,0 +1,137 @@
+"""
+Unit tests for the point-read cache.
+"""
+import pytest
+from app.cache import TTLCache
+from app.repository.company_repository import CompanyRepository
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Test the TTLCache class."""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    def test_hit_and_miss(self, clock):
+        """Test hits and misses are counted."""
+        cache = TTLCache(max_items=10, ttl_seconds=5, clock=clock)
+        assert cache.get(("a", "1")) is None
+
+        cache.put(("a", "1"), {"id": "1", "_etag": "e1"})
+        assert cache.get(("a", "1")) == {"id": "1", "_etag": "e1"}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_returns_copies(self, clock):
+        """Test callers cannot mutate the cached document."""
+        cache = TTLCache(max_items=10, ttl_seconds=5, clock=clock)
+        cache.put("k", {"id": "1"})
+        cache.get("k")["id"] = "changed"
+        assert cache.get("k")["id"] == "1"
+
+    def test_entries_expire(self, clock):
+        """Test entries are dropped once their TTL passes."""
+        cache = TTLCache(max_items=10, ttl_seconds=5, clock=clock)
+        cache.put("k", {"id": "1"})
+        clock.now = 5.0
+        assert cache.get("k") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_lru_eviction(self, clock):
+        """Test the least recently used entry is evicted at capacity."""
+        cache = TTLCache(max_items=2, ttl_seconds=5, clock=clock)
+        cache.put("a", {"id": "a"})
+        cache.put("b", {"id": "b"})
+        cache.get("a")
+        cache.put("c", {"id": "c"})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_etag_tracking(self, clock):
+        """Test the entry etag is reported without touching counters."""
+        cache = TTLCache(max_items=10, ttl_seconds=5, clock=clock)
+        cache.put("k", {"id": "1", "_etag": "e1"})
+        assert cache.etag("k") == "e1"
+        assert cache.etag("missing") is None
+        clock.now = 10.0
+        assert cache.etag("k") is None
+        assert cache.stats()["hits"] == 0
+
+    def test_invalidate_and_clear(self, clock):
+        """Test explicit invalidation."""
+        cache = TTLCache(max_items=10, ttl_seconds=5, clock=clock)
+        cache.put("a", {"id": "a"})
+        cache.put("b", {"id": "b"})
+        cache.invalidate("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert cache.stats()["size"] == 0
+
+    def test_disabled(self):
+        """Test a zero TTL disables caching."""
+        cache = TTLCache(max_items=10, ttl_seconds=0)
+        cache.put("k", {"id": "1"})
+        assert not cache.enabled
+        assert cache.get("k") is None
+        assert cache.stats()["misses"] == 0
+
+
+class TestRepositoryCache:
+    """Test the read-through cache inside CompanyRepository."""
+
+    @pytest.fixture
+    def repository(self, mock_container):
+        repo = CompanyRepository(cache=TTLCache(max_items=100, ttl_seconds=60))
+        repo._container = mock_container
+        return repo
+
+    def test_point_reads_served_from_cache(self, repository, mock_container, sample_company_data):
+        """Test a second read does not reach the container."""
+        created = repository.create(sample_company_data)
+        repository.get(created["id"], created["pk"])
+
+        mock_container.items.clear()
+        assert repository.get(created["id"], created["pk"])["id"] == created["id"]
+        assert repository.cache.stats()["hits"] == 1
+
+    def test_update_invalidates(self, repository, sample_company_data):
+        """Test an update is visible to the next read."""
+        created = repository.create(sample_company_data)
+        repository.get(created["id"], created["pk"])
+
+        repository.update(created["id"], created["pk"], {"sector": "Hardware"})
+        assert repository.get(created["id"], created["pk"])["sector"] == "Hardware"
+
+    def test_delete_invalidates(self, repository, sample_company_data):
+        """Test a delete is visible to the next read."""
+        created = repository.create(sample_company_data)
+        repository.get(created["id"], created["pk"])
+
+        repository.delete(created["id"], created["pk"])
+        assert repository.get(created["id"], created["pk"]) is None
+
+    async def test_async_repository_uses_cache(self, mock_async_company_repository, async_mock_container,
+                                               sample_company_data):
+        """Test the async repository shares the same read-through behaviour."""
+        repo = mock_async_company_repository
+        created = await repo.create(sample_company_data)
+        await repo.get(created["id"], created["pk"])
+
+        async_mock_container.items.clear()
+        assert (await repo.get(created["id"], created["pk"]))["id"] == created["id"]
+        await repo.delete(created["id"], created["pk"])
+        assert await repo.get(created["id"], created["pk"]) is None
@@ -0,0 +1,207 @@
+"""
+Tests for the change-feed processor that keeps local caches and indexes in sync.
+"""
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from azure.cosmos.exceptions import CosmosHttpResponseError
+from app.cache import TTLCache
+from app.change_feed import ChangeFeedProcessor, ContinuationStore, FileContinuationStore
+from app.main import app
+from app.repository.company_repository import CompanyRepository
+from app.search_index import PrefixIndex
+
+
+@pytest.fixture
+def other_worker(mock_container):
+    """A second writer on the same container, whose writes this worker only sees via the feed."""
+    repo = CompanyRepository()
+    repo._container = mock_container
+    return repo
+
+
+class TestReadChangeFeed:
+    """Test the repository's change-feed read."""
+
+    async def test_from_now_then_incremental(self, mock_async_company_repository, other_worker,
+                                             sample_companies_list):
+        """Test a read without a token starts from now and tokens advance past what was read."""
+        repo = mock_async_company_repository
+        other_worker.create(sample_companies_list[0])
+        docs, token = await repo.read_change_feed("0", None)
+        assert docs == [] and token
+
+        created = other_worker.create(sample_companies_list[1])
+        other_worker.update(created["id"], created["pk"], {"sector": "Retail"})
+        docs, token = await repo.read_change_feed("0", token)
+        assert [(d["name"], d["sector"]) for d in docs] == [("Microsoft Corporation", "Retail")]
+
+        assert await repo.read_change_feed("0", token) == ([], token)
+
+    async def test_feed_ranges(self, mock_async_company_repository):
+        """Test partition key range ids are listed."""
+        assert await mock_async_company_repository.feed_ranges() == ["0"]
+
+
+class TestChangeFeedProcessor:
+    """Test publishing feed changes to local consumers."""
+
+    @pytest.fixture
+    def index(self):
+        index = PrefixIndex()
+        index.load([])
+        return index
+
+    async def test_publishes_upserts_to_consumers(self, mock_async_company_repository, other_worker,
+                                                  sample_companies_list, index):
+        """Test another worker's create and rename reach the index and evict the cache entry."""
+        repo = mock_async_company_repository
+        feed = ChangeFeedProcessor(repo, [repo.cache, index])
+        await feed.prime()
+
+        created = other_worker.create(sample_companies_list[0])
+        assert await feed.poll_once() == 1
+        assert [r["id"] for r in index.search("apple")] == [created["id"]]
+
+        await repo.get(created["id"], created["pk"])
+        other_worker.update(created["id"], created["pk"], {"sector": "Hardware"})
+        assert await feed.poll_once() == 1
+        assert repo.cache.get((created["pk"], created["id"])) is None
+        assert index.search("apple")[0]["sector"] == "Hardware"
+        assert feed.stats()["changes"] == 2
+
+    async def test_publish_delete(self, index):
+        """Test locally published deletes reach every consumer."""
+        cache = TTLCache(max_items=10, ttl_seconds=60)
+        cache.put(("a", "1"), {"id": "1", "pk": "a"})
+        index.upsert({"id": "1", "pk": "a", "name": "Apple", "name_lower": "apple"})
+        feed = ChangeFeedProcessor(AsyncMock(), [cache, index])
+
+        feed.publish_delete("1", "a")
+        assert cache.get(("a", "1")) is None
+        assert index.search("apple") == []
+
+    async def test_reconcile_publishes_other_workers_deletes(self, mock_async_company_repository, other_worker,
+                                                            sample_companies_list):
+        """Test ids held locally but gone from the container are deleted from every consumer."""
+        from app.match_index import MatchIndex
+        repo = mock_async_company_repository
+        kept, gone = (other_worker.create(c) for c in sample_companies_list[:2])
+        index, match = PrefixIndex(), MatchIndex()
+        docs = await repo.scan_search_fields()
+        index.load(docs)
+        match.load(docs)
+        feed = ChangeFeedProcessor(repo, [repo.cache, index, match])
+        await repo.get(gone["id"], gone["pk"])
+
+        other_worker.delete(gone["id"], gone["pk"])
+        assert await feed.reconcile() == 1
+        assert [r["id"] for r in index.search("")] == [kept["id"]]
+        assert [id for id, _ in match.held_keys()] == [kept["id"]]
+        assert repo.cache.get((gone["pk"], gone["id"])) is None
+        assert await feed.reconcile() == 0
+        assert feed.stats()["reconciled_deletes"] == 1
+
+    async def test_resumes_from_persisted_tokens(self, mock_async_company_repository, other_worker,
+                                                 sample_companies_list, index, tmp_path):
+        """Test changes made while the processor was down are replayed from the saved token."""
+        path = str(tmp_path / "feed.json")
+        await ChangeFeedProcessor(mock_async_company_repository, store=FileContinuationStore(path)).prime()
+        other_worker.create(sample_companies_list[2])
+
+        feed = ChangeFeedProcessor(mock_async_company_repository, [index], store=FileContinuationStore(path))
+        await feed.prime()
+        assert await feed.poll_once() == 1
+        assert index.search("amazon")[0]["name"] == "Amazon.com Inc."
+        with open(path) as f:
+            assert json.load(f) == feed.tokens
+
+    async def test_reconcile_scan_is_background_work(self, mock_async_company_repository):
+        """Test the id scan waits above the reserve instead of spending what is kept for point reads."""
+        from app.rate_limit import RUScheduler
+        repo = mock_async_company_repository
+        repo.scheduler = RUScheduler(ru_per_second=1000, reserve=0.2)
+        # Exactly the reserve is left: a high-priority call would go straight through
+        repo.scheduler.tokens = repo.scheduler.capacity * 0.2
+        await ChangeFeedProcessor(repo).reconcile()
+        assert repo.scheduler.stats()["queued"] == 1
+
+    def test_concurrent_saves_do_not_collide(self, tmp_path):
+        """Test stores sharing a path save concurrently without errors or leftover temp files."""
+        from concurrent.futures import ThreadPoolExecutor
+        path = str(tmp_path / "feed.json")
+        stores = [FileContinuationStore(path) for _ in range(4)]
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda i: stores[i % 4].save({"0": str(i)}), range(200)))
+        assert FileContinuationStore(path).load()["0"].isdigit()
+        assert [p.name for p in tmp_path.iterdir()] == ["feed.json"]
+
+    def test_state_file_per_process(self, tmp_path):
+        """Test the configured state path gets this process's pid appended."""
+        import os
+        with patch("app.change_feed.CHANGE_FEED_STATE_PATH", str(tmp_path / "feed.json")):
+            feed = ChangeFeedProcessor(AsyncMock())
+        assert feed.store.path == str(tmp_path / f"feed.json.{os.getpid()}")
+
+    async def test_split_range_hands_token_to_children(self):
+        """Test a 410 from a split range is followed by reading its children from the parent's token."""
+        repo = AsyncMock()
+        repo.feed_ranges.return_value = ["1", "2"]
+        repo.read_change_feed.side_effect = CosmosHttpResponseError(status_code=410, message="Gone")
+        store = ContinuationStore()
+        store.save({"0": '"7"'})
+        feed = ChangeFeedProcessor(repo, store=store)
+        feed.tokens = store.load()
+
+        await feed.poll_once()
+        assert feed.tokens == {"1": '"7"', "2": '"7"'}
+
+    async def test_background_task(self, mock_async_company_repository, other_worker,
+                                   sample_companies_list, index):
+        """Test the polling task picks up changes and stops cleanly."""
+        feed = ChangeFeedProcessor(mock_async_company_repository, [index], poll_seconds=0.01,
+                                   reconcile_seconds=0.01)
+        await feed.prime()
+        feed.start()
+        try:
+            created = other_worker.create(sample_companies_list[0])
+            for _ in range(100):
+                if len(index):
+                    break
+                await asyncio.sleep(0.01)
+            assert len(index) == 1
+            other_worker.delete(created["id"], created["pk"])
+            for _ in range(100):
+                if not len(index):
+                    break
+                await asyncio.sleep(0.01)
+            assert len(index) == 0
+            assert feed.stats()["running"] is True and feed.caught_up(5)
+        finally:
+            await feed.stop()
+        assert feed.stats()["running"] is False and not feed.caught_up(5)
+
+
+class TestLifespanChangeFeed:
+    """Test the processor is wired into the application lifespan."""
+
+    def test_other_workers_writes_reach_search(self, mock_get_container, other_worker, sample_companies_list):
+        """Test a write made outside this worker shows up in its warm search index."""
+        from app.routers.companies import svc
+
+        svc.search_index = PrefixIndex()
+        try:
+            with patch("app.main.CHANGE_FEED_ENABLED", True):
+                with TestClient(app) as client:
+                    other_worker.create(sample_companies_list[0])
+                    deadline = time.monotonic() + 5
+                    while not client.get("/companies/search?prefix=apple").json() and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    assert client.get("/companies/search?prefix=apple").json()[0]["name"] == "Apple Inc."
+                    stats = client.get("/health").json()["change_feed"]
+                    assert stats["running"] and stats["ranges"] == 1 and stats["consumers"] == 2
+        finally:
+            svc.search_index = None
@@ -0,0 +1,144 @@
+"""
+Tests for negotiated response compression.
+"""
+import gzip
+import json
+import zlib
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.compression import CompressionMiddleware, CompressionStats, GzipEncoder, negotiate
+
+
+class IdentityEncoder:
+    """Stand-in for an optional encoder, so negotiation can be tested without brotli or zstandard."""
+
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+    def finish(self):
+        return b""
+
+
+async def _run(app, headers=None, method="GET"):
+    """Call a middleware-wrapped ASGI app directly; returns the messages it sent."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": "/", "query_string": b"",
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    await app(scope, receive, send)
+    return sent
+
+
+def _app(chunks, content_type="application/x-ndjson", status=200, extra_headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type.encode()), *extra_headers]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+class TestNegotiate:
+    """Test Accept-Encoding negotiation."""
+
+    @pytest.mark.parametrize("header, expected", [
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip;q=1.0, br;q=0.8", "gzip"),
+        ("br;q=0.5, gzip;q=0.5", "br"),
+        ("*", "zstd"),
+        ("*;q=0.1, zstd;q=0", "br"),
+        ("gzip;q=0, identity", None),
+        ("deflate", None),
+        ("", None),
+    ])
+    def test_negotiate(self, header, expected):
+        """Test q-values win, ties follow the server's order, and q=0 refuses an encoding."""
+        assert negotiate(header, ["zstd", "br", "gzip"]) == expected
+
+
+class TestCompressionMiddleware:
+    """Test the CompressionMiddleware class."""
+
+    async def test_complete_body_over_threshold(self):
+        """Test a large complete body is compressed whole, with its length and Vary set."""
+        body = json.dumps([{"name": f"Company {i}", "notes": "x" * 50} for i in range(50)]).encode()
+        stats = CompressionStats()
+        app = CompressionMiddleware(_app([body], "application/json", extra_headers=[
+            (b"content-length", str(len(body)).encode())]), min_size=1024, stats=stats)
+        start, message = await _run(app, {"Accept-Encoding": "gzip"})
+        headers = dict(start["headers"])
+        assert headers[b"content-encoding"] == b"gzip" and headers[b"vary"] == b"Accept-Encoding"
+        assert int(headers[b"content-length"]) == len(message["body"]) < len(body) / 5
+        assert gzip.decompress(message["body"]) == body
+        assert stats.stats()["encodings"]["gzip"]["raw_bytes"] == len(body)
+
+    @pytest.mark.parametrize("case", ["small", "no_accept", "binary", "not_modified", "no_transform", "head"])
+    async def test_passthrough(self, case):
+        """Test small, unaccepted, non-JSON, bodiless and no-transform responses are sent unchanged."""
+        body = b"{}" if case == "small" else b"{" + b" " * 4096 + b"}"
+        app = CompressionMiddleware(_app(
+            [body], "image/png" if case == "binary" else "application/json",
+            status=304 if case == "not_modified" else 200,
+            extra_headers=[(b"cache-control", b"no-transform")] if case == "no_transform" else ()), min_size=1024)
+        start, message = await _run(app, {} if case == "no_accept" else {"Accept-Encoding": "gzip"},
+                                    method="HEAD" if case == "head" else "GET")
+        assert b"content-encoding" not in dict(start["headers"])
+        assert message["body"] == body
+
+    async def test_stream_is_flushed_per_chunk(self):
+        """Test NDJSON chunks are compressed as they come, each decodable on arrival."""
+        chunks = [b'{"id": "1"}\n' * 3, b'{"id": "2"}\n', b""]
+        app = CompressionMiddleware(_app(chunks), min_size=10_000)
+        start, *messages = await _run(app, {"Accept-Encoding": "gzip"})
+        assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+        assert [m["more_body"] for m in messages] == [True, True, False]
+        decoder = zlib.decompressobj(31)
+        assert decoder.decompress(messages[0]["body"]) == chunks[0]
+        assert decoder.decompress(messages[1]["body"]) == chunks[1]
+        decoder.decompress(messages[2]["body"])
+        assert decoder.eof
+
+    async def test_uses_negotiated_encoder(self):
+        """Test the encoder picked by negotiation is the one applied."""
+        app = CompressionMiddleware(_app([b"{" + b" " * 2000 + b"}"], "application/json"), min_size=10,
+                                    encoders={"zstd": IdentityEncoder, "gzip": GzipEncoder})
+        start, _ = await _run(app, {"Accept-Encoding": "gzip, zstd"})
+        assert dict(start["headers"])[b"content-encoding"] == b"zstd"
+
+
+class TestCompressedApi:
+    """Test the API behind the middleware."""
+
+    @pytest.fixture
+    def client(self, mock_get_container):
+        from app.main import app
+        client = TestClient(CompressionMiddleware(app, min_size=512))
+        for i in range(40):
+            assert client.post("/companies", json={"name": f"Company {i:03d}", "notes": "n" * 100}).status_code == 201
+        return client
+
+    def test_search_and_export(self, client):
+        """Test a search page and the NDJSON export arrive gzip-encoded and decode to the same content."""
+        search = client.get("/companies/search?prefix=company&page_size=40")
+        assert search.headers["content-encoding"] == "gzip"
+        assert len(search.json()) == 40
+        export = client.get("/companies?page_size=10")
+        assert export.headers["content-encoding"] == "gzip"
+        assert len(export.text.splitlines()) == 40
+        small = client.get("/companies/validate?name=Company 001")
+        assert "content-encoding" not in small.headers
+
+    def test_health(self, test_client, mock_get_container):
+        """Test /health reports compression totals when enabled."""
+        with patch("app.main.COMPRESSION_ENABLED", True):
+            assert "encodings" in test_client.get("/health").json()["compression"]
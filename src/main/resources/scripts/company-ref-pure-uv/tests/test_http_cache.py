@@ -0,0 +1,86 @@
+"""
+Tests for ETag / If-None-Match conditional reads and Cache-Control hints.
+"""
+import pytest
+from unittest.mock import patch
+from app.http_cache import cache_control, etag_matches
+from tests.test_responses import fast_responses
+
+
+@pytest.fixture
+def company(test_client, mock_get_container, sample_company_data):
+    response = test_client.post("/companies", json={k: sample_company_data[k] for k in ("name", "ticker", "sector")})
+    assert response.status_code == 201
+    return response.json()
+
+
+class TestHeaders:
+    """Test the header helpers."""
+
+    def test_etag_matches(self):
+        """Test lists, weak tags and the wildcard, as If-None-Match compares them."""
+        assert etag_matches('"a"', '"a"')
+        assert etag_matches('"x", W/"a"', '"a"')
+        assert etag_matches("*", '"a"')
+        assert not etag_matches('"b"', '"a"')
+        assert not etag_matches('"a"', None)
+        assert not etag_matches(None, '"a"')
+
+    def test_cache_control(self):
+        """Test a max-age, or no-cache when reuse is turned off."""
+        assert cache_control(30) == "public, max-age=30"
+        assert cache_control(0) == "no-cache"
+
+
+class TestConditionalGet:
+    """Test conditional point reads."""
+
+    @pytest.mark.parametrize("fast", [False, True])
+    def test_etag_and_not_modified(self, test_client, company, fast):
+        """Test the document etag is sent and a matching If-None-Match gets an empty 304."""
+        path = f"/companies/{company['pk']}/{company['id']}"
+        with fast_responses(fast):
+            first = test_client.get(path)
+            etag = first.headers["ETag"]
+            assert etag.startswith('"') and first.headers["Cache-Control"] == "no-cache"
+            again = test_client.get(path, headers={"If-None-Match": etag})
+            assert again.status_code == 304
+            assert again.content == b"" and again.headers["ETag"] == etag
+            assert test_client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    def test_cached_etag_skips_the_read(self, test_client, company, async_mock_container):
+        """Test a 304 is answered from the worker's cache without reading the document."""
+        path = f"/companies/{company['pk']}/{company['id']}"
+        etag = test_client.get(path).headers["ETag"]
+        with patch.object(async_mock_container, "read_item", wraps=async_mock_container.read_item) as read:
+            assert test_client.get(path, headers={"If-None-Match": etag}).status_code == 304
+        read.assert_not_called()
+
+    def test_changed_document_is_sent_again(self, test_client, company):
+        """Test an update changes the ETag, so the old one no longer matches."""
+        path = f"/companies/{company['pk']}/{company['id']}"
+        etag = test_client.get(path).headers["ETag"]
+        assert test_client.put(path, json={"sector": "Hardware"}).status_code == 200
+        response = test_client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["sector"] == "Hardware" and response.headers["ETag"] != etag
+
+    def test_projection_and_missing(self, test_client, company):
+        """Test projections are not conditional and a missing company is still a 404."""
+        path = f"/companies/{company['pk']}/{company['id']}"
+        projected = test_client.get(f"{path}?fields=ticker", headers={"If-None-Match": "*"})
+        assert projected.status_code == 200 and "ETag" not in projected.headers
+        assert test_client.get(f"/companies/{company['pk']}/missing", headers={"If-None-Match": "*"}).status_code == 404
+
+
+class TestCacheControl:
+    """Test Cache-Control on search and lookup responses."""
+
+    @pytest.mark.parametrize("fast", [False, True])
+    def test_search_and_lookup(self, test_client, company, fast):
+        """Test both routes carry a max-age in either response mode."""
+        with fast_responses(fast):
+            search = test_client.get("/companies/search?prefix=a&page_size=1")
+            lookup = test_client.get("/companies/lookup?ticker=AAPL")
+        assert search.headers["Cache-Control"] == lookup.headers["Cache-Control"] == "public, max-age=30"
+        assert lookup.json()[0]["name"] == "Apple Inc."
@@ -0,0 +1,122 @@
+"""
+Tests for the indexing policy derived from the repository's query shapes.
+"""
+import json
+from unittest.mock import MagicMock, patch
+from app.indexing import (INDEX_PROGRESS_HEADER, INDEXING_POLICY, apply_policy, build_indexing_policy,
+                          index_progress, main, parse_shape, policy_diff, query_shapes)
+from app.repository.base import KEY_FIELDS
+from tests.conftest import MockCosmosContainer, MockCosmosDatabase
+
+
+class TestQueryShapes:
+    """Test parsing the WHERE and ORDER BY clauses of the repository's queries."""
+
+    def test_parse_shape(self):
+        """Test filter properties and ORDER BY directions are extracted."""
+        shape = parse_shape("SELECT TOP @lim c.id FROM c WHERE STARTSWITH(c.name_lower, @p) "
+                            "AND c.name_lower > @after ORDER BY c.name_lower")
+        assert shape == {"filters": ("name_lower",), "order_by": (("name_lower", "ascending"),)}
+        assert parse_shape("SELECT * FROM c WHERE c.country = @c ORDER BY c.name_lower DESC, c.id")["order_by"] == (
+            ("name_lower", "descending"), ("id", "ascending"))
+        assert parse_shape("SELECT VALUE c.name_lower FROM c") == {"filters": (), "order_by": ()}
+
+    def test_every_queried_property_is_indexed(self):
+        """Test each property a repository query filters or orders on has an included path."""
+        included = {p["path"] for p in INDEXING_POLICY["includedPaths"]}
+        for shape in query_shapes().values():
+            for field in (*shape["filters"], *(f for f, _ in shape["order_by"])):
+                assert f"/{field}/?" in included
+        assert {f"/{f}/?" for f in (*KEY_FIELDS, "name_lower")} == included
+        assert {"path": "/*"} in INDEXING_POLICY["excludedPaths"]
+
+    def test_unqueried_subtrees_are_not_indexed(self):
+        """Test a write only pays for the queried properties."""
+        container = MockCosmosContainer(indexing_policy=INDEXING_POLICY)
+        charges = []
+        doc = {"name": "Apple Inc.", "name_lower": "apple inc.", "pk": "a", "ticker": "AAPL",
+               "board_members": [{"name": f"Director {i}"} for i in range(20)]}
+        container.create_item(doc, response_hook=lambda h, _: charges.append(float(h["x-ms-request-charge"])))
+        assert charges == [container.WRITE_BASE_CHARGE + 2 * container.INDEX_TERM_CHARGE]
+
+
+class TestBuildPolicy:
+    """Test composite index generation."""
+
+    def test_single_property_order_needs_no_composite(self):
+        """Test a filter and ORDER BY on the same property is left to the range index."""
+        policy = build_indexing_policy({"prefix": parse_shape(
+            "SELECT * FROM c WHERE STARTSWITH(c.name_lower, @p) ORDER BY c.name_lower")})
+        assert policy["compositeIndexes"] == []
+
+    def test_filter_then_order_gets_composite(self):
+        """Test filtering on one property and ordering by another adds a composite, filter first."""
+        shape = parse_shape("SELECT * FROM c WHERE c.country = @c ORDER BY c.name_lower DESC")
+        policy = build_indexing_policy({"a": shape, "b": shape})
+        assert policy["compositeIndexes"] == [[
+            {"path": "/country", "order": "ascending"}, {"path": "/name_lower", "order": "descending"}]]
+        assert [p["path"] for p in policy["includedPaths"]] == ["/country/?", "/name_lower/?"]
+
+
+class TestPolicyMigration:
+    """Test comparing and replacing an existing container's policy."""
+
+    def test_policy_diff(self):
+        """Test only the differences are reported, ignoring order."""
+        current = {"includedPaths": [{"path": "/*"}], "excludedPaths": [{"path": "/\"_etag\"/?"}]}
+        diff = policy_diff(current)
+        assert diff["remove_includedPaths"] == ["/*"]
+        assert diff["add_excludedPaths"] == ["/*"]
+        assert "remove_excludedPaths" not in diff
+        reordered = dict(INDEXING_POLICY, includedPaths=INDEXING_POLICY["includedPaths"][::-1])
+        assert policy_diff(reordered) == {}
+
+    def test_apply_policy_keeps_partition_key_and_ttl(self):
+        """Test the container is replaced with the same pk path and default TTL."""
+        database = MagicMock()
+        database.get_container_client.return_value.read.return_value = {
+            "partitionKey": {"paths": ["/pk"]}, "defaultTtl": 3600}
+        apply_policy(database, "companies")
+        _, kwargs = database.replace_container.call_args
+        assert kwargs["partition_key"]["paths"] == ["/pk"]
+        assert kwargs["default_ttl"] == 3600
+        assert kwargs["indexing_policy"] is INDEXING_POLICY
+
+    def test_apply_policy_keeps_container_properties(self):
+        """Test the conflict resolution policy and analytical store TTL survive the replace."""
+        container = MockCosmosContainer()
+        conflict_resolution = {"mode": "LastWriterWins", "conflictResolutionPath": "/_ts"}
+        container.properties.update(defaultTtl=3600, conflictResolutionPolicy=conflict_resolution,
+                                    analyticalStorageTtl=-1, indexingPolicy={"includedPaths": [{"path": "/*"}]})
+        database = MockCosmosDatabase(companies=container)
+        apply_policy(database, "companies")
+        properties = container.read()
+        assert properties["partitionKey"]["paths"] == ["/pk"]
+        assert properties["defaultTtl"] == 3600
+        assert properties["conflictResolutionPolicy"] == conflict_resolution
+        assert properties["analyticalStorageTtl"] == -1
+        assert properties["indexingPolicy"] is INDEXING_POLICY
+        assert container.indexing_policy is INDEXING_POLICY
+
+    def test_index_progress(self):
+        """Test rebuild progress is read from the container's quota headers."""
+        container = MagicMock()
+        container.read.side_effect = lambda response_hook, **_: response_hook({INDEX_PROGRESS_HEADER: "40"}, {})
+        assert index_progress(container) == 40
+        container.read.side_effect = lambda response_hook, **_: response_hook({}, {})
+        assert index_progress(container) == 100
+
+    def test_cli_reports_diff(self, capsys):
+        """Test the CLI exits 1 when the container's policy differs and 0 after applying it."""
+        client = MagicMock()
+        database = client.get_database_client.return_value
+        container = database.get_container_client.return_value
+        container.read.return_value = {"indexingPolicy": {"includedPaths": [{"path": "/*"}]},
+                                       "partitionKey": {"paths": ["/pk"]}}
+
+        with patch("app.db.get_client", return_value=client):
+            assert main(["--container", "companies"]) == 1
+            assert "remove_includedPaths" in json.loads(capsys.readouterr().out)["diff"]
+            database.replace_container.assert_not_called()
+            assert main(["--container", "companies", "--apply"]) == 0
+        database.replace_container.assert_called_once()
@@ -0,0 +1,149 @@
+"""
+Unit tests for the trigram fuzzy-match index.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.match_index import MatchIndex, canonical_name, features, rank, similarity
+from app.services.company_service import CompanyService
+
+
+def docs(*names):
+    return [{"id": str(i), "pk": "p", "name": name} for i, name in enumerate(names)]
+
+
+class TestCanonicalName:
+    """Test name canonicalization."""
+
+    @pytest.mark.parametrize("name", ["Apple Inc", "Apple, Inc.", "APPLE INCORPORATED", "  apple   inc. "])
+    def test_legal_suffixes_and_punctuation(self, name):
+        """Test spellings of the same company reduce to one canonical name."""
+        assert canonical_name(name) == "apple"
+
+    def test_dotted_and_compound_suffixes(self):
+        """Test "S.A.", "& Co." and a leading "the" are dropped."""
+        assert canonical_name("Danone S.A.") == "danone"
+        assert canonical_name("Goldman Sachs & Co. LLC") == "goldman sachs"
+        assert canonical_name("The Coca-Cola Company") == "coca cola"
+
+    def test_last_word_is_kept(self):
+        """Test a name that is only a suffix is not emptied."""
+        assert canonical_name("Company") == "company"
+        assert canonical_name("AB InBev") == "ab inbev"
+
+    def test_similarity(self):
+        """Test identical names score 1 and unrelated ones near 0."""
+        a = features(canonical_name("Microsoft Corporation"))
+        assert similarity(a, features("microsoft")) == 1.0
+        assert similarity(a, features("zebra")) < 0.1
+
+
+class TestMatchIndex:
+    """Test the MatchIndex class."""
+
+    @pytest.fixture
+    def index(self):
+        index = MatchIndex()
+        index.load(docs("Apple Inc.", "Applied Materials Inc.", "Microsoft Corporation", "Pineapple Express Ltd"))
+        return index
+
+    def test_cold_until_loaded(self):
+        """Test a new index is not ready."""
+        assert MatchIndex().ready is False
+
+    def test_ranked_with_scores(self, index):
+        """Test the best match comes first with its score and fields."""
+        results = index.match("APPLE INCORPORATED")
+        assert results[0] == {"id": "0", "pk": "p", "name": "Apple Inc.", "score": 1.0}
+        assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+        assert "Microsoft Corporation" not in [r["name"] for r in results]
+
+    def test_limit_and_min_score(self, index):
+        """Test limit caps the results and min_score drops weak candidates."""
+        assert len(index.match("apple", limit=1)) == 1
+        assert all(r["score"] >= 0.9 for r in index.match("apple", min_score=0.9))
+
+    def test_typos(self, index):
+        """Test misspelt names still find the company."""
+        assert index.match("Mircosoft Corp")[0]["name"] == "Microsoft Corporation"
+
+    def test_same_results_as_exhaustive_ranking(self, index):
+        """Test the pruned lookup ranks like scoring every document."""
+        every = docs("Apple Inc.", "Applied Materials Inc.", "Microsoft Corporation", "Pineapple Express Ltd")
+        for query in ("apple", "applied", "pineapple inc", "micro"):
+            assert index.match(query) == rank(query, every)
+
+    def test_upsert_and_remove(self, index):
+        """Test renames replace old features and removed ids stop matching."""
+        index.upsert({"id": "0", "pk": "p", "name": "Alphabet Inc."})
+        assert "0" not in [r["id"] for r in index.match("apple")]
+        assert index.match("alphabet")[0]["id"] == "0"
+        index.on_delete("0", "p")
+        assert index.match("alphabet") == []
+        assert index.stats()["size"] == 3
+
+    def test_candidate_budget(self):
+        """Test a lookup stops following features once enough ids were scored."""
+        index = MatchIndex()
+        index.load(docs(*[f"Acme Holdings {i}" for i in range(50)]))
+        assert len(index.match("acme holdings 7", limit=50)) == 50
+        assert [r["name"] for r in index.match("acme holdings 7", limit=50, max_candidates=1)] == ["Acme Holdings 7"]
+
+
+class TestServiceMatch:
+    """Test CompanyService.match_name."""
+
+    @pytest.fixture
+    def service(self, mock_async_company_repository):
+        return CompanyService(repo=mock_async_company_repository, match_index=MatchIndex())
+
+    async def test_cold_index_ranks_prefix_query(self, service, sample_companies_list):
+        """Test a cold index falls back to one prefix query on the first word."""
+        for company in sample_companies_list:
+            await service.create_company(company)
+        service.match_index.ready = False
+        result = await service.match_name("APPLE, INCORPORATED")
+        assert result["canonical"] == "apple"
+        assert [c["name"] for c in result["candidates"]] == ["Apple Inc."]
+
+    async def test_loaded_index_skips_repository(self, service, sample_companies_list):
+        """Test a loaded index answers without querying Cosmos, and writes keep it current."""
+        for company in sample_companies_list:
+            await service.create_company(company)
+        await service.load_match_index()
+        created = await service.create_company({"name": "Amazon Web Services LLC"})
+        service.repo.search_by_name_prefix = AsyncMock()
+
+        names = [c["name"] for c in (await service.match_name("amazon"))["candidates"]]
+        assert names[0] == "Amazon.com Inc." and "Amazon Web Services LLC" in names
+        await service.delete_company(created["id"], created["pk"])
+        assert "Amazon Web Services LLC" not in [c["name"] for c in (await service.match_name("amazon"))["candidates"]]
+        service.repo.search_by_name_prefix.assert_not_awaited()
+
+
+class TestMatchEndpoint:
+    """Test GET /companies/match."""
+
+    def test_match(self, test_client, mock_get_container, mock_container, sample_companies_list):
+        """Test the endpoint returns ranked candidates, with or without the index loaded."""
+        from app.routers.companies import svc
+
+        for company in sample_companies_list:
+            test_client.post("/companies", json={"name": company["name"]})
+        cold = test_client.get("/companies/match?name=microsoft corp")
+        index = MatchIndex()
+        index.load(mock_container.items)
+        with patch.object(svc, "match_index", index):
+            warm = test_client.get("/companies/match?name=microsoft corp")
+            assert test_client.get("/health").json()["match_index"]["size"] == 3
+        for response in (cold, warm):
+            assert response.status_code == 200
+            body = response.json()
+            assert body["canonical"] == "microsoft"
+            assert body["candidates"][0]["name"] == "Microsoft Corporation"
+            assert body["candidates"][0]["score"] == 1.0
+
+    def test_limit_bounds(self, test_client, mock_get_container):
+        """Test limit is validated."""
+        assert test_client.get("/companies/match?name=a&limit=0").status_code == 422
+        assert test_client.get("/companies/match?name=a&limit=51").status_code == 422
+
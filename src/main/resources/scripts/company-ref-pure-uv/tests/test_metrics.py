@@ -0,0 +1,114 @@
+"""
+Tests for Cosmos RU/latency instrumentation and the /metrics endpoint.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from azure.cosmos.exceptions import CosmosHttpResponseError
+from app.main import app
+from app.metrics import CosmosCall, MetricsMiddleware, MetricsRegistry, cosmos_call, registry
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+class TestCosmosCall:
+    """Test the response_hook accumulator."""
+
+    def test_sums_pages_and_skips_pager_callback(self):
+        """Test per-page headers add up and the up-front pager callback is ignored."""
+        class Pager:
+            def by_page(self):
+                pass
+
+        call = CosmosCall("find_by_keys")
+        call({"x-ms-request-charge": "99"}, Pager())
+        call({"x-ms-request-charge": "2.5", "x-ms-request-duration-ms": "1.2"}, {"Documents": []})
+        call({"x-ms-request-charge": "3", "x-ms-throttle-retry-count": "2"}, {"Documents": []})
+        assert call.request_charge == 5.5
+        assert call.server_ms == 1.2
+        assert call.retries == 2
+        assert call.responses == 2
+
+    def test_failed_call_is_charged(self):
+        """Test the charge of a failed call is taken from the error's headers."""
+        class Response:
+            status_code = 404
+            headers = {"x-ms-request-charge": "1.24"}
+            reason = "Not Found"
+
+            def text(self):
+                return ""
+
+        with pytest.raises(CosmosHttpResponseError):
+            with cosmos_call("read_item"):
+                raise CosmosHttpResponseError(message="gone", response=Response())
+        assert 'cosmos_request_charge_sum{route="-",operation="read_item"} 1.24' in registry.render()
+
+
+class TestMetricsRegistry:
+    """Test histogram aggregation and Prometheus rendering."""
+
+    def test_render_histogram(self):
+        """Test cumulative buckets, +Inf, sum and count."""
+        metrics = MetricsRegistry()
+        for charge in (1.0, 2.9, 7.0):
+            call = CosmosCall("read_item")
+            call.request_charge = charge
+            metrics.observe_call("/x", call)
+
+        text = metrics.render()
+        assert "# TYPE cosmos_request_charge histogram" in text
+        assert 'cosmos_request_charge_bucket{route="/x",operation="read_item",le="1"} 1' in text
+        assert 'cosmos_request_charge_bucket{route="/x",operation="read_item",le="3"} 2' in text
+        assert 'cosmos_request_charge_bucket{route="/x",operation="read_item",le="+Inf"} 3' in text
+        assert 'cosmos_request_charge_count{route="/x",operation="read_item"} 3' in text
+        assert 'cosmos_throttle_retries_total{route="/x",operation="read_item"} 0' in text
+
+    def test_label_escaping(self):
+        """Test quotes and backslashes in labels are escaped."""
+        metrics = MetricsRegistry()
+        metrics.observe_call('a"b\\c', CosmosCall("q"))
+        assert 'route="a\\"b\\\\c"' in metrics.render()
+
+
+class TestMetricsEndpoint:
+    """Test per-route attribution through the app."""
+
+    def test_calls_are_labelled_by_route_and_operation(self, mock_get_container, sample_companies_list):
+        """Test repository calls show up under the route template that made them."""
+        client = TestClient(app)
+        created = client.post("/companies", json=sample_companies_list[0]).json()
+        client.get(f"/companies/{created['pk']}/{created['id']}")
+        client.get("/companies/search?prefix=app")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert 'cosmos_request_charge_sum{route="/companies",operation="create_item"} 5.71' in text
+        assert 'cosmos_request_charge_count{route="/companies/{pk}/{id}",operation="read_item"} 1' in text
+        assert 'cosmos_items_sum{route="/companies/search",operation="search_by_name_prefix"} 1' in text
+        assert 'http_request_charge_count{method="GET",route="/companies/{pk}/{id}"} 1' in text
+        assert 'route="/metrics"' not in text
+
+    def test_echo_headers(self):
+        """Test the request's RU charge and call count can be echoed as headers."""
+        mini = FastAPI()
+        mini.add_middleware(MetricsMiddleware, metrics=MetricsRegistry(), echo_headers=True)
+
+        @mini.get("/two-calls")
+        async def two_calls():
+            for charge in ("1.5", "2.25"):
+                with cosmos_call("read_item") as call:
+                    call({"x-ms-request-charge": charge}, {})
+            return {}
+
+        response = TestClient(mini).get("/two-calls")
+        assert response.headers["x-request-charge"] == "3.75"
+        assert response.headers["x-cosmos-calls"] == "2"
+        assert response.headers["x-cosmos-retries"] == "0"
@@ -0,0 +1,87 @@
+"""
+Unit tests for the in-memory Cosmos stand-in the other tests run against.
+"""
+import pytest
+from azure.cosmos.exceptions import CosmosHttpResponseError
+from tests.conftest import MockCosmosContainer, MockQuery
+
+
+def _query(container, query, response_hook=None, **params):
+    return container.query_items(query, [{"name": f"@{k}", "value": v} for k, v in params.items()],
+                                 enable_cross_partition_query=True, response_hook=response_hook)
+
+
+@pytest.fixture
+def container():
+    container = MockCosmosContainer()
+    for i, name in enumerate(["Apple Inc.", "Applied Materials", "Amazon", "Banana Co", "Apricot Ltd"]):
+        container.create_item({"id": str(i), "pk": name[0].lower(), "name": name, "name_lower": name.lower(),
+                               "ticker": f"T{i}", "rank": i})
+    return container
+
+
+class TestMockQuery:
+    """Test the query parser."""
+
+    def test_parse(self):
+        """Test projection, TOP, nested conditions and ORDER BY are parsed."""
+        q = MockQuery("SELECT TOP @lim c.id, c.name FROM c WHERE (c.a = @a OR c.b IN (@x, @y)) "
+                      "AND STARTSWITH(c.name_lower, @p) ORDER BY c.name_lower DESC")
+        assert (q.top, q.fields, q.value, q.order) == (("param", "@lim"), ["id", "name"], False, ("name_lower", True))
+        assert q.where == ("and", [("or", [("=", "a", ("param", "@a")),
+                                           ("in", "b", [("param", "@x"), ("param", "@y")])]),
+                                   ("startswith", "name_lower", ("param", "@p"))])
+
+    @pytest.mark.parametrize("query", ["SELECT * FROM c WHERE c.a LIKE @a", "SELECT * FROM d",
+                                       "SELECT * FROM c WHERE c.a = 'x'", "DELETE FROM c"])
+    def test_unsupported_is_bad_request(self, container, query):
+        """Test queries outside the subset fail like Cosmos rejects a bad query."""
+        with pytest.raises(CosmosHttpResponseError) as exc:
+            _query(container, query, a="x")
+        assert exc.value.status_code == 400
+
+
+class TestMockCosmosContainer:
+    """Test the indexed MockCosmosContainer."""
+
+    def test_prefix_range_in_name_order(self, container):
+        """Test STARTSWITH with keyset paging and TOP reads only the rows it returns."""
+        headers = {}
+        results = _query(container, "SELECT TOP @lim c.name FROM c WHERE STARTSWITH(c.name_lower, @p) "
+                         "AND c.name_lower > @after ORDER BY c.name_lower",
+                         lambda h, _: headers.update(h), p="ap", after="apple inc.", lim=1)
+        assert results == [{"name": "Applied Materials"}]
+        assert headers["x-ms-documentdb-query-metrics"] == "retrievedDocumentCount=1;outputDocumentCount=1"
+
+    def test_lookups_use_value_indexes(self, container):
+        """Test OR and IN lookups only examine the matching documents and keep insertion order."""
+        headers = {}
+        results = _query(container, "SELECT VALUE c.name_lower FROM c WHERE c.ticker = @t OR c.ticker IN (@a, @b)",
+                         lambda h, _: headers.update(h), t="T4", a="T0", b="T9")
+        assert results == ["apple inc.", "apricot ltd"]
+        assert headers["x-ms-documentdb-query-metrics"].startswith("retrievedDocumentCount=2;")
+
+    def test_unindexed_filters_scan(self, container):
+        """Test conditions on other properties, ordering and partition scope are applied."""
+        assert [d["id"] for d in _query(container, "SELECT * FROM c WHERE c.rank >= @r ORDER BY c.rank DESC",
+                                        r=2)] == ["4", "3", "2"]
+        assert container.query_items("SELECT c.id FROM c", [], partition_key="b") == [{"id": "3"}]
+
+    def test_writes_keep_indexes_current(self, container):
+        """Test renames, deletes and direct list edits are reflected in queries and unique keys."""
+        doc = container.read_item("0", "a")
+        container.replace_item("0", {**doc, "name": "Apex", "name_lower": "apex", "ticker": "T0"})
+        container.delete_item("2", "a")
+        assert _query(container, "SELECT VALUE c.name_lower FROM c WHERE STARTSWITH(c.name_lower, @p)",
+                      p="a") == ["apex", "applied materials", "apricot ltd"]
+        container.create_item({"id": "9", "pk": "a", "name": "Apple Inc.", "name_lower": "apple inc."})
+        with pytest.raises(CosmosHttpResponseError) as exc:
+            container.create_item({"id": "10", "pk": "a", "name": "Axe", "name_lower": "axe", "ticker": "T1"})
+        assert exc.value.status_code == 409
+        # Unique keys are per logical partition, as in Cosmos
+        container.create_item({"id": "11", "pk": "z", "name": "Zed", "name_lower": "zed", "ticker": "T1"})
+
+        container.items.clear()
+        container.items.append({"id": "1", "pk": "l", "name_lower": "legacy co"})
+        assert len(container.items) == 1
+        assert _query(container, "SELECT VALUE c.id FROM c WHERE c.name_lower = @n", n="legacy co") == ["1"]
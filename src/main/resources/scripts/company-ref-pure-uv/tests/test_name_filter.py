@@ -0,0 +1,115 @@
+"""
+Unit tests for the negative-result name filter.
+"""
+import pytest
+from unittest.mock import AsyncMock
+from app.name_filter import NameBloomFilter
+from app.services.company_service import CompanyService
+
+
+class TestNameBloomFilter:
+    """Test the NameBloomFilter class."""
+
+    def test_cold_until_loaded(self):
+        """Test a new filter is not ready."""
+        assert NameBloomFilter().ready is False
+
+    def test_no_false_negatives(self):
+        """Test every loaded or added name is reported as maybe present."""
+        bloom = NameBloomFilter(capacity=1000, fp_rate=0.01)
+        bloom.load(f"company {i}" for i in range(1000))
+        bloom.add("late arrival")
+        assert all(bloom.might_contain(f"company {i}") for i in range(1000))
+        assert bloom.might_contain("late arrival")
+
+    def test_false_positive_rate_near_target(self):
+        """Test the share of absent names let through stays near the target."""
+        bloom = NameBloomFilter(capacity=5000, fp_rate=0.01)
+        bloom.load(f"company {i}" for i in range(5000))
+        passed = sum(bloom.might_contain(f"missing {i}") for i in range(20000))
+        assert passed / 20000 < 0.02
+        assert bloom.stats()["expected_false_positive_rate"] < 0.02
+
+    def test_load_resizes_for_growth(self):
+        """Test a reload sizes the filter for at least twice the loaded names."""
+        bloom = NameBloomFilter(capacity=10)
+        bloom.load(f"n{i}" for i in range(100))
+        small = NameBloomFilter(capacity=200)
+        assert bloom.num_bits == small.num_bits
+        assert bloom.stats()["items"] == 100
+
+    def test_stats(self):
+        """Test check counters and observed false-positive rate."""
+        bloom = NameBloomFilter(capacity=100)
+        bloom.load(["apple inc."])
+        bloom.might_contain("apple inc.")
+        bloom.might_contain("zzz")
+        bloom.record_false_positive()
+        stats = bloom.stats()
+        assert stats["checks"] == 2
+        assert stats["definite_misses"] == 1
+        assert stats["false_positive_rate"] == 0.5
+        assert stats["memory_bytes"] == (stats["bits"] + 7) // 8
+
+
+class StubFeed:
+    """A change feed that is caught up or not."""
+
+    def __init__(self, caught_up=True):
+        self.lagging = not caught_up
+
+    def caught_up(self, max_lag):
+        return not self.lagging
+
+
+class TestServiceNameFilter:
+    """Test CompanyService answering validate misses from the filter."""
+
+    @pytest.fixture
+    def service(self, mock_async_company_repository):
+        name_filter = NameBloomFilter(capacity=100)
+        name_filter.follow(StubFeed())
+        return CompanyService(repo=mock_async_company_repository, name_filter=name_filter)
+
+    async def test_cold_filter_queries_repository(self, service):
+        """Test validate queries Cosmos until the filter is loaded."""
+        service.repo.find_by_name_exact = AsyncMock(return_value=None)
+        await service.validate_name_exists("Nobody Ltd")
+        service.repo.find_by_name_exact.assert_awaited_once()
+
+    async def test_definite_miss_skips_repository(self, service, sample_companies_list):
+        """Test names absent from the filter are answered without a query."""
+        for company in sample_companies_list:
+            await service.create_company(company)
+        await service.load_name_filter()
+        service.repo.find_by_name_exact = AsyncMock()
+
+        result = await service.validate_name_exists("Nobody Ltd")
+        assert result == {"query": "Nobody Ltd", "exists": False, "match": None}
+        service.repo.find_by_name_exact.assert_not_awaited()
+
+    @pytest.mark.parametrize("feed", [None, StubFeed(caught_up=False)])
+    async def test_misses_go_to_repository_without_a_current_feed(self, service, feed):
+        """Test a loaded filter without a feed, or with a lagging one, does not answer misses."""
+        await service.load_name_filter()
+        service.name_filter.feed = feed
+        service.repo.find_by_name_exact = AsyncMock(return_value={"id": "1", "name": "Elsewhere Ltd"})
+        assert (await service.validate_name_exists("Elsewhere Ltd"))["exists"] is True
+        service.repo.find_by_name_exact.assert_awaited_once()
+        assert service.name_filter.stats()["current"] is False
+
+    async def test_writes_keep_filter_current(self, service, sample_company_data):
+        """Test creates and renames are added so they validate as existing."""
+        await service.load_name_filter()
+        created = await service.create_company(sample_company_data)
+        assert (await service.validate_name_exists(" APPLE INC. "))["exists"] is True
+
+        await service.update_company(created["id"], created["pk"], {"name": "Apple Computer"})
+        assert service.name_filter.might_contain("apple computer")
+
+    async def test_false_positive_recorded(self, service):
+        """Test a filter pass that Cosmos does not confirm counts as a false positive."""
+        await service.load_name_filter()
+        service.name_filter.add("ghost corp")
+        assert (await service.validate_name_exists("Ghost Corp"))["exists"] is False
+        assert service.name_filter.stats()["false_positives"] == 1
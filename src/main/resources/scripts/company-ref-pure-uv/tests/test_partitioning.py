@@ -0,0 +1,199 @@
+"""
+Tests for partition key strategies, dual-read cutover and the migration tool.
+"""
+import asyncio
+import json
+import pytest
+from collections import Counter
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.migrate_partitions import catch_up, feed_position, main, migrate, verify
+from app.partitioning import FirstLetterPartitioner, HashPartitioner, get_partitioner
+from app.repository.async_company_repository import AsyncCompanyRepository
+from tests.conftest import AsyncMockCosmosContainer
+
+
+class TestPartitioners:
+    """Test the pk derivation strategies."""
+
+    def test_first_letter(self):
+        """Test the default strategy matches derive_pk_from_name and routes prefixes."""
+        p = get_partitioner("first_letter")
+        assert p.pk("  Apple Inc.") == "a"
+        assert p.prefix_pk("APP") == "a"
+        assert p.prefix_pk(" ") is None
+        assert p.owns("a") and not p.owns("h0a")
+
+    def test_hash_is_stable_and_in_range(self):
+        """Test hash buckets ignore case/spacing and stay within the bucket count."""
+        p = HashPartitioner(buckets=64)
+        assert p.pk("Apple Inc.") == p.pk("  apple   INC.")
+        assert p.pk("Apple Inc.") == HashPartitioner(buckets=64).pk("Apple Inc.")
+        pks = {p.pk(f"company {i}") for i in range(2000)}
+        assert len(pks) == 64
+        assert all(p.owns(pk) for pk in pks)
+        assert not p.owns("a") and not p.owns("hzz") and not p.owns("h40")
+        assert p.prefix_pk("app") is None
+
+    @pytest.mark.parametrize("strategy", ["first_letter", "hash"])
+    def test_keys(self, strategy):
+        """Test keys and keys_many return the normalized name with the pk of pk()."""
+        p = get_partitioner(strategy)
+        names = ["  Apple   Inc.", "microsoft", ""]
+        assert p.keys_many(names) == [p.keys(n) for n in names]
+        assert p.keys("  Apple   Inc.") == ("apple inc.", p.pk("Apple Inc."))
+
+    def test_hash_spreads_skewed_names(self):
+        """Test names skewed towards a few first letters still fill buckets evenly."""
+        names = [f"{letter}company {i}" for letter, n in (("s", 5000), ("c", 3000), ("x", 50)) for i in range(n)]
+        first = Counter(FirstLetterPartitioner().pk(n) for n in names)
+        hashed = Counter(HashPartitioner(buckets=32).pk(n) for n in names)
+        assert max(first.values()) / (len(names) / len(first)) > 1.8
+        assert max(hashed.values()) / (len(names) / len(hashed)) < 1.3
+
+    def test_unknown_strategy(self):
+        """Test an unknown strategy name is rejected."""
+        with pytest.raises(ValueError):
+            get_partitioner("round_robin")
+
+
+class TestHashPartitionedRepository:
+    """Test the repository deriving pk through a hash strategy."""
+
+    @pytest.fixture
+    def repository(self, async_mock_container):
+        repo = AsyncCompanyRepository(partitioner=HashPartitioner(buckets=16))
+        repo._container = async_mock_container
+        return repo
+
+    async def test_create_and_route(self, repository, sample_companies_list):
+        """Test pk comes from the hash, exact names stay single-partition and prefixes fan out."""
+        created = await repository.create(sample_companies_list[0])
+        assert created["pk"] == HashPartitioner(buckets=16).pk("Apple Inc.")
+        assert (await repository.find_by_name_exact("apple inc."))["id"] == created["id"]
+        assert [c["id"] for c in await repository.search_by_name_prefix("app")] == [created["id"]]
+
+        stats = repository.routing_stats()
+        assert stats["find_by_name_exact"]["single_partition"] == 1
+        assert stats["search_by_name_prefix"]["cross_partition"] == 1
+
+
+class TestDualRead:
+    """Test point reads and writes addressed with the old container's pk."""
+
+    @pytest.fixture
+    def old(self):
+        repo = AsyncCompanyRepository(partitioner=FirstLetterPartitioner())
+        repo._container = AsyncMockCosmosContainer()
+        return repo
+
+    @pytest.fixture
+    def new(self, old):
+        repo = AsyncCompanyRepository(partitioner=HashPartitioner(buckets=16), fallback=old)
+        repo._container = AsyncMockCosmosContainer()
+        return repo
+
+    async def test_old_pk_resolves_to_new_document(self, old, new, sample_companies_list):
+        """Test an old pk is mapped through the old container to the migrated copy."""
+        legacy = await old.create(sample_companies_list[0])
+        await new.import_document(legacy)
+        await new.update(legacy["id"], legacy["pk"], {"sector": "Hardware"})
+
+        doc = await new.get(legacy["id"], "a")
+        assert doc["pk"] == new.partitioner.pk("Apple Inc.")
+        assert doc["sector"] == "Hardware"
+        assert new.fallback_reads == 2
+
+    async def test_not_yet_copied_is_served_from_old(self, old, new, sample_companies_list):
+        """Test a document missing from the new container is read from the old one."""
+        legacy = await old.create(sample_companies_list[1])
+        assert (await new.get(legacy["id"], "m"))["pk"] == "m"
+        assert await new.get("missing", "m") is None
+        assert await new.delete("missing", "m") is False
+
+    async def test_new_pk_skips_fallback(self, new, sample_companies_list):
+        """Test pks in the new scheme never touch the old container."""
+        created = await new.create(sample_companies_list[0])
+        assert (await new.get(created["id"], created["pk"]))["id"] == created["id"]
+        assert new.fallback_reads == 0
+
+
+class TestMigration:
+    """Test copying, catch-up and verification between containers."""
+
+    @pytest.fixture
+    def source(self, sample_companies_list):
+        repo = AsyncCompanyRepository(partitioner=FirstLetterPartitioner())
+        repo._container = AsyncMockCosmosContainer()
+        return repo
+
+    @pytest.fixture
+    def target(self):
+        repo = AsyncCompanyRepository(partitioner=HashPartitioner(buckets=8))
+        repo._container = AsyncMockCosmosContainer()
+        return repo
+
+    async def test_copy_and_verify(self, source, target, sample_companies_list):
+        """Test every document is copied under its new pk and the counts match."""
+        for company in sample_companies_list:
+            await source.create(company)
+
+        report = await migrate(source, target, page_size=2, concurrency=4)
+        assert report["copied"] == 3 and report["failed"] == 0
+        assert report["source_count"] == report["target_count"] == 3
+        assert report["missing"] == report["extra"] == report["misplaced"] == 0
+        assert report["source_partitions"]["partitions"] == 2
+        assert all(d["pk"] == target.partitioner.pk(d["name"]) for d in target._container.items)
+        assert all("_rid" not in d for d in target._container.items)
+
+    async def test_catch_up_and_prune(self, source, target, sample_companies_list):
+        """Test changes during the copy are replayed and leftovers are found and pruned."""
+        apple = await source.create(sample_companies_list[0])
+        msft = await source.create(sample_companies_list[1])
+        tokens = await feed_position(source)
+        for doc in source._container.items:
+            await target.import_document(doc)
+
+        # A rename into another hash bucket leaves the old copy behind in the target
+        new_name = next(n for n in (f"Zebra Holdings {i}" for i in range(100))
+                        if target.partitioner.pk(n) != target.partitioner.pk(apple["name"]))
+        await source.update(apple["id"], apple["pk"], {"name": new_name})
+        await source.delete(msft["id"], msft["pk"])
+        await source.create(sample_companies_list[2])
+        assert await catch_up(source, target, tokens, asyncio.Semaphore(4), []) == 2
+
+        report = await verify(source, target)
+        assert (report["missing"], report["extra"], report["misplaced"]) == (0, 1, 1)
+        assert report["extra_ids"] == [msft["id"]]
+
+        report = await verify(source, target, prune=True)
+        assert report["pruned"] == 2
+        assert report["target_count"] == 2
+        assert (await verify(source, target))["extra"] == 0
+
+    def test_cli(self, capsys):
+        """Test the CLI creates the target, copies and exits 0 on a clean verify."""
+        source, target = AsyncMockCosmosContainer(), AsyncMockCosmosContainer()
+        source.sync.items.append({"id": "1", "pk": "a", "name": "Apple Inc.", "name_lower": "apple inc."})
+        containers = {"companies": source, "companies_v2": target}
+
+        with patch("app.repository.async_company_repository.get_async_container",
+                   AsyncMock(side_effect=lambda container_id=None: containers[container_id])), \
+                patch("app.db.create_async_container", AsyncMock(return_value=target)), \
+                patch("app.db.close_async_client", AsyncMock()):
+            code = main(["--source", "companies", "--target", "companies_v2", "--buckets", "4"])
+
+        assert code == 0
+        assert json.loads(capsys.readouterr().out)["copied"] == 1
+        assert target.items[0]["pk"] == HashPartitioner(buckets=4).pk("Apple Inc.")
+
+
+class TestPartitionKeyEndpoint:
+    """Test GET /companies/partition-key."""
+
+    def test_partition_key(self):
+        """Test the API computes the pk for a name."""
+        response = TestClient(app).get("/companies/partition-key?name=  Apple Inc.")
+        assert response.status_code == 200
+        assert response.json() == {"name": "  Apple Inc.", "pk": "a", "strategy": "first_letter"}
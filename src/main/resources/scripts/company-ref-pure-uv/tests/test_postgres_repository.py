@@ -0,0 +1,84 @@
+"""
+Tests for the asyncpg repository backend.
+
+The integration tests need asyncpg and a throwaway database: set
+``POSTGRES_TEST_DSN``. Its ``companies`` table is emptied before each test.
+"""
+import os
+import pytest
+from unittest.mock import patch
+from app.repository.backends import create_repository
+from app.repository.postgres_company_repository import PostgresCompanyRepository
+from app.repository.protocol import ConflictError, PreconditionFailedError
+
+POSTGRES_TEST_DSN = os.environ.get("POSTGRES_TEST_DSN")
+
+
+class TestPostgresConfiguration:
+    """Test the backend without a server."""
+
+    def test_selected_by_factory(self):
+        """Test REPOSITORY_BACKEND=postgres builds the repository without connecting."""
+        repo = create_repository("postgres")
+        assert isinstance(repo, PostgresCompanyRepository)
+        assert repo.pool_stats()["open"] is False
+
+    async def test_missing_driver(self):
+        """Test a clear error when asyncpg is not installed."""
+        with patch("app.repository.postgres_company_repository.asyncpg", None):
+            with pytest.raises(RuntimeError, match="postgres"):
+                await PostgresCompanyRepository("postgresql://unused").warm_up()
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+class TestPostgresCompanyRepository:
+    """Test the PostgresCompanyRepository class against a real server."""
+
+    @pytest.fixture
+    async def repository(self):
+        pytest.importorskip("asyncpg")
+        repo = PostgresCompanyRepository(POSTGRES_TEST_DSN, min_size=1, max_size=4)
+        await repo.warm_up()
+        await (await repo.open()).execute("TRUNCATE companies")
+        yield repo
+        await repo.close()
+
+    async def test_crud_and_unique_keys(self, repository, sample_company_data):
+        """Test create, read, conditional update, conflicts and delete."""
+        created = await repository.create(sample_company_data)
+        assert await repository.get(created["id"], "a") == created
+        with pytest.raises(ConflictError):
+            await repository.create({"name": "APPLE INC."})
+        await repository.create({"name": "Banana Co", "ticker": "AAPL"})
+
+        updated = await repository.update(created["id"], "a", {"sector": "Hardware"}, if_match=created["_etag"])
+        with pytest.raises(PreconditionFailedError):
+            await repository.update(created["id"], "a", {"sector": "Software"}, if_match=created["_etag"])
+        moved = await repository.update(created["id"], "a", {"name": "Zeta Corp"}, if_match=updated["_etag"])
+        assert (moved["pk"], moved["sector"]) == ("z", "Hardware")
+        assert await repository.delete(created["id"], "z") is True
+        assert await repository.delete(created["id"], "z") is False
+
+    async def test_prefix_search_and_lookups(self, repository, sample_companies_list):
+        """Test prefix pages in code point order and identifier lookups."""
+        for company in sample_companies_list:
+            await repository.create(company)
+        await repository.create({"name": "Am_x 100%"})
+        assert [c["name"] for c in await repository.search_by_name_prefix("am", 10)] == [
+            "Am_x 100%", "Amazon.com Inc."]
+        assert [c["name"] for c in await repository.search_by_name_prefix("am", 10, after="am_x 100%")] == [
+            "Amazon.com Inc."]
+        found = await repository.find_many_by_keys({"ticker": ["MSFT", "NOPE"]}, fields=("name",))
+        assert found == {"ticker": {"MSFT": {"id": found["ticker"]["MSFT"]["id"], "pk": "m",
+                                             "ticker": "MSFT", "name": "Microsoft Corporation"}}}
+        assert len(await repository.find_by_keys(ticker="aapl", lei="PQOH26KWDF7CG10L6792")) == 2
+
+    async def test_bulk_create_with_copy(self, repository):
+        """Test COPY-based bulk create reports conflicts with stored and earlier rows."""
+        await repository.create({"name": "Company 1"})
+        results = await repository.bulk_create([{"name": f"Company {i}"} for i in range(4)] + [{"name": "company 2"}])
+        assert [r["status_code"] for r in results] == [201, 409, 201, 201, 409]
+        pages = [page async for page in repository.iter_pages(2)]
+        assert sum(len(p) for p in pages) == 4
+        assert repository.pool_stats()["open"] is True
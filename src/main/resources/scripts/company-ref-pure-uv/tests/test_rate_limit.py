@@ -0,0 +1,193 @@
+"""
+Tests for the RU budget scheduler and 429 handling.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from azure.cosmos.exceptions import CosmosHttpResponseError
+from app.rate_limit import RequestThrottledError, RUScheduler
+
+
+class FakeClock:
+    """Monotonic clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def throttled(retry_after_ms=None):
+    error = CosmosHttpResponseError(status_code=429, message="Request rate is large")
+    error.headers = {"x-ms-retry-after-ms": str(retry_after_ms)} if retry_after_ms else {}
+    return error
+
+
+def charging(ru, result=None, retries=0):
+    async def fn(call):
+        call({"x-ms-request-charge": str(ru), "x-ms-throttle-retry-count": str(retries)})
+        return result
+    return fn
+
+
+class TestTokenBucket:
+    """Test admission against the RU budget."""
+
+    async def test_burst_then_paced(self, clock):
+        """Test a full bucket admits a burst at once and later calls wait for the refill."""
+        scheduler = RUScheduler(ru_per_second=100, clock=clock)
+        for _ in range(20):
+            await scheduler.acquire("read_item")
+        assert clock.sleeps == []
+        await scheduler.acquire("read_item")
+        assert clock.sleeps == [pytest.approx(0.05)]
+        assert scheduler.stats()["queued"] == 1
+
+    async def test_low_priority_is_shed_before_point_reads(self, clock):
+        """Test search is turned away from the reserve while a point read still gets through."""
+        scheduler = RUScheduler(ru_per_second=100, reserve=0.2, low_priority_max_wait=0.1, clock=clock)
+        scheduler.tokens = 10
+        with pytest.raises(RequestThrottledError) as exc:
+            await scheduler.acquire("search_by_name_prefix")
+        assert exc.value.retry_after == pytest.approx(0.15)
+        await scheduler.acquire("read_item")
+        assert clock.sleeps == []
+        assert scheduler.stats()["shed"] == 1
+
+    async def test_background_queues_instead_of_shedding(self, clock):
+        """Test bulk work waits however long the budget needs."""
+        scheduler = RUScheduler(ru_per_second=10, clock=clock)
+        scheduler.tokens = -100
+        await scheduler.acquire("execute_item_batch")
+        assert clock.sleeps == [pytest.approx((100 + 5 + 2) / 10)]
+
+    async def test_learns_charge_per_operation(self, clock):
+        """Test the expected charge follows observed x-ms-request-charge values."""
+        scheduler = RUScheduler(ru_per_second=1000, clock=clock)
+        assert await scheduler.run("find_by_keys", charging(20, "ok")) == "ok"
+        assert scheduler.estimate("find_by_keys") == 20
+        await scheduler.run("find_by_keys", charging(10))
+        assert scheduler.estimate("find_by_keys") == pytest.approx(18)
+        assert scheduler.tokens == pytest.approx(1000 - 30)
+
+    async def test_sdk_throttle_retries_empty_the_bucket(self, clock):
+        """Test a response the SDK had to retry stops further spending until refill."""
+        scheduler = RUScheduler(ru_per_second=100, clock=clock)
+        await scheduler.run("read_item", charging(1, retries=2))
+        assert scheduler.tokens == 0
+        assert scheduler.stats()["throttled"] == 2
+
+
+class TestThrottleBackoff:
+    """Test 429 handling."""
+
+    async def test_retry_after_with_jitter(self, clock):
+        """Test a 429 is retried after its retry-after plus jitter, and pauses other callers."""
+        scheduler = RUScheduler(ru_per_second=100, clock=clock)
+        attempts = []
+
+        async def fn(call):
+            attempts.append(clock.now)
+            if len(attempts) == 1:
+                raise throttled(retry_after_ms=400)
+            return "ok"
+
+        assert await scheduler.run("create_item", fn) == "ok"
+        assert 0.4 <= clock.sleeps[0] <= 0.6
+        assert scheduler.stats()["retries"] == 1
+
+        scheduler.paused_until = clock.now + 0.3
+        await scheduler.acquire("read_item")
+        assert clock.sleeps[-1] == pytest.approx(0.3)
+
+    async def test_gives_up_after_max_retries(self, clock):
+        """Test a call still throttled after the retries raises RequestThrottledError."""
+        scheduler = RUScheduler(ru_per_second=100, max_retries=2, clock=clock)
+
+        async def fn(call):
+            raise throttled()
+
+        with pytest.raises(RequestThrottledError):
+            await scheduler.run("create_item", fn)
+        # Exponential backoff without a retry-after header: 0.1 then 0.2 (plus jitter)
+        assert 0.1 <= clock.sleeps[0] <= 0.15 and 0.2 <= clock.sleeps[1] <= 0.3
+        assert scheduler.stats()["throttled"] == 3
+
+    async def test_other_errors_are_not_retried(self, clock):
+        """Test non-429 errors pass straight through."""
+        scheduler = RUScheduler(ru_per_second=100, clock=clock)
+
+        async def fn(call):
+            raise CosmosHttpResponseError(status_code=409, message="Conflict")
+
+        with pytest.raises(CosmosHttpResponseError):
+            await scheduler.run("create_item", fn)
+        assert scheduler.stats()["retries"] == 0
+
+
+class TestThrottledRequests:
+    """Test throttling surfaces as 429 with Retry-After through the API."""
+
+    def test_cosmos_429_is_not_a_500(self, test_client, mock_get_container, mock_container):
+        """Test a 429 that outlasted the SDK retries reaches the client as 429."""
+        with patch.object(mock_container, "create_item", side_effect=throttled(retry_after_ms=1500)):
+            response = test_client.post("/companies", json={"name": "Apple Inc."})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+
+    def test_listing_is_shed_only_before_it_starts(self, test_client, mock_get_container):
+        """Test a throttled listing is a 429 up front, and later pages queue instead of cutting the stream."""
+        from app.routers.companies import svc
+
+        for i in range(30):
+            test_client.post("/companies", json={"name": f"Company {i:02d}"})
+        scheduler = RUScheduler(ru_per_second=10000, reserve=0.01, low_priority_max_wait=0.0001)
+        svc.repo.scheduler = scheduler
+        settle = scheduler.settle
+
+        def drained(*args, **kwargs):
+            # Other work empties the bucket while each page is being sent
+            settle(*args, **kwargs)
+            scheduler.tokens = 0
+
+        try:
+            scheduler.tokens = 0
+            assert test_client.get("/companies?page_size=10").status_code == 429
+            scheduler.tokens = scheduler.capacity
+            with patch.object(scheduler, "settle", drained):
+                response = test_client.get("/companies?page_size=10")
+            assert response.status_code == 200
+            assert len(response.text.splitlines()) == 30
+            assert scheduler.stats()["queued"] >= 1
+        finally:
+            svc.repo.scheduler = None
+
+    def test_search_is_shed_while_point_reads_are_served(self, test_client, mock_get_container, sample_company_data):
+        """Test an exhausted budget sheds search but still serves point reads."""
+        from app.routers.companies import svc
+
+        created = test_client.post("/companies", json={"name": sample_company_data["name"]}).json()
+        scheduler = RUScheduler(ru_per_second=10, low_priority_max_wait=0.01)
+        svc.repo.scheduler = scheduler
+        try:
+            scheduler.tokens = 5
+            assert test_client.get("/companies/search?prefix=app").status_code == 429
+            assert test_client.get(f"/companies/{created['pk']}/{created['id']}").status_code == 200
+            stats = test_client.get("/health").json()["rate_limit"]
+            assert stats["shed"] == 1 and stats["admitted"] == 1
+            assert stats["estimates"] == {"read_item": 1.0}
+        finally:
+            svc.repo.scheduler = None
@@ -60,14 +60,19 @@ class TestCompanyRepository:
             repository.create(sample_company_data)
     
     def test_create_company_duplicate_ticker(self, repository):
-        """Test creating companies with duplicate ticker raises error."""
+        """Test creating companies with duplicate ticker in the same partition raises error."""
         company1 = {"name": "Apple Inc.", "ticker": "AAPL"}
-        company2 = {"name": "Different Company", "ticker": "AAPL"}
+        company2 = {"name": "Another Company", "ticker": "AAPL"}
         
         repository.create(company1)
         
         with pytest.raises(CosmosHttpResponseError):
             repository.create(company2)
+
+    def test_duplicate_ticker_in_other_partition(self, repository):
+        """Test unique keys are scoped to the partition, as Cosmos scopes its unique key policy."""
+        repository.create({"name": "Apple Inc.", "ticker": "AAPL"})
+        assert repository.create({"name": "Different Company", "ticker": "AAPL"})["pk"] == "d"
     
     def test_get_existing_company(self, repository, sample_company_data):
         """Test retrieving an existing company."""
@@ -233,6 +238,73 @@ class TestCompanyRepository:
         assert result["ticker"] == ""
 
 
+class TestQueryRouting:
+    """Test single-partition routing of name queries."""
+
+    @pytest.fixture
+    def repository(self, mock_container, sample_companies_list):
+        repo = CompanyRepository()
+        repo._container = mock_container
+        for company in sample_companies_list:
+            repo.create(company)
+        return repo
+
+    def test_exact_name_is_single_partition(self, repository):
+        """Test exact-name lookups query only the name's partition."""
+        with patch.object(repository.container, "query_items", wraps=repository.container.query_items) as spy:
+            assert repository.find_by_name_exact("  APPLE inc. ")["name"] == "Apple Inc."
+        assert spy.call_args.kwargs["partition_key"] == "a"
+        assert repository.routing_stats()["find_by_name_exact"] == {"single_partition": 1, "cross_partition": 0}
+
+    def test_prefix_is_single_partition(self, repository):
+        """Test prefix searches query only the prefix's first-letter partition."""
+        with patch.object(repository.container, "query_items", wraps=repository.container.query_items) as spy:
+            results = repository.search_by_name_prefix("Am")
+        assert [r["name"] for r in results] == ["Amazon.com Inc."]
+        assert spy.call_args.kwargs["partition_key"] == "a"
+
+    def test_empty_prefix_fans_out(self, repository):
+        """Test an empty prefix still searches every partition."""
+        assert len(repository.search_by_name_prefix("   ")) == 3
+        assert repository.routing_stats()["search_by_name_prefix"] == {"single_partition": 0, "cross_partition": 1}
+
+    def test_key_lookups_fan_out(self, repository):
+        """Test identifier lookups remain cross-partition."""
+        repository.find_by_keys(ticker="MSFT")
+        assert repository.routing_stats()["find_by_keys"]["cross_partition"] == 1
+
+
+class TestProjection:
+    """Test field projection in queries."""
+
+    @pytest.fixture
+    def repository(self, mock_container, sample_companies_list):
+        repo = CompanyRepository()
+        repo._container = mock_container
+        for company in sample_companies_list:
+            repo.create(company)
+        return repo
+
+    def test_select_clause(self, repository):
+        """Test id and pk are always selected and duplicates collapse."""
+        query, _ = repository._name_exact_query("Apple", fields=("name", "id"))
+        assert query.startswith("SELECT c.id, c.pk, c.name FROM c")
+        assert repository._name_exact_query("Apple")[0].startswith("SELECT * FROM c")
+
+    def test_queries_return_selected_fields(self, repository):
+        """Test exact-name, prefix and key queries honour fields."""
+        assert repository.find_by_name_exact("Apple Inc.", fields=("name",)).keys() == {"id", "pk", "name"}
+        assert repository.search_by_name_prefix("A", fields=("ticker",))[0].keys() == {"id", "pk", "name", "ticker"}
+        assert repository.find_by_keys(ticker="MSFT", fields=("lei",))[0].keys() == {"id", "pk", "lei"}
+
+    def test_get_projects_cached_document(self, repository):
+        """Test point reads trim the document without polluting the cache."""
+        created = repository.find_by_name_exact("Apple Inc.")
+        assert repository.get(created["id"], "a", fields=("ticker",)) == {
+            "id": created["id"], "pk": "a", "ticker": "AAPL"}
+        assert repository.get(created["id"], "a")["name"] == "Apple Inc."
+
+
 class TestCompanyRepositoryEdgeCases:
     """Test edge cases and error conditions."""
     
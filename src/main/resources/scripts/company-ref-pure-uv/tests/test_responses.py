@@ -0,0 +1,93 @@
+"""
+Tests for the fast response path that skips response_model validation.
+"""
+import json
+import pytest
+from contextlib import contextmanager
+from unittest.mock import patch
+from fastapi.exceptions import ResponseValidationError
+from app.responses import FastJSONResponse, company_document, dumps
+
+
+@contextmanager
+def fast_responses(enabled=True):
+    with patch("app.responses.FAST_RESPONSES", enabled), patch("app.routers.companies.FAST_RESPONSES", enabled):
+        yield
+
+
+@pytest.fixture
+def client(test_client, mock_get_container, sample_companies_list):
+    for company in sample_companies_list:
+        assert test_client.post("/companies", json={k: company[k] for k in ("name", "ticker", "sector")}).status_code == 201
+    return test_client
+
+
+class TestSerialization:
+    """Test the direct serializer."""
+
+    def test_dumps_compact_and_handles_objects(self):
+        """Test dates and other objects left in in-process documents are serialized like the encoder does."""
+        from datetime import date
+        assert json.loads(dumps({"founded": date(1976, 4, 1), "name": "Äpple"})) == {
+            "founded": "1976-04-01", "name": "Äpple"}
+        assert FastJSONResponse([1, {"a": None}]).body == b'[1,{"a":null}]'
+
+    def test_company_document_has_every_model_field(self):
+        """Test stored documents are trimmed to the Company fields, system properties dropped."""
+        doc = company_document({"id": "1", "pk": "a", "name": "Apple", "name_lower": "apple", "_rid": "x"})
+        assert "_rid" not in doc
+        assert doc["ticker"] is None and doc["name"] == "Apple"
+
+
+class TestFastRoutes:
+    """Test routes return the same bodies with and without fast responses."""
+
+    PATHS = ["/companies/search?prefix=a&page_size=1", "/companies/lookup?ticker=MSFT",
+             "/companies/validate?name=apple inc.", "/companies/search?prefix=a&fields=ticker"]
+
+    def test_same_bodies(self, client):
+        """Test search, lookup, validate and point reads match the validated responses."""
+        created = client.get("/companies/search?prefix=apple").json()[0]
+        paths = self.PATHS + [f"/companies/{created['pk']}/{created['id']}"]
+        with fast_responses(False):
+            slow = [client.get(p) for p in paths]
+        with fast_responses():
+            fast = [client.get(p) for p in paths]
+        for s, f in zip(slow, fast):
+            assert f.status_code == s.status_code == 200
+            assert f.json() == s.json()
+        assert fast[0].headers["X-Next-Cursor"] == slow[0].headers["X-Next-Cursor"]
+
+    def test_writes_still_validated(self, client):
+        """Test request bodies are validated in fast mode, and writes return Company documents."""
+        with fast_responses():
+            assert client.post("/companies", json={"name": ""}).status_code == 422
+            response = client.post("/companies", json={"name": "Nvidia Corp", "website": "https://nvidia.com"})
+        assert response.status_code == 201
+        assert response.json()["website"] == "https://nvidia.com/"
+        assert "_etag" not in response.json()
+
+    def test_sparse_document_gets_model_defaults(self, client, mock_container):
+        """Test fields a stored document lacks come out as the model defaults in fast mode too."""
+        from app.models import Company
+        sparse = {"id": "sparse", "pk": "s", "name": "Sparse Co", "name_lower": "sparse co"}
+        mock_container.items.append(dict(sparse))
+        with fast_responses(False):
+            slow = client.get("/companies/s/sparse").json()
+        with fast_responses():
+            fast = client.get("/companies/s/sparse").json()
+        assert fast == slow == Company.model_validate(sparse).model_dump(mode="json")
+        assert fast["anti_takeover"]["poison_pill"] is False
+        # Defaults are not shared between responses
+        first, second = company_document(sparse), company_document(sparse)
+        first["anti_takeover"]["poison_pill"] = True
+        assert second["anti_takeover"]["poison_pill"] is False
+
+    def test_stored_documents_are_not_revalidated(self, client, mock_container):
+        """Test fast mode trusts stored documents instead of validating them on the way out."""
+        mock_container.items.append({"id": "legacy", "pk": "l", "name": "Legacy Co", "name_lower": "legacy co",
+                                     "free_float_percent": 140})
+        with fast_responses():
+            assert client.get("/companies/l/legacy").json()["free_float_percent"] == 140
+        with fast_responses(False), pytest.raises(ResponseValidationError):
+            client.get("/companies/l/legacy")
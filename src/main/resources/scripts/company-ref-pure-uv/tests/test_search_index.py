@@ -0,0 +1,106 @@
+"""
+Unit tests for the in-memory prefix search index.
+"""
+import pytest
+from unittest.mock import AsyncMock
+from app.search_index import PrefixIndex
+from app.services.company_service import CompanyService
+
+
+def _doc(id, name, **extra):
+    return {"id": id, "pk": name[0].lower(), "name": name, "name_lower": name.lower(),
+            "notes": "not indexed", **extra}
+
+
+class TestPrefixIndex:
+    """Test the PrefixIndex class."""
+
+    @pytest.fixture
+    def index(self):
+        index = PrefixIndex()
+        index.load([
+            _doc("1", "Apple Inc.", ticker="AAPL"),
+            _doc("2", "Amazon.com Inc.", ticker="AMZN"),
+            _doc("3", "Microsoft Corporation", ticker="MSFT"),
+            _doc("4", "Applied Materials", ticker="AMAT"),
+        ])
+        return index
+
+    def test_cold_until_loaded(self):
+        """Test a new index is not ready."""
+        assert PrefixIndex().ready is False
+
+    def test_search_orders_by_name_lower(self, index):
+        """Test matches come back sorted by normalized name."""
+        results = index.search("A")
+        assert [r["name"] for r in results] == ["Amazon.com Inc.", "Apple Inc.", "Applied Materials"]
+
+    def test_search_normalizes_prefix(self, index):
+        """Test the prefix goes through normalize_name."""
+        assert [r["id"] for r in index.search("  APPL ")] == ["1", "4"]
+
+    def test_search_limit_and_no_match(self, index):
+        """Test limit and empty results."""
+        assert len(index.search("a", limit=1)) == 1
+        assert index.search("xyz") == []
+
+    def test_only_search_fields_are_held(self, index):
+        """Test documents are projected to the search fields."""
+        result = index.search("microsoft")[0]
+        assert result["ticker"] == "MSFT"
+        assert "notes" not in result
+        assert "name_lower" not in result
+
+    def test_upsert_moves_renamed_document(self, index):
+        """Test an upsert replaces the old key when the name changes."""
+        index.upsert(_doc("3", "Zeta Software"))
+        assert index.search("micro") == []
+        assert index.search("zeta")[0]["id"] == "3"
+        assert len(index) == 4
+
+    def test_remove(self, index):
+        """Test removing documents, including unknown ids."""
+        index.remove("1")
+        index.remove("missing")
+        assert [r["id"] for r in index.search("appl")] == ["4"]
+        assert index.stats() == {"ready": True, "size": 3}
+
+
+class TestServiceSearchIndex:
+    """Test CompanyService serving search from the index."""
+
+    @pytest.fixture
+    def service(self, mock_async_company_repository):
+        return CompanyService(repo=mock_async_company_repository, search_index=PrefixIndex())
+
+    async def test_cold_index_falls_back_to_repository(self, service, sample_companies_list):
+        """Test search queries Cosmos until the index is loaded."""
+        for company in sample_companies_list:
+            await service.create_company(company)
+        service.repo.search_by_name_prefix = AsyncMock(return_value=[])
+
+        await service.search_by_name_prefix("A")
+        service.repo.search_by_name_prefix.assert_awaited_once_with("A", 20, fields=None, after=None)
+
+    async def test_warm_index_serves_search(self, service, sample_companies_list):
+        """Test a loaded index answers without touching the repository."""
+        for company in sample_companies_list:
+            await service.create_company(company)
+        await service.load_search_index()
+        service.repo.search_by_name_prefix = AsyncMock()
+
+        results = await service.search_by_name_prefix("A")
+        assert [r["name"] for r in results] == ["Amazon.com Inc.", "Apple Inc."]
+        service.repo.search_by_name_prefix.assert_not_awaited()
+
+    async def test_writes_keep_index_fresh(self, service, sample_company_data):
+        """Test create, update and delete are applied incrementally."""
+        await service.load_search_index()
+        created = await service.create_company(sample_company_data)
+        assert [r["id"] for r in await service.search_by_name_prefix("apple")] == [created["id"]]
+
+        await service.update_company(created["id"], created["pk"], {"sector": "Hardware"})
+        assert (await service.search_by_name_prefix("apple"))[0]["sector"] == "Hardware"
+
+        await service.delete_company(created["id"], created["pk"])
+        assert await service.search_by_name_prefix("apple") == []
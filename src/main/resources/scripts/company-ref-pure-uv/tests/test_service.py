@@ -4,7 +4,7 @@ Unit tests for the CompanyService class.
 import pytest
 from unittest.mock import Mock, MagicMock
 from app.services.company_service import CompanyService
-from app.repository.company_repository import CompanyRepository
+from app.repository.async_company_repository import AsyncCompanyRepository
 
 
 class TestCompanyService:
@@ -13,7 +13,7 @@ class TestCompanyService:
     @pytest.fixture
     def mock_repository(self):
         """Create a mock repository."""
-        return Mock(spec=CompanyRepository)
+        return Mock(spec=AsyncCompanyRepository)
     
     @pytest.fixture
     def service(self, mock_repository):
@@ -28,76 +28,76 @@ class TestCompanyService:
     def test_service_initialization_without_repo(self):
         """Test service initialization creates default repository."""
         service = CompanyService()
-        assert isinstance(service.repo, CompanyRepository)
+        assert isinstance(service.repo, AsyncCompanyRepository)
     
-    def test_create_company(self, service, mock_repository, sample_company_data):
+    async def test_create_company(self, service, mock_repository, sample_company_data):
         """Test creating a company through service."""
         expected_result = {**sample_company_data, "id": "123", "pk": "a"}
         mock_repository.create.return_value = expected_result
         
-        result = service.create_company(sample_company_data)
+        result = await service.create_company(sample_company_data)
         
         mock_repository.create.assert_called_once_with(sample_company_data)
         assert result == expected_result
     
-    def test_get_company(self, service, mock_repository):
+    async def test_get_company(self, service, mock_repository):
         """Test getting a company through service."""
         expected_result = {"id": "123", "pk": "a", "name": "Apple Inc."}
         mock_repository.get.return_value = expected_result
         
-        result = service.get_company("123", "a")
+        result = await service.get_company("123", "a")
         
-        mock_repository.get.assert_called_once_with("123", "a")
+        mock_repository.get.assert_called_once_with("123", "a", fields=None)
         assert result == expected_result
     
-    def test_get_company_not_found(self, service, mock_repository):
+    async def test_get_company_not_found(self, service, mock_repository):
         """Test getting non-existent company returns None."""
         mock_repository.get.return_value = None
         
-        result = service.get_company("nonexistent", "n")
+        result = await service.get_company("nonexistent", "n")
         
-        mock_repository.get.assert_called_once_with("nonexistent", "n")
+        mock_repository.get.assert_called_once_with("nonexistent", "n", fields=None)
         assert result is None
     
-    def test_update_company(self, service, mock_repository):
+    async def test_update_company(self, service, mock_repository):
         """Test updating a company through service."""
         update_data = {"sector": "Technology"}
         expected_result = {"id": "123", "pk": "a", "name": "Apple Inc.", "sector": "Technology"}
         mock_repository.update.return_value = expected_result
         
-        result = service.update_company("123", "a", update_data)
+        result = await service.update_company("123", "a", update_data)
         
-        mock_repository.update.assert_called_once_with("123", "a", update_data)
+        mock_repository.update.assert_called_once_with("123", "a", update_data, if_match=None)
         assert result == expected_result
     
-    def test_update_company_not_found(self, service, mock_repository):
+    async def test_update_company_not_found(self, service, mock_repository):
         """Test updating non-existent company returns None."""
         mock_repository.update.return_value = None
         
-        result = service.update_company("nonexistent", "n", {"sector": "Tech"})
+        result = await service.update_company("nonexistent", "n", {"sector": "Tech"})
         
-        mock_repository.update.assert_called_once_with("nonexistent", "n", {"sector": "Tech"})
+        mock_repository.update.assert_called_once_with("nonexistent", "n", {"sector": "Tech"}, if_match=None)
         assert result is None
     
-    def test_delete_company_success(self, service, mock_repository):
+    async def test_delete_company_success(self, service, mock_repository):
         """Test successfully deleting a company."""
         mock_repository.delete.return_value = True
         
-        result = service.delete_company("123", "a")
+        result = await service.delete_company("123", "a")
         
         mock_repository.delete.assert_called_once_with("123", "a")
         assert result is True
     
-    def test_delete_company_not_found(self, service, mock_repository):
+    async def test_delete_company_not_found(self, service, mock_repository):
         """Test deleting non-existent company returns False."""
         mock_repository.delete.return_value = False
         
-        result = service.delete_company("nonexistent", "n")
+        result = await service.delete_company("nonexistent", "n")
         
         mock_repository.delete.assert_called_once_with("nonexistent", "n")
         assert result is False
     
-    def test_search_by_name_prefix(self, service, mock_repository):
+    async def test_search_by_name_prefix(self, service, mock_repository):
         """Test searching companies by name prefix."""
         expected_results = [
             {"id": "1", "name": "Apple Inc."},
@@ -105,65 +105,65 @@ class TestCompanyService:
         ]
         mock_repository.search_by_name_prefix.return_value = expected_results
         
-        result = service.search_by_name_prefix("A")
+        result = await service.search_by_name_prefix("A")
         
-        mock_repository.search_by_name_prefix.assert_called_once_with("A", 20)
+        mock_repository.search_by_name_prefix.assert_called_once_with("A", 20, fields=None, after=None)
         assert result == expected_results
     
-    def test_search_by_name_prefix_with_limit(self, service, mock_repository):
+    async def test_search_by_name_prefix_with_limit(self, service, mock_repository):
         """Test searching companies by name prefix with custom limit."""
         expected_results = [{"id": "1", "name": "Apple Inc."}]
         mock_repository.search_by_name_prefix.return_value = expected_results
         
-        result = service.search_by_name_prefix("A", limit=5)
+        result = await service.search_by_name_prefix("A", limit=5)
         
-        mock_repository.search_by_name_prefix.assert_called_once_with("A", 5)
+        mock_repository.search_by_name_prefix.assert_called_once_with("A", 5, fields=None, after=None)
         assert result == expected_results
     
-    def test_search_by_name_prefix_no_results(self, service, mock_repository):
+    async def test_search_by_name_prefix_no_results(self, service, mock_repository):
         """Test searching with no results."""
         mock_repository.search_by_name_prefix.return_value = []
         
-        result = service.search_by_name_prefix("XYZ")
+        result = await service.search_by_name_prefix("XYZ")
         
-        mock_repository.search_by_name_prefix.assert_called_once_with("XYZ", 20)
+        mock_repository.search_by_name_prefix.assert_called_once_with("XYZ", 20, fields=None, after=None)
         assert result == []
     
-    def test_validate_name_exists_found(self, service, mock_repository):
+    async def test_validate_name_exists_found(self, service, mock_repository):
         """Test validating name that exists."""
         company_data = {"id": "123", "name": "Apple Inc."}
         mock_repository.find_by_name_exact.return_value = company_data
         
-        result = service.validate_name_exists("Apple Inc.")
+        result = await service.validate_name_exists("Apple Inc.")
         
-        mock_repository.find_by_name_exact.assert_called_once_with("Apple Inc.")
+        mock_repository.find_by_name_exact.assert_called_once_with("Apple Inc.", fields=("name",))
         assert result["query"] == "Apple Inc."
         assert result["exists"] is True
         assert result["match"]["id"] == "123"
         assert result["match"]["name"] == "Apple Inc."
     
-    def test_validate_name_exists_not_found(self, service, mock_repository):
+    async def test_validate_name_exists_not_found(self, service, mock_repository):
         """Test validating name that doesn't exist."""
         mock_repository.find_by_name_exact.return_value = None
         
-        result = service.validate_name_exists("Nonexistent Company")
+        result = await service.validate_name_exists("Nonexistent Company")
         
-        mock_repository.find_by_name_exact.assert_called_once_with("Nonexistent Company")
+        mock_repository.find_by_name_exact.assert_called_once_with("Nonexistent Company", fields=("name",))
         assert result["query"] == "Nonexistent Company"
         assert result["exists"] is False
         assert result["match"] is None
     
-    def test_find_by_keys_ticker(self, service, mock_repository):
+    async def test_find_by_keys_ticker(self, service, mock_repository):
         """Test finding companies by ticker."""
         expected_results = [{"id": "123", "ticker": "AAPL", "name": "Apple Inc."}]
         mock_repository.find_by_keys.return_value = expected_results
         
-        result = service.find_by_keys(ticker="AAPL")
+        result = await service.find_by_keys(ticker="AAPL")
         
         mock_repository.find_by_keys.assert_called_once_with(ticker="AAPL")
         assert result == expected_results
     
-    def test_find_by_keys_multiple_criteria(self, service, mock_repository):
+    async def test_find_by_keys_multiple_criteria(self, service, mock_repository):
         """Test finding companies by multiple criteria."""
         expected_results = [
             {"id": "123", "ticker": "AAPL", "name": "Apple Inc."},
@@ -171,16 +171,16 @@ class TestCompanyService:
         ]
         mock_repository.find_by_keys.return_value = expected_results
         
-        result = service.find_by_keys(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")
+        result = await service.find_by_keys(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")
         
         mock_repository.find_by_keys.assert_called_once_with(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")
         assert result == expected_results
     
-    def test_find_by_keys_no_results(self, service, mock_repository):
+    async def test_find_by_keys_no_results(self, service, mock_repository):
         """Test finding companies with no matches."""
         mock_repository.find_by_keys.return_value = []
         
-        result = service.find_by_keys(ticker="NONEXISTENT")
+        result = await service.find_by_keys(ticker="NONEXISTENT")
         
         mock_repository.find_by_keys.assert_called_once_with(ticker="NONEXISTENT")
         assert result == []
@@ -190,82 +190,81 @@ class TestCompanyServiceIntegration:
     """Integration tests for CompanyService with real repository."""
     
     @pytest.fixture
-    def service_with_mock_container(self, mock_container):
+    def service_with_mock_container(self, async_mock_container):
         """Create service with repository using mock container."""
-        from app.repository.company_repository import CompanyRepository
-        repo = CompanyRepository()
-        repo._container = mock_container
+        repo = AsyncCompanyRepository()
+        repo._container = async_mock_container
         return CompanyService(repo=repo)
     
-    def test_full_company_lifecycle(self, service_with_mock_container, sample_company_data):
+    async def test_full_company_lifecycle(self, service_with_mock_container, sample_company_data):
         """Test complete CRUD lifecycle through service."""
         service = service_with_mock_container
         
         # Create
-        created = service.create_company(sample_company_data)
+        created = await service.create_company(sample_company_data)
         assert created["name"] == sample_company_data["name"]
         assert "id" in created
         assert "pk" in created
         
         # Read
-        retrieved = service.get_company(created["id"], created["pk"])
+        retrieved = await service.get_company(created["id"], created["pk"])
         assert retrieved is not None
         assert retrieved["name"] == sample_company_data["name"]
         
         # Update
         update_data = {"sector": "Consumer Electronics"}
-        updated = service.update_company(created["id"], created["pk"], update_data)
+        updated = await service.update_company(created["id"], created["pk"], update_data)
         assert updated is not None
         assert updated["sector"] == "Consumer Electronics"
         
         # Delete
-        deleted = service.delete_company(created["id"], created["pk"])
+        deleted = await service.delete_company(created["id"], created["pk"])
         assert deleted is True
         
         # Verify deletion
-        not_found = service.get_company(created["id"], created["pk"])
+        not_found = await service.get_company(created["id"], created["pk"])
         assert not_found is None
     
-    def test_search_and_validation_workflow(self, service_with_mock_container, sample_companies_list):
+    async def test_search_and_validation_workflow(self, service_with_mock_container, sample_companies_list):
         """Test search and validation workflow."""
         service = service_with_mock_container
         
         # Create multiple companies
         for company_data in sample_companies_list:
-            service.create_company(company_data)
+            await service.create_company(company_data)
         
         # Search by prefix
-        search_results = service.search_by_name_prefix("A")
+        search_results = await service.search_by_name_prefix("A")
         assert len(search_results) >= 2  # Apple and Amazon
         
         # Validate existing name
-        validation_result = service.validate_name_exists("Apple Inc.")
+        validation_result = await service.validate_name_exists("Apple Inc.")
         assert validation_result["exists"] is True
         assert validation_result["match"] is not None
         
         # Validate non-existing name
-        validation_result = service.validate_name_exists("Nonexistent Company")
+        validation_result = await service.validate_name_exists("Nonexistent Company")
         assert validation_result["exists"] is False
         assert validation_result["match"] is None
     
-    def test_key_lookup_workflow(self, service_with_mock_container, sample_companies_list):
+    async def test_key_lookup_workflow(self, service_with_mock_container, sample_companies_list):
         """Test key-based lookup workflow."""
         service = service_with_mock_container
         
         # Create companies
         for company_data in sample_companies_list:
-            service.create_company(company_data)
+            await service.create_company(company_data)
         
         # Find by ticker
-        ticker_results = service.find_by_keys(ticker="AAPL")
+        ticker_results = await service.find_by_keys(ticker="AAPL")
         assert len(ticker_results) == 1
         assert ticker_results[0]["name"] == "Apple Inc."
         
         # Find by LEI
-        lei_results = service.find_by_keys(lei="HWUPKR0MPOU8FGXBT394")
+        lei_results = await service.find_by_keys(lei="HWUPKR0MPOU8FGXBT394")
         assert len(lei_results) == 1
         assert lei_results[0]["name"] == "Apple Inc."
         
         # Find by multiple criteria (OR logic)
-        multi_results = service.find_by_keys(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")
+        multi_results = await service.find_by_keys(ticker="AAPL", lei="XKZZ2JZF41MRHTR1V493")
         assert len(multi_results) == 2  # Apple (ticker) and Microsoft (LEI)
\ No newline at end of file
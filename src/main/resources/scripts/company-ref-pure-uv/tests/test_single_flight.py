@@ -0,0 +1,123 @@
+"""
+Unit tests for single-flight read coalescing.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services.company_service import CompanyService
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test the SingleFlight class."""
+
+    async def test_concurrent_calls_share_one(self):
+        """Test identical concurrent keys make one call and get its result; other keys do not wait."""
+        flights, calls = SingleFlight(), []
+
+        async def call(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return {"value": value}
+
+        results = await asyncio.gather(*(flights.do("a", lambda: call("a")) for _ in range(10)),
+                                       flights.do("b", lambda: call("b")))
+        assert calls == ["a", "b"]
+        assert results[0] is results[9] and results[10] == {"value": "b"}
+        assert flights.stats() == {"calls": 2, "collapsed": 9, "collapse_ratio": 0.8182, "in_flight": 0,
+                                   "max_waiters": 10}
+
+    async def test_nothing_kept_after_completion(self):
+        """Test a call that starts after the previous one finished is made again."""
+        flights, calls = SingleFlight(), []
+
+        async def call():
+            calls.append(1)
+            return len(calls)
+
+        assert [await flights.do("k", call), await flights.do("k", call)] == [1, 2]
+
+    async def test_exceptions_are_shared(self):
+        """Test every waiter sees the call's exception."""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert [type(r) for r in results] == [RuntimeError] * 3
+        assert flights.stats()["in_flight"] == 0
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Test the first caller disconnecting leaves the call running for the rest."""
+        flights = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flights.do("k", call))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flights.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+
+    async def test_forget(self):
+        """Test callers arriving after forget() start a new call while earlier waiters keep theirs."""
+        flights, started = SingleFlight(), []
+
+        async def call():
+            started.append(1)
+            n = len(started)
+            await asyncio.sleep(0.01)
+            return n
+
+        before = asyncio.ensure_future(flights.do("k", call))
+        await asyncio.sleep(0)
+        flights.forget()
+        assert await asyncio.gather(before, flights.do("k", call)) == [1, 2]
+
+
+class TestCoalescedService:
+    """Test CompanyService reads with single-flight on."""
+
+    @pytest.fixture
+    def service(self, mock_async_company_repository):
+        return CompanyService(repo=mock_async_company_repository, single_flight=SingleFlight())
+
+    async def test_identical_reads_make_one_repository_call(self, service, sample_company_data):
+        """Test a burst of identical get, lookup and validate reads each reaches the repository once."""
+        created = await service.create_company(sample_company_data)
+        service.repo.cache.clear()
+        repo = service.repo
+        with patch.object(repo, "get", wraps=repo.get) as get, \
+                patch.object(repo, "find_by_keys", wraps=repo.find_by_keys) as find_by_keys, \
+                patch.object(repo, "find_by_name_exact", wraps=repo.find_by_name_exact) as find_by_name:
+            results = await asyncio.gather(
+                *(service.get_company(created["id"], "a") for _ in range(5)),
+                *(service.find_by_keys(ticker="AAPL", isin=None, lei=None, fields=["name"]) for _ in range(5)),
+                *(service.validate_name_exists(name) for name in ("Apple Inc.", " APPLE INC. ", "apple inc.")))
+        assert (get.call_count, find_by_keys.call_count, find_by_name.call_count) == (1, 1, 1)
+        assert all(r["id"] == created["id"] for r in results[:5])
+        assert [r["query"] for r in results[10:]] == ["Apple Inc.", " APPLE INC. ", "apple inc."]
+        assert service.single_flight.stats()["collapsed"] == 10
+
+    async def test_reads_after_a_write_are_fresh(self, service, sample_company_data):
+        """Test a read that arrives after an update does not join a read that started before it."""
+        created = await service.create_company(sample_company_data)
+        service.repo.cache.clear()
+        before = asyncio.ensure_future(service.get_company(created["id"], "a"))
+        await asyncio.sleep(0)
+        await service.update_company(created["id"], "a", {"sector": "Hardware"})
+        after = await service.get_company(created["id"], "a")
+        assert after["sector"] == "Hardware"
+        await before
+
+    def test_health_reports_counters(self, test_client, mock_get_container):
+        """Test /health includes the single-flight counters when enabled."""
+        from app.routers import companies
+        with patch.object(companies.svc, "single_flight", SingleFlight()):
+            assert test_client.get("/health").json()["single_flight"]["calls"] == 0
+        assert "single_flight" not in test_client.get("/health").json()
@@ -0,0 +1,174 @@
+"""
+Unit tests for the SQLite repository backend.
+"""
+import pytest
+from unittest.mock import patch
+from app.repository.backends import create_repository
+from app.repository.protocol import ChangeFeedSource, ConflictError, PreconditionFailedError
+from app.repository.base import prefix_range
+from app.repository.sqlite_company_repository import SQLiteCompanyRepository
+from app.services.company_service import CompanyService
+
+
+@pytest.fixture
+async def repository(tmp_path):
+    repo = SQLiteCompanyRepository(str(tmp_path / "companies.db"))
+    await repo.warm_up()
+    yield repo
+    await repo.close()
+
+
+class TestSQLiteCompanyRepository:
+    """Test the SQLiteCompanyRepository class."""
+
+    async def test_create_and_get(self, repository, sample_company_data):
+        """Test a created company is stored like a Cosmos document and read back by (pk, id)."""
+        created = await repository.create(sample_company_data)
+        assert created["name_lower"] == "apple inc."
+        assert created["pk"] == "a"
+        assert created["_etag"].startswith('"')
+
+        assert await repository.get(created["id"], created["pk"]) == created
+        assert await repository.get(created["id"], created["pk"], fields=("ticker",)) == {
+            "id": created["id"], "pk": "a", "ticker": "AAPL"}
+        assert await repository.get(created["id"], "z") is None
+
+    async def test_unique_keys_per_partition(self, repository, sample_company_data):
+        """Test name, ticker and LEI are unique within a partition, as with the Cosmos unique key policy."""
+        await repository.create(sample_company_data)
+        with pytest.raises(ConflictError) as exc:
+            await repository.create({"name": "APPLE INC."})
+        assert exc.value.status_code == 409
+        with pytest.raises(ConflictError):
+            await repository.create({"name": "Apple Computer", "ticker": "aapl"})
+        # Missing identifiers never collide; other partitions are separate
+        await repository.create({"name": "Alpha One"})
+        await repository.create({"name": "Alpha Two"})
+        await repository.create({"name": "Banana Co", "ticker": "AAPL"})
+
+    async def test_update_with_etag(self, repository, sample_company_data):
+        """Test updates change the etag and honour If-Match."""
+        created = await repository.create(sample_company_data)
+        updated = await repository.update(created["id"], "a", {"sector": "Hardware"}, if_match=created["_etag"])
+        assert updated["sector"] == "Hardware"
+        assert updated["_etag"] != created["_etag"]
+        with pytest.raises(PreconditionFailedError):
+            await repository.update(created["id"], "a", {"sector": "Software"}, if_match=created["_etag"])
+        assert (await repository.get(created["id"], "a"))["sector"] == "Hardware"
+        assert await repository.update("missing", "a", {"sector": "x"}) is None
+
+    async def test_rename_moves_partition(self, repository, sample_company_data):
+        """Test a rename into another partition keeps the id and frees the old name."""
+        created = await repository.create(sample_company_data)
+        moved = await repository.update(created["id"], "a", {"name": "Zeta Corp"})
+        assert (moved["id"], moved["pk"], moved["name_lower"]) == (created["id"], "z", "zeta corp")
+        assert await repository.get(created["id"], "a") is None
+        await repository.create({"name": "Apple Inc."})
+
+    async def test_rename_conflict_rolls_back(self, repository):
+        """Test a rename onto a taken name fails without changing anything."""
+        first = await repository.create({"name": "Zeta Corp"})
+        second = await repository.create({"name": "Zebra Corp"})
+        with pytest.raises(ConflictError):
+            await repository.update(second["id"], "z", {"name": "zeta corp"})
+        assert (await repository.get(second["id"], "z"))["name"] == "Zebra Corp"
+        assert (await repository.get(first["id"], "z"))["name"] == "Zeta Corp"
+
+    async def test_delete(self, repository, sample_company_data):
+        """Test deleting existing and non-existent companies."""
+        created = await repository.create(sample_company_data)
+        assert await repository.delete(created["id"], "a") is True
+        assert await repository.delete(created["id"], "a") is False
+
+    async def test_prefix_search_and_keyset_paging(self, repository):
+        """Test prefix matches come back ordered by name, projected, and paged after a name."""
+        for name in ["Apple Inc.", "Applied Materials", "Apricot Ltd", "Banana Co", "Appz"]:
+            await repository.create({"name": name, "country": "US", "notes": "long"})
+        page = await repository.search_by_name_prefix("app", limit=2)
+        assert [c["name"] for c in page] == ["Apple Inc.", "Applied Materials"]
+        assert "notes" not in page[0] and page[0]["country"] == "US"
+        rest = await repository.search_by_name_prefix("app", limit=10, after="applied materials")
+        assert [c["name"] for c in rest] == ["Appz"]
+        assert set(page[0]) == {"id", "pk", "name", "country"}
+        assert prefix_range("ab") == ("ab", "ac")
+
+    async def test_lookups(self, repository, sample_companies_list):
+        """Test identifier lookups, single and batched."""
+        for company in sample_companies_list:
+            await repository.create(company)
+        assert [c["name"] for c in await repository.find_by_keys(ticker="msft")] == ["Microsoft Corporation"]
+        assert len(await repository.find_by_keys(ticker="AAPL", isin="US5949181045")) == 2
+        assert await repository.find_by_keys() == []
+        found = await repository.find_many_by_keys({"ticker": ["AAPL", "NOPE"], "lei": ["PQOH26KWDF7CG10L6792"]},
+                                                   fields=("name",))
+        assert found["ticker"]["AAPL"]["name"] == "Apple Inc."
+        assert set(found["ticker"]) == {"AAPL"}
+        assert found["lei"]["PQOH26KWDF7CG10L6792"]["name"] == "Amazon.com Inc."
+        assert (await repository.find_by_name_exact(" amazon.COM inc. "))["ticker"] == "AMZN"
+
+    async def test_bulk_create_and_scans(self, repository):
+        """Test bulk create reports conflicts per row, and scans and pages see every company."""
+        results = await repository.bulk_create([{"name": f"Company {i}"} for i in range(5)] + [{"name": "company 0"}])
+        assert [r["status_code"] for r in results] == [201] * 5 + [409]
+        pages = [page async for page in repository.iter_pages(2, fields=("name",))]
+        assert [len(p) for p in pages] == [2, 2, 1]
+        assert sorted(await repository.scan_names()) == [f"company {i}" for i in range(5)]
+        assert set((await repository.scan_search_fields())[0]) == {"id", "pk", "name", "name_lower"}
+
+    async def test_wal_and_indexes(self, repository):
+        """Test the database is in WAL mode and lookups use the indexes instead of scanning."""
+        conn = repository.open()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        for column in ("name_lower", "ticker", "isin", "lei"):
+            plan = " ".join(row[-1] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT doc FROM companies WHERE {column} = ?", ("x",)))
+            assert "USING INDEX" in plan, plan
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT doc FROM companies WHERE name_lower >= ? AND name_lower < ? "
+            "ORDER BY name_lower LIMIT 20", ("ab", "ac")))
+        assert "ix_companies_name_lower" in plan and "TEMP B-TREE" not in plan
+
+    def test_backend_selection(self):
+        """Test the factory builds the configured backend, and only Cosmos has a change feed."""
+        sqlite = create_repository("sqlite")
+        assert isinstance(sqlite, SQLiteCompanyRepository)
+        assert not isinstance(sqlite, ChangeFeedSource)
+        assert isinstance(create_repository("cosmos"), ChangeFeedSource)
+        with pytest.raises(ValueError):
+            create_repository("mongodb")
+
+
+class TestSQLiteBackendApi:
+    """Test the API end to end on the SQLite backend."""
+
+    @pytest.fixture
+    def client(self, test_client, repository):
+        from app.routers import companies
+        with patch.object(companies, "svc", CompanyService(repo=repository)):
+            yield test_client
+
+    def test_crud_and_conflicts(self, client, sample_companies_list):
+        """Test create, read, conditional update, search, validate and delete without Cosmos."""
+        for company in sample_companies_list:
+            assert client.post("/companies", json=company).status_code == 201
+        assert client.post("/companies", json={"name": "apple inc."}).status_code == 409
+
+        apple = client.get("/companies/lookup?ticker=AAPL").json()[0]
+        path = f"/companies/{apple['pk']}/{apple['id']}"
+        assert client.get(path).json()["isin"] == "US0378331005"
+        assert client.put(path, json={"sector": "Hardware"}, headers={"If-Match": '"stale"'}).status_code == 412
+        assert client.put(path, json={"sector": "Hardware"}).json()["sector"] == "Hardware"
+
+        assert [c["name"] for c in client.get("/companies/search?prefix=am").json()] == ["Amazon.com Inc."]
+        assert client.get("/companies/validate?name=Microsoft Corporation").json()["exists"] is True
+        assert client.delete(path).status_code == 204
+        assert client.get(path).status_code == 404
+        assert client.get("/health").json()["database"] == "sqlite"
+
+    def test_create_with_url_and_date(self, client):
+        """Test URL and date fields are stored as JSON strings rather than failing to serialize."""
+        response = client.post("/companies", json={"name": "Acme", "website": "https://acme.com",
+                                                   "founded": "2001-01-01"})
+        assert response.status_code == 201
+        acme = client.get(f"/companies/{response.json()['pk']}/{response.json()['id']}").json()
+        assert acme["website"] == "https://acme.com/" and acme["founded"] == "2001-01-01"
@@ -2,7 +2,8 @@
 Unit tests for the utils module.
 """
 import pytest
-from app.utils import normalize_name, derive_pk_from_name, non_empty
+from app.utils import (normalize_name, normalize_names, name_key, make_normalizer, derive_pk_from_name, non_empty,
+                       encode_cursor, decode_cursor)
 
 
 class TestNormalizeName:
@@ -88,6 +89,41 @@ class TestDerivePkFromName:
         assert result == "@"
 
 
+class TestNormalizationForms:
+    """Test normalize_names, name_key and the normalizer forms."""
+
+    WHITESPACE = ["a\x1cb", "a\xa0b", "a\u2028b", " a  b ", "a\t\nb", "a b", "a\u3000 b"]
+
+    def test_batch_and_key(self):
+        """Test the batch API and name_key agree with normalize_name and derive_pk_from_name."""
+        names = ["  APPLE   Inc. ", "", "3M\tCompany", *self.WHITESPACE]
+        assert normalize_names(iter(names)) == [normalize_name(n) for n in names]
+        assert [name_key(n) for n in names] == [(normalize_name(n), derive_pk_from_name(n)) for n in names]
+
+    def test_lower_collapses_all_unicode_whitespace(self):
+        """Test the printable fast path gives what the regex alone would."""
+        import re
+        for name in self.WHITESPACE:
+            assert normalize_name(name) == re.sub(r"\s+", " ", name.strip().lower())
+
+    def test_unicode_form(self):
+        """Test NFKC and case folding match compatibility forms and folded case; ASCII is unchanged."""
+        normalize = make_normalizer("unicode", 0)
+        assert normalize("  Ｓｏｎｙ　Ｃｏｒｐ ") == "sony corp"
+        assert normalize("STRASSE Holding") == normalize("Straße Holding") == "strasse holding"
+        assert normalize("ﬁrst  Bank") == "first bank"
+        assert make_normalizer("lower", 0)("Straße") == "straße"
+        assert normalize("  APPLE   Inc. ") == normalize_name("  APPLE   Inc. ")
+
+    def test_memo_and_unknown_form(self):
+        """Test a positive cache size memoizes and an unknown form is rejected."""
+        normalize = make_normalizer("lower", 2)
+        assert normalize("Apple Inc.") == normalize("Apple Inc.") == "apple inc."
+        assert normalize.cache_info().hits == 1
+        with pytest.raises(ValueError):
+            make_normalizer("upper", 0)
+
+
 class TestNonEmpty:
     """Test the non_empty function."""
     
@@ -123,6 +159,22 @@ class TestNonEmpty:
         assert non_empty("\tMicrosoft\n") is True
 
 
+class TestCursor:
+    """Test the paging cursor helpers."""
+
+    def test_round_trip(self):
+        """Test cursors are URL-safe and decode to the original key."""
+        cursor = encode_cursor("société générale")
+        assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+        assert decode_cursor(cursor) == "société générale"
+
+    @pytest.mark.parametrize("cursor", ["", "not base64!", "bnVsbA", "eyJhZnRlciI6IDF9"])
+    def test_invalid(self, cursor):
+        """Test garbage, JSON null and a non-string key are rejected."""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
 class TestUtilsIntegration:
     """Integration tests for utils functions working together."""
     